@@ -0,0 +1,339 @@
+"""
+This module provides named analysis profiles, so that documents in several languages can be analyzed in one run
+instead of one full pipeline per language.
+
+A profile bundles a tokenizer (the nltk models of its language or any object with the Tokenizer methods),
+its stop words (the nltk stop words of its language and optional stop word files) and its lexicons (by default
+the MasterDictionary, or lexicon files per category). Every profile compiles its analyzers once, on first use,
+and keeps its own caches in its own folder: a token cache keyed by the version of its tokenizer and a word
+feature table built for its lexicons and stop words. The lexicon of a profile has a version derived from its
+tokenizer, stop words and entries, so cached results of different profiles are never mixed up.
+
+A ProfileRouter picks the profile of every document: from the language column of the manifest if the document
+has one, otherwise by a cheap language detection that counts the stop words of every profile in the beginning
+of the text. With a manifest the documents are read in manifest order while it is streamed. The documents are
+analyzed with the backend, deduplicator and budget given to the router.
+
+Classes:
+    AnalysisProfile: A named set of tokenizer, stop words and lexicons with its compiled analyzers and caches.
+    ProfileRouter: Routes documents to profiles and analyzes them.
+
+Example:
+    router = ProfileRouter([AnalysisProfile('english'), AnalysisProfile('german', language='german',
+                            lexicon_paths={'positive': ['de-positive.txt'], 'negative': ['de-negative.txt']})],
+                           backend='thread')
+    router.load_languages(manifest_path)
+    TextFileAnalyzerLoader(text_file_analyzer=router).merge_data(output_path)
+"""
+
+import os
+import re
+import threading
+import zlib
+from concurrent.futures import ThreadPoolExecutor
+from logger import Logger
+from tokenizer import Tokenizer
+
+WORD_PATTERN = re.compile(r'\w+')
+
+
+class AnalysisProfile:
+    """
+    A class that holds the tokenizer, stop words and lexicons of a language and its compiled analyzers.
+    """
+
+    def __init__(self, name, language='english', stop_word_paths=(), lexicon_paths=None, tokenizer=None,
+                 aliases=(), token_cache=False, word_features=False, cache_dir=None):
+        """
+        Initializes the AnalysisProfile object. Nothing is loaded before the profile is used.
+
+        Args:
+            name (str): The name of the profile, it is matched against the language column of the manifest.
+            language (str): The nltk language of the tokenizer models and of the stop words.
+            stop_word_paths (iterable): Additional stop word files, one or more words per line.
+            lexicon_paths (dict): A dictionary mapping a category ('positive', 'negative', ...) to a list of
+                lexicon files with one entry per line. By default the MasterDictionary lexicons are used.
+            tokenizer: An object with the methods of Tokenizer, by default a Tokenizer for the language.
+            aliases (iterable): Other values of the language column routed to this profile, e.g. 'en', 'eng'.
+            token_cache (bool): If True the tokens of the documents are cached in the cache folder of the profile.
+            word_features (bool): If True the profile uses a word feature table in its cache folder.
+            cache_dir (str): The cache folder of the profile, by default 'profiles/<name>' in the parent directory.
+        """
+        self.logger = Logger(__name__, 'analysis_profile.log', log_to_console=True).logger
+        self.name = name
+        self.language = language
+        self.stop_word_paths = tuple(stop_word_paths)
+        self.lexicon_paths = lexicon_paths
+        self.tokenizer = tokenizer or Tokenizer('', language=language)
+        self.aliases = frozenset(alias.lower() for alias in (name, language, *aliases))
+        self.token_cache = token_cache
+        self.word_features = word_features
+        self.cache_dir = cache_dir or os.path.abspath(os.path.join(os.getcwd(), os.pardir, 'profiles', name))
+        self.lock = threading.Lock()
+        self._stop_words = None
+        self._analyzer = None
+        # the version of the lexicon of the profile, set when the lexicon is built
+        self.version = None
+
+    @property
+    def tokenizer_version(self):
+        """
+        The version of the tokenizer, or the name of its class for a tokenizer without a version attribute.
+        """
+        version = getattr(self.tokenizer, 'version', None)
+        if version is None:
+            tokenizer_class = type(self.tokenizer)
+            version = f'{tokenizer_class.__module__}.{tokenizer_class.__qualname__}'
+        return version
+
+    @property
+    def word_features_path(self):
+        return os.path.join(self.cache_dir, 'word_features.tsv')
+
+    def stop_words(self):
+        """
+        Returns the stop words of the profile, they are loaded once.
+        """
+        if self._stop_words is None:
+            stop_words = set()
+            try:
+                from nltk.corpus import stopwords
+                stop_words.update(stopwords.words(self.language))
+            except (LookupError, OSError) as e:
+                self.logger.error(f"Profile {self.name} has no nltk stop words for {self.language}: {e}")
+            for path in self.stop_word_paths:
+                try:
+                    with open(path, encoding='utf-8') as f:
+                        stop_words.update(f.read().lower().split())
+                except Exception as e:
+                    self.logger.error(f"Profile {self.name} could not read the stop words of {path}: {e}")
+            self._stop_words = frozenset(stop_words)
+        return self._stop_words
+
+    def build_lexicon(self):
+        """
+        Builds the Lexicon of the profile: the MasterDictionary words and phrases, or the entries of its
+        lexicon files without the stop words of the profile. Its version is a checksum of the tokenizer version,
+        the stop words and the entries, it is also stored in the version attribute of the profile.
+
+        Returns:
+            Lexicon: The lexicon of the profile.
+        """
+        from lexicon_registry import Lexicon
+        stop_words = self.stop_words()
+        if self.lexicon_paths is None:
+            from dictionary import DictionaryCreator
+            dictionary_creator = DictionaryCreator()
+            entries = {
+                'positive': set(dictionary_creator.positive_dict() or [])
+                | set(dictionary_creator.phrase_dict('positive-words.txt')),
+                'negative': set(dictionary_creator.negative_dict() or [])
+                | set(dictionary_creator.phrase_dict('negative-words.txt'))
+            }
+        else:
+            entries = {'positive': set(), 'negative': set()}
+            for category, paths in self.lexicon_paths.items():
+                for path in paths:
+                    try:
+                        with open(path, encoding='utf-8') as f:
+                            entries.setdefault(category, set()).update(
+                                ' '.join(line.split()) for line in f if line.strip() and not line.startswith(';'))
+                    except Exception as e:
+                        self.logger.error(f"Profile {self.name} could not read the lexicon {path}: {e}")
+            entries = {category: {entry for entry in words if entry not in stop_words}
+                       for category, words in entries.items()}
+        checksum = zlib.crc32(str(self.tokenizer_version).encode('utf-8'))
+        checksum = zlib.crc32('\n'.join(sorted(stop_words)).encode('utf-8'), checksum)
+        for category in sorted(entries):
+            checksum = zlib.crc32(f'\n[{category}]\n'.encode('utf-8'), checksum)
+            checksum = zlib.crc32('\n'.join(sorted(entries[category])).encode('utf-8'), checksum)
+        self.version = checksum
+        return Lexicon(checksum, entries)
+
+    def create_analyzers(self):
+        """
+        Compiles the TextAnalyzer and the ReadabilityAnalyzer of the profile.
+        """
+        from text_analyzer import TextAnalyzer, ReadabilityAnalyzer
+        text_analyzer = TextAnalyzer(self.tokenizer, self.build_lexicon())
+        readability_analyzer = ReadabilityAnalyzer(self.tokenizer, self.stop_words())
+        self.logger.info(f"Analyzers of profile {self.name} compiled")
+        return text_analyzer, readability_analyzer
+
+    def analyzer(self, **options):
+        """
+        Returns the TextFileAnalyzer of the profile, it is created once with the caches of the profile.
+
+        Args:
+            options: The backend, max_workers, deduplicator and budget of the analyzer, used when it is created.
+        """
+        if self._analyzer is None:
+            with self.lock:
+                if self._analyzer is None:
+                    from text_file_analyzer import TextFileAnalyzer
+                    token_cache = None
+                    if self.token_cache:
+                        from token_cache import TokenCorpusCache
+                        token_cache = TokenCorpusCache(os.path.join(self.cache_dir, 'tokencache'),
+                                                       tokenizer_version=self.tokenizer_version)
+                    if self.word_features:
+                        os.makedirs(self.cache_dir, exist_ok=True)
+                    analyzer = TextFileAnalyzer(token_cache=token_cache, word_features=self.word_features,
+                                                profile=self, **options)
+                    analyzer.get_analyzers()
+                    self._analyzer = analyzer
+        return self._analyzer
+
+
+class ProfileRouter:
+    """
+    A class that routes documents to analysis profiles by the manifest language column or by language detection.
+    """
+
+    def __init__(self, profiles, default=None, detect=True, sample_chars=2000, backend='serial', max_workers=None,
+                 deduplicator=None, budget=None):
+        """
+        Initializes the ProfileRouter object.
+
+        Args:
+            profiles (iterable): The AnalysisProfile objects.
+            default (str): The name of the profile of documents that can not be routed, by default the first one.
+            detect (bool): If True documents without a manifest language are routed by language detection.
+            sample_chars (int): The number of characters at the beginning of a text used by the detection.
+            backend (str): 'serial' or 'thread', like the backend of a TextFileAnalyzer. The analyzers of the
+                profiles live in this process, so 'process' falls back to 'thread'.
+            max_workers (int): The number of threads of the 'thread' backend.
+            deduplicator (ContentDeduplicator): An optional deduplicator shared by all profiles.
+            budget (PipelineBudget): Optional in-flight and time budgets of the analysis.
+        """
+        self.logger = Logger(__name__, 'analysis_profile.log', log_to_console=True).logger
+        self.profiles = {profile.name: profile for profile in profiles}
+        if not self.profiles:
+            raise ValueError("A ProfileRouter needs at least one profile")
+        self.default = self.profiles[default] if default else next(iter(self.profiles.values()))
+        self.detect = detect
+        self.sample_chars = sample_chars
+        if backend == 'process':
+            self.logger.error("The profiles can not be shared with a process pool, the documents are analyzed "
+                              "by the thread backend")
+            backend = 'thread'
+        self.backend = backend
+        self.options = {'backend': backend, 'max_workers': max_workers, 'deduplicator': deduplicator,
+                        'budget': budget}
+        # the manifest path and language column, read while the documents are analyzed
+        self.manifest = None
+        self.routed = {name: 0 for name in self.profiles}
+
+    def load_languages(self, filepath, column='LANGUAGE'):
+        """
+        Sets the manifest whose language column routes the documents. The manifest is not read here but
+        streamed by iter_results, which then analyzes the documents in manifest order.
+        """
+        self.manifest = (filepath, column)
+
+    def iter_languages(self):
+        """
+        Streams the manifest and yields a tuple (URL_ID, language) for every row, the language is None if
+        the row has none. If the manifest has no language column every row gets the default profile.
+        """
+        from manifest_reader import ManifestReader
+        filepath, column = self.manifest
+        reader = ManifestReader(filepath, url_column=column, skip_empty=False)
+        if column not in reader.columns():
+            self.logger.error(f"{filepath} has no {column} column, all documents use the profile {self.default.name}")
+            for url_id, _ in ManifestReader(filepath):
+                yield url_id, self.default.name
+            return
+        yield from reader
+
+    def profile_for_language(self, language):
+        """
+        Returns the profile of a language name or alias, or None if no profile has it.
+        """
+        language = str(language).strip().lower()
+        for profile in self.profiles.values():
+            if language in profile.aliases:
+                return profile
+        return None
+
+    def detect_language(self, text):
+        """
+        Returns the profile whose stop words are the most frequent in the beginning of the text,
+        or None if no stop word of any profile is found.
+        """
+        words = WORD_PATTERN.findall(text[:self.sample_chars].lower())
+        best, best_count = None, 0
+        for profile in self.profiles.values():
+            stop_words = profile.stop_words()
+            count = sum(1 for word in words if word in stop_words)
+            if count > best_count:
+                best, best_count = profile, count
+        return best
+
+    def route(self, url_id, text, language=None):
+        """
+        Returns the profile of a document: the one of its manifest language, the detected one or the default.
+        """
+        profile = None
+        if language is not None:
+            profile = self.profile_for_language(language)
+            if profile is None:
+                self.logger.error(f"URL_ID {url_id} has the language {language} without a profile")
+        if profile is None and self.detect and len(self.profiles) > 1:
+            profile = self.detect_language(text)
+        profile = profile or self.default
+        self.routed[profile.name] += 1
+        return profile
+
+    def analyze_document(self, url_id, text, language=None):
+        """
+        Analyzes a document with the analyzer of its profile.
+
+        Returns:
+            AnalysisResult: The analysis measures of the document.
+        """
+        return self.route(url_id, text, language).analyzer(**self.options).analyze_serial(url_id, text)
+
+    def iter_routed(self, content_store=None):
+        """
+        Yields a tuple (URL_ID, text, analyzer) for every document with the analyzer of its profile. With a
+        manifest its rows are streamed and their documents read one by one, otherwise the documents are detected.
+        """
+        if self.manifest:
+            front = self.default.analyzer(**self.options)
+            for url_id, language in self.iter_languages():
+                text = front.read_document(url_id, content_store)
+                if text is None:
+                    self.logger.error(f"URL_ID {url_id} has no extracted text")
+                    continue
+                yield url_id, text, self.route(url_id, text, language).analyzer(**self.options)
+        else:
+            for url_id, text in self.default.analyzer(**self.options).iter_documents(content_store):
+                yield url_id, text, self.route(url_id, text).analyzer(**self.options)
+
+    def iter_results(self, content_store=None):
+        """
+        Analyzes the extracted documents of all languages in one pass, like TextFileAnalyzer.iter_results,
+        so a ProfileRouter can be given to a TextFileAnalyzerLoader in place of a TextFileAnalyzer.
+        With the 'thread' backend the documents of all profiles share one thread pool.
+
+        Args:
+            content_store (ContentStore): An optional content store to read the texts from.
+
+        Yields:
+            AnalysisResult: The analysis measures of one document.
+        """
+        if self.backend == 'thread':
+            front = self.default.analyzer(**self.options)
+            workers = front.thread_count()
+            with ThreadPoolExecutor(max_workers=workers, thread_name_prefix='analyzer') as executor:
+                yield from front.iter_pooled_results(
+                    self.iter_routed(content_store), workers, lambda analyzer, url_id, text, lexicon:
+                    executor.submit(analyzer.analyze_document, url_id, text, lexicon))
+        else:
+            for url_id, text, analyzer in self.iter_routed(content_store):
+                yield analyzer.analyze_serial(url_id, text)
+        for profile in self.profiles.values():
+            if profile._analyzer:
+                profile._analyzer.save_word_features()
+        self.logger.info(f"Documents routed per profile: {self.routed}")
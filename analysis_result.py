@@ -0,0 +1,92 @@
+"""
+This module provides an AnalysisResult class, a compact record holding the analysis measures of one document.
+
+The record uses __slots__, so a result costs a fixed number of attribute slots instead of a dictionary keyed
+by long column names. The column names are stored once on the class and used when the results are converted
+to rows, dictionaries or a pandas DataFrame.
+
+Classes:
+    AnalysisResult: The text and readability analysis measures of a single document.
+
+Example:
+    result = AnalysisResult('37', positive_score=62, negative_score=28, ...)
+    row = result.as_row()
+"""
+
+
+class AnalysisResult:
+    """
+    A class that holds the text and readability analysis measures of a single document.
+    """
+
+    # attribute names in output column order, the URL_ID comes first
+    FIELDS = ('url_id', 'positive_score', 'negative_score', 'polarity_score', 'subjectivity_score',
+              'avg_sentence_length', 'percentage_of_complex_words', 'fog_index',
+              'avg_number_of_words_per_sentence', 'complex_word_count', 'word_count',
+              'syllable_per_word', 'personal_pronouns', 'avg_word_length')
+
+    COLUMNS = ('URL_ID', 'POSITIVE SCORE', 'NEGATIVE SCORE', 'POLARITY SCORE', 'SUBJECTIVITY SCORE',
+               'AVG SENTENCE LENGTH', 'PERCENTAGE OF COMPLEX WORDS', 'FOG INDEX',
+               'AVG NUMBER OF WORDS PER SENTENCE', 'COMPLEX WORD COUNT', 'WORD COUNT',
+               'SYLLABLE PER WORD', 'PERSONAL PRONOUNS', 'AVG WORD LENGTH')
+
+    # the pandas dtypes of the output columns, the ones of the DataFrame built from per document dictionaries:
+    # the measures of a document mix ints and floats, so every measure column is float64
+    DTYPES = {'URL_ID': 'int64', **dict.fromkeys(COLUMNS[1:], 'float64')}
+
+    __slots__ = FIELDS
+
+    def __init__(self, url_id, **measures):
+        """
+        Initializes the AnalysisResult object.
+
+        Args:
+            url_id (str): The URL_ID of the document.
+            measures: The analysis measures, keyed by the attribute names in FIELDS.
+        """
+        self.url_id = url_id
+        for field in self.FIELDS[1:]:
+            setattr(self, field, measures.get(field))
+
+    @classmethod
+    def from_variables(cls, url_id, variables):
+        """
+        Creates an AnalysisResult from a dictionary keyed by the output column names.
+
+        Args:
+            url_id (str): The URL_ID of the document.
+            variables (dict): The analysis measures keyed by the column names in COLUMNS.
+        """
+        result = cls(url_id)
+        for field, column in zip(cls.FIELDS[1:], cls.COLUMNS[1:]):
+            setattr(result, field, variables.get(column))
+        return result
+
+    def with_url_id(self, url_id):
+        """
+        Returns a copy of the result for another document with the same measures, e.g. an exact duplicate.
+        """
+        result = AnalysisResult(url_id)
+        for field in self.FIELDS[1:]:
+            setattr(result, field, getattr(self, field))
+        return result
+
+    def as_row(self):
+        """
+        Returns the measures as a tuple in column order, starting with the URL_ID.
+        """
+        return tuple(getattr(self, field) for field in self.FIELDS)
+
+    def as_dict(self):
+        """
+        Returns the measures as a dictionary keyed by the output column names, without the URL_ID.
+        """
+        return {column: getattr(self, field) for field, column in zip(self.FIELDS[1:], self.COLUMNS[1:])}
+
+    def __eq__(self, other):
+        if not isinstance(other, AnalysisResult):
+            return NotImplemented
+        return self.as_row() == other.as_row()
+
+    def __repr__(self):
+        return f"AnalysisResult({', '.join(f'{field}={getattr(self, field)!r}' for field in self.FIELDS)})"
@@ -0,0 +1,60 @@
+"""
+This module benchmarks the analysis backends of the TextFileAnalyzer on the extracted documents.
+
+Every backend analyzes the same documents (the 'textfile' directory, read into memory once so that only the
+analysis is timed). The module prints the best wall clock time of each backend over a number of rounds, the
+speedup against the serial backend and whether the results are identical to the serial results.
+
+Usage:
+    python benchmark_backends.py [rounds] [max_workers]
+"""
+
+import sys
+import time
+from text_file_analyzer import TextFileAnalyzer
+
+
+def benchmark(backend, documents, rounds=3, max_workers=None):
+    """
+    Analyzes the documents with the given backend.
+
+    Args:
+        backend (str): The backend of the TextFileAnalyzer.
+        documents (list): Tuples (URL_ID, text) of the documents.
+        rounds (int): The number of timed rounds.
+        max_workers (int): The number of threads or processes of the pool backends.
+
+    Returns:
+        tuple: The best time in seconds and the result rows of the last round.
+    """
+    analyzer = TextFileAnalyzer(backend=backend, max_workers=max_workers)
+    # the first call builds the lexicons, it is not timed
+    analyzer.get_analyzers()
+    best = float('inf')
+    rows = []
+    for _ in range(rounds):
+        started = time.perf_counter()
+        if backend == 'thread':
+            results = analyzer.iter_results_threaded(documents)
+        elif backend == 'process':
+            results = analyzer.iter_results_process(documents)
+        else:
+            results = (analyzer.analyze_document(url_id, text) for url_id, text in documents)
+        rows = [result.as_row() for result in results]
+        best = min(best, time.perf_counter() - started)
+    return best, rows
+
+
+if __name__ == '__main__':
+    rounds = int(sys.argv[1]) if len(sys.argv) > 1 else 3
+    max_workers = int(sys.argv[2]) if len(sys.argv) > 2 else None
+    documents = list(TextFileAnalyzer().iter_documents())
+    gil_enabled = getattr(sys, '_is_gil_enabled', lambda: True)()
+    print(f"{len(documents)} documents, {rounds} rounds, GIL {'enabled' if gil_enabled else 'disabled'}")
+
+    serial_time, serial_rows = benchmark('serial', documents, rounds)
+    print(f"{'serial':<8} {serial_time:8.3f}s  1.00x")
+    for backend in ('thread', 'process'):
+        backend_time, backend_rows = benchmark(backend, documents, rounds, max_workers)
+        print(f"{backend:<8} {backend_time:8.3f}s  {serial_time / backend_time:.2f}x  "
+              f"{'identical' if backend_rows == serial_rows else 'DIFFERENT'} results")
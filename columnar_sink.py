@@ -0,0 +1,152 @@
+"""
+This module provides a ColumnarSink class that streams tables with many rows (e.g. per sentence measures)
+to disk column by column, so that a single measure can be read for the whole corpus without reading the others.
+
+Layout of the sink folder:
+- schema.json: the column names and their array type codes ('I' unsigned 32 bit integer, 'd' float).
+- NN.bin: the values of column NN, in native byte order, appended in batches.
+- url_ids.txt: the distinct URL_IDs, the URL_ID column holds the line number of the URL_ID in this file.
+
+Classes:
+    ColumnarSink: Appends rows to a folder of column files and reads them back.
+
+Example:
+    sink = ColumnarSink('/path/to/segments', SegmentScorer.COLUMNS)
+    sink.write(columns)
+    sink.close()
+    segments_df = ColumnarSink.read('/path/to/segments')
+"""
+
+import json
+import os
+from array import array
+from logger import Logger
+
+
+class ColumnarSink:
+    """
+    A class that appends rows to one binary file per column.
+    """
+
+    def __init__(self, sink_dir, columns, batch_rows=10000):
+        """
+        Initializes the ColumnarSink object and writes the schema. An existing sink with the same schema
+        is appended to.
+
+        Args:
+            sink_dir (str): The folder of the column files.
+            columns (dict): A dictionary mapping the column names, in order, to their array type codes.
+                The column 'URL_ID' is stored as an index into url_ids.txt.
+            batch_rows (int): The number of buffered rows after which the columns are written to disk.
+        """
+        self.logger = Logger(__name__, 'columnar_sink.log', log_to_console=True).logger
+        self.sink_dir = sink_dir
+        self.columns = dict(columns)
+        self.batch_rows = batch_rows
+        self.buffers = {column: array(typecode) for column, typecode in self.columns.items()}
+        self.buffered_rows = 0
+        self.rows_written = 0
+        os.makedirs(self.sink_dir, exist_ok=True)
+        schema = {'columns': list(self.columns.items())}
+        schema_path = os.path.join(self.sink_dir, 'schema.json')
+        if os.path.exists(schema_path):
+            with open(schema_path, encoding='utf-8') as f:
+                if json.load(f)['columns'] != [list(item) for item in schema['columns']]:
+                    raise ValueError(f"The sink {self.sink_dir} has a different schema")
+        with open(schema_path, 'w', encoding='utf-8') as f:
+            json.dump(schema, f, indent=1)
+        self.url_ids_path = os.path.join(self.sink_dir, 'url_ids.txt')
+        self.url_ids = {}
+        if os.path.exists(self.url_ids_path):
+            with open(self.url_ids_path, encoding='utf-8') as f:
+                self.url_ids = {url_id: index for index, url_id in enumerate(f.read().split('\n')[:-1])}
+
+    def column_path(self, index):
+        return os.path.join(self.sink_dir, f'{index:02d}.bin')
+
+    def write(self, columns):
+        """
+        Buffers rows given as columns and writes the buffers when batch_rows rows are buffered.
+
+        Args:
+            columns (dict): A dictionary mapping every column name to the list of its values. URL_ID values
+                may be given as a single value for all rows.
+        """
+        num_rows = max(len(values) for column, values in columns.items() if column != 'URL_ID')
+        for column, buffer in self.buffers.items():
+            values = columns[column]
+            if column == 'URL_ID':
+                values = [self.url_id_index(values)] * num_rows
+            buffer.extend(values)
+        self.buffered_rows += num_rows
+        if self.buffered_rows >= self.batch_rows:
+            self.flush()
+
+    def url_id_index(self, url_id):
+        """
+        Returns the index of a URL_ID in url_ids.txt, adding it if it is new.
+        """
+        url_id = str(url_id)
+        index = self.url_ids.get(url_id)
+        if index is None:
+            index = self.url_ids[url_id] = len(self.url_ids)
+            with open(self.url_ids_path, 'a', encoding='utf-8') as f:
+                f.write(f'{url_id}\n')
+        return index
+
+    def flush(self):
+        """
+        Appends the buffered rows to the column files.
+        """
+        for index, (column, buffer) in enumerate(self.buffers.items()):
+            with open(self.column_path(index), 'ab') as f:
+                buffer.tofile(f)
+            self.buffers[column] = array(buffer.typecode)
+        self.rows_written += self.buffered_rows
+        self.buffered_rows = 0
+
+    def close(self):
+        """
+        Writes the remaining buffered rows.
+        """
+        self.flush()
+        self.logger.info(f"{self.rows_written} rows written to {self.sink_dir}")
+
+    @staticmethod
+    def read_columns(sink_dir, columns=None):
+        """
+        Reads columns of a sink.
+
+        Args:
+            sink_dir (str): The folder of the column files.
+            columns (list): The names of the columns to read, by default all of them.
+
+        Returns:
+            dict: A dictionary mapping the column names to arrays of their values, the URL_ID column
+                to a list of URL_IDs.
+        """
+        with open(os.path.join(sink_dir, 'schema.json'), encoding='utf-8') as f:
+            schema = json.load(f)['columns']
+        result = {}
+        for index, (column, typecode) in enumerate(schema):
+            if columns is not None and column not in columns:
+                continue
+            values = array(typecode)
+            path = os.path.join(sink_dir, f'{index:02d}.bin')
+            if os.path.exists(path):
+                with open(path, 'rb') as f:
+                    values.frombytes(f.read())
+            result[column] = values
+        if 'URL_ID' in result:
+            with open(os.path.join(sink_dir, 'url_ids.txt'), encoding='utf-8') as f:
+                url_ids = f.read().split('\n')[:-1]
+            result['URL_ID'] = [url_ids[index] for index in result['URL_ID']]
+        return result
+
+    @classmethod
+    def read(cls, sink_dir, columns=None):
+        """
+        Reads columns of a sink into a pandas DataFrame.
+        """
+        import pandas as pd
+        return pd.DataFrame(cls.read_columns(sink_dir, columns))
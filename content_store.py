@@ -0,0 +1,227 @@
+"""
+This module provides a ContentStore class that keeps the raw HTML and the extracted text of every URL_ID
+in compressed, content-addressed segment files instead of one small file per URL_ID.
+
+Every blob (raw HTML or extracted text) is addressed by the SHA-256 hash of its content, compressed with
+gzip and appended to the current segment file. A SQLite index maps each hash to its segment, offset and
+length, and each URL_ID to the hashes of its HTML and text. Identical content is stored only once.
+HTML whose download stopped after the article content (a TruncatedHtml) is stored with a truncated flag,
+html_truncated tells if the stored page of a URL_ID misses its end.
+
+The blobs are appended to the segment file before the index is committed. If the process stops in between,
+the segment holds bytes the index does not know; they are cut off the next time the store is opened.
+put does file and SQLite I/O, coroutines call put_async to run it in a worker thread instead of the event loop.
+
+Classes:
+    ContentStore: Stores and retrieves the raw HTML and extracted text of URL_IDs.
+
+Example:
+    store = ContentStore()
+    store.put(url_id, page_html, page_text)
+    text = store.get_text(url_id)
+"""
+
+import asyncio
+import os
+import gzip
+import hashlib
+import sqlite3
+import threading
+from logger import Logger
+
+
+class ContentStore:
+    """
+    A class that stores raw HTML and extracted text in compressed, content-addressed segment files.
+    """
+
+    def __init__(self, store_dir=None, segment_size=64 * 1024 * 1024):
+        """
+        Initializes the ContentStore object, creates the store folder and the index if they do not exist.
+
+        Args:
+            store_dir (str): The folder of the store, by default 'contentstore' in the parent directory.
+            segment_size (int): The size in bytes after which a new segment file is started.
+        """
+        self.logger = Logger(__name__, 'content_store.log', log_to_console=True).logger
+        if store_dir is None:
+            store_dir = os.path.abspath(os.path.join(os.getcwd(), os.pardir, 'contentstore'))
+        self.store_dir = store_dir
+        self.segment_size = segment_size
+        self.lock = threading.Lock()
+        try:
+            os.makedirs(self.store_dir, exist_ok=True)
+            self.connection = sqlite3.connect(os.path.join(self.store_dir, 'index.db'), check_same_thread=False)
+            self.connection.execute(
+                'CREATE TABLE IF NOT EXISTS blobs ('
+                'hash TEXT PRIMARY KEY, segment INTEGER NOT NULL, offset INTEGER NOT NULL, length INTEGER NOT NULL)')
+            self.connection.execute(
+                'CREATE TABLE IF NOT EXISTS documents ('
+                'url_id TEXT PRIMARY KEY, html_hash TEXT, text_hash TEXT NOT NULL, '
+                'html_truncated INTEGER NOT NULL DEFAULT 0)')
+            columns = [row[1] for row in self.connection.execute('PRAGMA table_info(documents)')]
+            if 'html_truncated' not in columns:
+                # stores created before the flag existed
+                self.connection.execute(
+                    'ALTER TABLE documents ADD COLUMN html_truncated INTEGER NOT NULL DEFAULT 0')
+            self.connection.commit()
+            row = self.connection.execute('SELECT MAX(segment) FROM blobs').fetchone()
+            self.segment = row[0] or 0
+            self.reclaim_unindexed()
+            self.logger.info(f"Content store {self.store_dir} opened successfully")
+        except Exception as e:
+            self.logger.exception(f"Failed to open content store {self.store_dir}: {e}")
+            raise
+
+    def segment_path(self, segment):
+        """
+        Returns the path of the segment file with the given number.
+        """
+        return os.path.join(self.store_dir, f'segment-{segment:05d}.pack')
+
+    def reclaim_unindexed(self):
+        """
+        Cuts off the bytes at the end of the segment files that are not in the index, e.g. blobs appended
+        by a put that did not reach its commit, so that they do not stay in the segments as orphans.
+        """
+        indexed_ends = dict(self.connection.execute(
+            'SELECT segment, MAX(offset + length) FROM blobs GROUP BY segment').fetchall())
+        for file_name in sorted(os.listdir(self.store_dir)):
+            if not (file_name.startswith('segment-') and file_name.endswith('.pack')):
+                continue
+            segment = int(file_name[len('segment-'):-len('.pack')])
+            path = self.segment_path(segment)
+            indexed_end = indexed_ends.get(segment, 0)
+            size = os.path.getsize(path)
+            if size <= indexed_end:
+                continue
+            if indexed_end:
+                with open(path, 'r+b') as f:
+                    f.truncate(indexed_end)
+            else:
+                os.remove(path)
+            self.logger.info(f"{size - indexed_end} unindexed bytes reclaimed from {path}")
+
+    def _put_blob(self, content):
+        """
+        Compresses and appends a blob to the current segment file unless a blob with the same hash
+        is already stored.
+
+        Returns:
+            str: The SHA-256 hash of the content.
+        """
+        data = content.encode('utf-8')
+        digest = hashlib.sha256(data).hexdigest()
+        if self.connection.execute('SELECT 1 FROM blobs WHERE hash = ?', (digest,)).fetchone():
+            return digest
+
+        compressed = gzip.compress(data)
+        path = self.segment_path(self.segment)
+        if os.path.exists(path) and os.path.getsize(path) + len(compressed) > self.segment_size:
+            self.segment += 1
+            path = self.segment_path(self.segment)
+        with open(path, 'ab') as f:
+            offset = f.tell()
+            f.write(compressed)
+        self.connection.execute('INSERT INTO blobs (hash, segment, offset, length) VALUES (?, ?, ?, ?)',
+                                (digest, self.segment, offset, len(compressed)))
+        return digest
+
+    def _get_blob(self, digest):
+        """
+        Reads and decompresses the blob with the given hash.
+        """
+        row = self.connection.execute('SELECT segment, offset, length FROM blobs WHERE hash = ?',
+                                      (digest,)).fetchone()
+        if row is None:
+            return None
+        segment, offset, length = row
+        with open(self.segment_path(segment), 'rb') as f:
+            f.seek(offset)
+            return gzip.decompress(f.read(length)).decode('utf-8')
+
+    def put(self, url_id, html, text):
+        """
+        Stores the raw HTML and the extracted text of a URL_ID.
+
+        Args:
+            url_id: The unique identifier for the URL.
+            html (str): The raw HTML of the page, it can be None. A TruncatedHtml is flagged as truncated.
+            text (str): The extracted text of the page.
+
+        Raises:
+            Exception: The error of a failed write, so that the page is not recorded as parsed.
+        """
+        try:
+            with self.lock:
+                html_hash = self._put_blob(html) if html is not None else None
+                text_hash = self._put_blob(text)
+                self.connection.execute(
+                    'INSERT OR REPLACE INTO documents (url_id, html_hash, text_hash, html_truncated) '
+                    'VALUES (?, ?, ?, ?)',
+                    (str(url_id), html_hash, text_hash, int(getattr(html, 'truncated', False))))
+                self.connection.commit()
+            self.logger.info(f"URL_ID {url_id} content stored successfully")
+        except Exception as e:
+            self.logger.error(f"URL_ID {url_id} content could not be stored: {e}")
+            raise
+
+    async def put_async(self, url_id, html, text):
+        """
+        Stores the raw HTML and the extracted text of a URL_ID from a coroutine, without blocking the event loop.
+        """
+        await asyncio.to_thread(self.put, url_id, html, text)
+
+    def _get_document(self, url_id, column):
+        with self.lock:
+            row = self.connection.execute(f'SELECT {column} FROM documents WHERE url_id = ?',
+                                          (str(url_id),)).fetchone()
+            if row is None or row[0] is None:
+                return None
+            return self._get_blob(row[0])
+
+    def get_html(self, url_id):
+        """
+        Returns the raw HTML of a URL_ID, or None if it is not stored.
+        """
+        return self._get_document(url_id, 'html_hash')
+
+    def html_truncated(self, url_id):
+        """
+        Returns True if the stored HTML of a URL_ID was cut after the article content, so that it misses its end.
+        """
+        with self.lock:
+            row = self.connection.execute('SELECT html_truncated FROM documents WHERE url_id = ?',
+                                          (str(url_id),)).fetchone()
+        return bool(row and row[0])
+
+    def get_text(self, url_id):
+        """
+        Returns the extracted text of a URL_ID, or None if it is not stored.
+        """
+        return self._get_document(url_id, 'text_hash')
+
+    def url_ids(self):
+        """
+        Returns the URL_IDs stored in the content store.
+        """
+        with self.lock:
+            return [row[0] for row in self.connection.execute('SELECT url_id FROM documents ORDER BY url_id')]
+
+    def iter_texts(self):
+        """
+        Yields a tuple (URL_ID, extracted text) for every URL_ID in the store.
+        """
+        for url_id in self.url_ids():
+            yield url_id, self.get_text(url_id)
+
+    def close(self):
+        """
+        Closes the index of the store.
+        """
+        self.connection.close()
+
+
+if __name__ == '__main__':
+    content_store = ContentStore()
+    print(content_store.url_ids())
@@ -0,0 +1,211 @@
+"""
+This module provides a CrawlJournal class that records the progress of a crawl in a durable,
+append-only SQLite journal so that an interrupted crawl can be resumed.
+
+Every state change of a URL_ID is appended as a new event, the current state of a URL_ID is the
+state of its latest event. The states are:
+- pending: the URL_ID is known to the crawl but has not been fetched yet.
+- fetched: the page has been downloaded but its content is not saved yet.
+- parsed: the page content has been extracted and saved, the URL_ID is finished.
+- failed: fetching or parsing raised an error, the error text is stored with the event.
+- rejected: the response can never be used (e.g. it is not HTML or too large), the URL_ID is finished
+  and not retried. The error text is stored with the event.
+
+Classes:
+    RetryPolicy: Decides how often and after which delay a failed URL_ID is retried.
+    CrawlJournal: Records and queries the per URL_ID state of a crawl.
+
+Example:
+    journal = CrawlJournal()
+    journal.register([1, 2, 3])
+    for url_id in journal.unfinished([1, 2, 3]):
+        ...
+"""
+
+import os
+import sqlite3
+import time
+from logger import Logger
+
+
+class RetryPolicy:
+    """
+    A class that describes how failed URL_IDs are retried.
+    """
+
+    def __init__(self, max_attempts=3, backoff_seconds=1.0, backoff_factor=2.0):
+        """
+        Initializes the RetryPolicy object.
+
+        Args:
+            max_attempts (int): The number of failed attempts after which a URL_ID is given up.
+            backoff_seconds (float): The delay before the first retry.
+            backoff_factor (float): The factor the delay is multiplied with for every further retry.
+        """
+        self.max_attempts = max_attempts
+        self.backoff_seconds = backoff_seconds
+        self.backoff_factor = backoff_factor
+
+    def should_retry(self, attempts):
+        """
+        Returns True if a URL_ID that already failed the given number of times should be tried again.
+        """
+        return attempts < self.max_attempts
+
+    def delay(self, attempts):
+        """
+        Returns the number of seconds to wait before the next attempt of a URL_ID.
+        """
+        if attempts <= 0:
+            return 0.0
+        return self.backoff_seconds * self.backoff_factor ** (attempts - 1)
+
+
+class CrawlJournal:
+    """
+    A class that stores the state of every URL_ID of a crawl in an append-only SQLite journal.
+    """
+
+    PENDING = 'pending'
+    FETCHED = 'fetched'
+    PARSED = 'parsed'
+    FAILED = 'failed'
+    REJECTED = 'rejected'
+
+    def __init__(self, journal_path=None, retry_policy=None):
+        """
+        Initializes the CrawlJournal object and creates the journal table if it does not exist.
+
+        Args:
+            journal_path (str): The path of the SQLite journal file, by default 'crawl_journal.db'
+                in the parent directory.
+            retry_policy (RetryPolicy): The policy used to decide if failed URL_IDs are retried.
+        """
+        self.logger = Logger(__name__, 'crawl_journal.log', log_to_console=True).logger
+        if journal_path is None:
+            journal_path = os.path.abspath(os.path.join(os.getcwd(), os.pardir, 'crawl_journal.db'))
+        self.journal_path = journal_path
+        self.retry_policy = retry_policy or RetryPolicy()
+        try:
+            self.connection = sqlite3.connect(self.journal_path)
+            self.connection.execute(
+                'CREATE TABLE IF NOT EXISTS events ('
+                'id INTEGER PRIMARY KEY AUTOINCREMENT, '
+                'url_id TEXT NOT NULL, '
+                'state TEXT NOT NULL, '
+                'error TEXT, '
+                'created REAL NOT NULL)')
+            self.connection.execute('CREATE INDEX IF NOT EXISTS events_url_id ON events (url_id)')
+            self.connection.commit()
+            self.logger.info(f"Crawl journal {self.journal_path} opened successfully")
+        except Exception as e:
+            self.logger.exception(f"Failed to open crawl journal {self.journal_path}: {e}")
+            raise
+
+    def _append(self, url_id, state, error=None):
+        """
+        Appends a state change of a URL_ID to the journal and commits it immediately.
+        """
+        self.connection.execute('INSERT INTO events (url_id, state, error, created) VALUES (?, ?, ?, ?)',
+                                (str(url_id), state, error, time.time()))
+        self.connection.commit()
+
+    def register(self, url_ids):
+        """
+        Marks every URL_ID that is not in the journal yet as pending.
+
+        Args:
+            url_ids (iterable): The URL_IDs of the crawl, or of a batch of it.
+        """
+        url_ids = list(url_ids)
+        known = self.states(url_ids)
+        new_events = [(str(url_id), self.PENDING, None, time.time())
+                      for url_id in url_ids if str(url_id) not in known]
+        self.connection.executemany('INSERT INTO events (url_id, state, error, created) VALUES (?, ?, ?, ?)',
+                                    new_events)
+        self.connection.commit()
+        self.logger.info(f"{len(new_events)} new URL_IDs registered in the crawl journal")
+
+    def mark_fetched(self, url_id):
+        self._append(url_id, self.FETCHED)
+
+    def mark_parsed(self, url_id):
+        self._append(url_id, self.PARSED)
+
+    def mark_failed(self, url_id, error):
+        self._append(url_id, self.FAILED, str(error))
+
+    def mark_rejected(self, url_id, error):
+        self._append(url_id, self.REJECTED, str(error))
+
+    def states(self, url_ids=None):
+        """
+        Returns the current state of every URL_ID in the journal.
+
+        Args:
+            url_ids (list): Only return the states of these URL_IDs, so that a batch of a large crawl
+                does not read the whole journal.
+
+        Returns:
+            dict: A dictionary mapping the URL_ID (as str) to a tuple (state, error, failed attempts).
+        """
+        query = ('SELECT e.url_id, e.state, e.error, '
+                 '(SELECT COUNT(*) FROM events f WHERE f.url_id = e.url_id AND f.state = ?) '
+                 'FROM events e WHERE e.id IN (SELECT MAX(id) FROM events {} GROUP BY url_id)')
+        if url_ids is None:
+            rows = self.connection.execute(query.format(''), (self.FAILED,)).fetchall()
+        else:
+            url_ids = [str(url_id) for url_id in url_ids]
+            rows = []
+            # the URL_IDs are queried in chunks to stay below the SQLite limit of bound parameters
+            for start in range(0, len(url_ids), 500):
+                chunk = url_ids[start:start + 500]
+                condition = f"WHERE url_id IN ({', '.join('?' for _ in chunk)})"
+                rows += self.connection.execute(query.format(condition), (self.FAILED, *chunk)).fetchall()
+        return {url_id: (state, error, attempts) for url_id, state, error, attempts in rows}
+
+    def failed_attempts(self, url_id):
+        """
+        Returns how often the given URL_ID has failed so far.
+        """
+        row = self.connection.execute('SELECT COUNT(*) FROM events WHERE url_id = ? AND state = ?',
+                                      (str(url_id), self.FAILED)).fetchone()
+        return row[0]
+
+    def unfinished(self, url_ids):
+        """
+        Filters the given URL_IDs down to the ones that still have to be crawled: the ones that are
+        pending or fetched, and the failed ones the retry policy allows to try again. Parsed and
+        rejected URL_IDs are finished.
+
+        Args:
+            url_ids (iterable): The URL_IDs of the crawl, or of a batch of it.
+
+        Returns:
+            list: The URL_IDs that still have to be crawled, in the given order.
+        """
+        url_ids = list(url_ids)
+        states = self.states(url_ids)
+        remaining = []
+        for url_id in url_ids:
+            state, _, attempts = states.get(str(url_id), (self.PENDING, None, 0))
+            if state in (self.PARSED, self.REJECTED):
+                continue
+            if state == self.FAILED and not self.retry_policy.should_retry(attempts):
+                continue
+            remaining.append(url_id)
+        self.logger.info(f"{len(remaining)} unfinished URL_IDs found in the crawl journal")
+        return remaining
+
+    def close(self):
+        """
+        Closes the connection to the journal.
+        """
+        self.connection.close()
+
+
+if __name__ == '__main__':
+    journal = CrawlJournal()
+    for url_id, (state, error, attempts) in journal.states().items():
+        print(url_id, state, attempts, error or '')
+    journal.close()
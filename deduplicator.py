@@ -0,0 +1,156 @@
+"""
+This module provides a ContentDeduplicator class that fingerprints the extracted texts before they are analyzed,
+so that mirrored or syndicated articles are not tokenized and scored again.
+
+Two fingerprints are computed for every text:
+- an exact fingerprint, the SHA-256 hash of the lower cased text. Documents with the same exact fingerprint
+  get the same analysis measures, so the measures of the first one are reused for the others.
+- a 64 bit SimHash over the word 3-shingles of the text. Documents whose SimHashes differ in only a few bits
+  are near duplicates (e.g. the same article with a different header), they are flagged but still analyzed.
+
+Near duplicate candidates are found with a banded index: the SimHash is split into four 16 bit bands and
+two SimHashes within a Hamming distance of 3 always share at least one band.
+
+The SimHash adds up the bits of the shingle hashes byte by byte: a lookup table spreads the 8 bits of a byte
+into 8 counters of 32 bits packed in one integer, so a shingle costs 8 integer additions instead of 64 bit tests.
+
+Only the results of the most recently analyzed texts are cached (max_cached_results), so the memory use does
+not grow with the corpus. An exact duplicate whose original result was evicted is analyzed again.
+
+Classes:
+    ContentDeduplicator: Fingerprints texts, caches analysis results by exact fingerprint and flags near duplicates.
+
+Example:
+    deduplicator = ContentDeduplicator()
+    digest, original_id = deduplicator.check_exact(url_id, text)
+"""
+
+import re
+import hashlib
+from collections import OrderedDict
+from logger import Logger
+
+WORD = re.compile(r'\w+')
+# SPREAD[byte] holds bit i of the byte in the 32 bit counter i of a packed integer
+SPREAD = tuple(sum(1 << (32 * i) for i in range(8) if byte >> i & 1) for byte in range(256))
+COUNTER_MASK = 0xFFFFFFFF
+
+
+class ContentDeduplicator:
+    """
+    A class that detects exact and near duplicate texts and caches analysis results of exact duplicates.
+    """
+
+    BANDS = 4
+    BAND_BITS = 16
+
+    def __init__(self, max_distance=3, flag_near_duplicates=True, max_cached_results=1024):
+        """
+        Initializes the ContentDeduplicator object.
+
+        Args:
+            max_distance (int): The largest Hamming distance between two SimHashes of near duplicates,
+                at most BANDS - 1 so that the banded index finds every pair.
+            flag_near_duplicates (bool): If False only exact duplicates are detected.
+            max_cached_results (int): The number of analysis results kept for exact duplicates, the least
+                recently used ones are evicted first.
+        """
+        self.logger = Logger(__name__, 'deduplicator.log', log_to_console=True).logger
+        self.max_distance = min(max_distance, self.BANDS - 1)
+        self.flag_near_duplicates = flag_near_duplicates
+        # exact fingerprint -> URL_ID of the first document with that text
+        self.originals = {}
+        # (exact fingerprint, lexicon version) -> analysis result of the first document, least recently used first
+        self.results = OrderedDict()
+        self.max_cached_results = max_cached_results
+        # (band number, band value) -> list of (simhash, URL_ID)
+        self.bands = {}
+        self.near_duplicates = []
+
+    @staticmethod
+    def exact_fingerprint(text):
+        """
+        Returns the SHA-256 hash of the lower cased text, the text the analyzers work on.
+        """
+        return hashlib.sha256(text.lower().encode('utf-8')).hexdigest()
+
+    @staticmethod
+    def simhash(text, shingle_size=3):
+        """
+        Returns the 64 bit SimHash of the word shingles of the text.
+        """
+        words = WORD.findall(text.lower())
+        shingles = [' '.join(words[i:i + shingle_size]) for i in range(max(1, len(words) - shingle_size + 1))]
+        # counts[k] packs the number of set bits of byte k of the shingle hashes, one 32 bit counter per bit
+        counts = [0] * 8
+        blake2b = hashlib.blake2b
+        for shingle in shingles:
+            for k, byte in enumerate(blake2b(shingle.encode('utf-8'), digest_size=8).digest()):
+                counts[k] += SPREAD[byte]
+        # a bit of the SimHash is set if it is set in more than half of the shingle hashes,
+        # byte k of the big endian hash holds the bits 8 * (7 - k) to 8 * (7 - k) + 7
+        value = 0
+        for k, packed in enumerate(counts):
+            for i in range(8):
+                if 2 * (packed >> (32 * i) & COUNTER_MASK) > len(shingles):
+                    value |= 1 << (8 * (7 - k) + i)
+        return value
+
+    def check_exact(self, url_id, text):
+        """
+        Computes the exact fingerprint of a text and remembers the first URL_ID it was seen with.
+
+        Returns:
+            tuple: The exact fingerprint and the URL_ID of the earlier document with the same text,
+                or None if the text is new.
+        """
+        digest = self.exact_fingerprint(text)
+        original_id = self.originals.setdefault(digest, url_id)
+        if original_id == url_id:
+            return digest, None
+        self.logger.info(f"URL_ID {url_id} is an exact duplicate of URL_ID {original_id}")
+        return digest, original_id
+
+    def check_near(self, url_id, text):
+        """
+        Computes the SimHash of a text, adds it to the index and flags the nearest earlier near duplicate.
+
+        Returns:
+            tuple: The URL_ID of the nearest earlier near duplicate and the Hamming distance,
+                or None if there is none.
+        """
+        if not self.flag_near_duplicates:
+            return None
+        value = self.simhash(text)
+        mask = (1 << self.BAND_BITS) - 1
+        nearest = None
+        keys = [(band, value >> (band * self.BAND_BITS) & mask) for band in range(self.BANDS)]
+        for key in keys:
+            for other_value, other_id in self.bands.get(key, []):
+                distance = bin(value ^ other_value).count('1')
+                if distance <= self.max_distance and (nearest is None or distance < nearest[1]):
+                    nearest = (other_id, distance)
+        for key in keys:
+            self.bands.setdefault(key, []).append((value, url_id))
+        if nearest:
+            self.near_duplicates.append((url_id, *nearest))
+            self.logger.info(f"URL_ID {url_id} is a near duplicate of URL_ID {nearest[0]} (distance {nearest[1]})")
+        return nearest
+
+    def cached_result(self, digest, lexicon_version=None):
+        """
+        Returns the analysis result cached for an exact fingerprint and lexicon version, or None.
+        """
+        result = self.results.get((digest, lexicon_version))
+        if result is not None:
+            self.results.move_to_end((digest, lexicon_version))
+        return result
+
+    def cache_result(self, digest, result, lexicon_version=None):
+        """
+        Caches the analysis result of a text for its exact fingerprint and the lexicon version it was scored with.
+        """
+        self.results[(digest, lexicon_version)] = result
+        self.results.move_to_end((digest, lexicon_version))
+        while len(self.results) > self.max_cached_results:
+            self.results.popitem(last=False)
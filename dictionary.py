@@ -62,6 +62,23 @@ class DictionaryCreator:
         except Exception as e:
             self.logger.exception(f'Error while creating negative word dictionary: {e}')
 
+    def phrase_dict(self, file_name):
+        """
+        This method will return the multi-word entries (phrases) of a MasterDictionary file.
+        The word dictionaries split every entry into single words, so phrases are read line by line here.
+        """
+        try:
+            phrase_path = self.Path_Helper.get_MasterDictionary_path(file_name)
+
+            with open(phrase_path) as f:
+                phrases = {' '.join(line.split()) for line in f if len(line.split()) > 1 and not line.startswith(';')}
+
+            self.logger.info(f'{len(phrases)} phrases read from {file_name}')
+            return sorted(phrases)
+        except Exception as e:
+            self.logger.exception(f'Error while reading phrases from {file_name}: {e}')
+            return []
+
 
 if __name__ == '__main__':
     dict_creator = DictionaryCreator()
@@ -0,0 +1,266 @@
+"""
+This module provides a HostScheduler class that spreads the requests of a crawl politely over the hosts
+of the URLs, instead of firing every request at once.
+
+Every host gets its own queue of waiting requests, a token bucket limiting its request rate and a
+concurrency limit that is adapted with AIMD (additive increase, multiplicative decrease):
+- a fast, successful response raises the concurrency limit of the host by a small step,
+- a slow response, a timeout, a connection error or a rate limiting response (429/503) halves it.
+A Retry-After header on a rate limiting response pauses the whole host for the given time. Other errors of a
+fetch, e.g. a rejected page or the time limit of a PipelineBudget, are not back pressure of the server: they are
+counted, but the concurrency limit of the host stays as it is.
+
+A request holds a slot of its host from the moment it is admitted until its fetch is done, also while it waits
+for a token. The slot is given back even if the waiting or fetching task is cancelled (e.g. by a timeout),
+otherwise the host would run out of slots.
+
+The scheduler can be tried against the local stand-in server of the rate_limit_server module, which answers
+with 429 and Retry-After when its rate or concurrency limit is exceeded.
+
+Classes:
+    RateLimited: The exception raised by a fetch function when the server answers with 429 or 503.
+    TokenBucket: A token bucket limiting the request rate of a host.
+    HostState: The queue, rate limit and concurrency limit of a single host.
+    HostScheduler: Runs fetch coroutines under the politeness rules of their host.
+
+Example:
+    scheduler = HostScheduler(rate=2.0)
+    page_html = await scheduler.run(url_link, fetch_url)
+"""
+
+import asyncio
+import time
+from email.utils import parsedate_to_datetime
+from urllib.parse import urlsplit
+from logger import Logger
+
+# the errors of a fetch that signal a congested host, connection errors are OSErrors
+CONGESTION_ERRORS = (asyncio.TimeoutError, OSError)
+
+
+class RateLimited(Exception):
+    """
+    Raised when a server answers with a rate limiting status (429 or 503).
+    """
+
+    def __init__(self, status, retry_after=None):
+        super().__init__(f"HTTP {status}, retry after {retry_after} seconds")
+        self.status = status
+        self.retry_after = retry_after
+
+    @staticmethod
+    def parse_retry_after(value):
+        """
+        Converts a Retry-After header value (seconds or an HTTP date) to a number of seconds.
+
+        Returns:
+            float: The number of seconds to wait, or None if the value can not be parsed.
+        """
+        if not value:
+            return None
+        try:
+            return max(0.0, float(value))
+        except ValueError:
+            pass
+        try:
+            return max(0.0, parsedate_to_datetime(value).timestamp() - time.time())
+        except (TypeError, ValueError):
+            return None
+
+
+class TokenBucket:
+    """
+    A token bucket that allows `rate` requests per second with bursts of up to `capacity` requests.
+    """
+
+    def __init__(self, rate, capacity):
+        self.rate = rate
+        self.capacity = capacity
+        self.tokens = capacity
+        self.updated = time.monotonic()
+
+    def wait_time(self):
+        """
+        Takes a token if one is available.
+
+        Returns:
+            float: 0 if a token was taken, otherwise the number of seconds until the next token is available.
+        """
+        now = time.monotonic()
+        self.tokens = min(self.capacity, self.tokens + (now - self.updated) * self.rate)
+        self.updated = now
+        if self.tokens >= 1:
+            self.tokens -= 1
+            return 0.0
+        return (1 - self.tokens) / self.rate
+
+
+class HostState:
+    """
+    A class that holds the queue, the rate limit and the adaptive concurrency limit of a single host.
+    """
+
+    def __init__(self, rate, burst, concurrency):
+        self.bucket = TokenBucket(rate, burst)
+        self.concurrency = concurrency
+        self.in_flight = 0
+        self.blocked_until = 0.0
+        self.latency = None
+        self.requests = 0
+        self.errors = 0
+        # requests waiting for a free slot of this host form its queue
+        self.slot_free = asyncio.Condition()
+
+
+class HostScheduler:
+    """
+    A class that runs fetch coroutines with a per host token bucket and an AIMD concurrency limit.
+    """
+
+    def __init__(self, rate=2.0, burst=4, initial_concurrency=2, min_concurrency=1, max_concurrency=16,
+                 latency_target=2.0, max_retries=3):
+        """
+        Initializes the HostScheduler object.
+
+        Args:
+            rate (float): The number of requests per second allowed per host.
+            burst (int): The number of requests a host may receive in a burst.
+            initial_concurrency (int): The number of parallel requests per host at the start.
+            min_concurrency (int): The lower bound of the adaptive concurrency limit.
+            max_concurrency (int): The upper bound of the adaptive concurrency limit.
+            latency_target (float): Responses slower than this many seconds decrease the concurrency limit.
+            max_retries (int): How often a rate limited request is retried before RateLimited is raised.
+        """
+        self.logger = Logger(__name__, 'host_scheduler.log', log_to_console=True).logger
+        self.rate = rate
+        self.burst = burst
+        self.initial_concurrency = initial_concurrency
+        self.min_concurrency = min_concurrency
+        self.max_concurrency = max_concurrency
+        self.latency_target = latency_target
+        self.max_retries = max_retries
+        self.hosts = {}
+
+    def host_state(self, url_link):
+        """
+        Returns the state of the host of the given URL, creating it on first use.
+        """
+        host = urlsplit(url_link).netloc.lower()
+        if host not in self.hosts:
+            self.hosts[host] = HostState(self.rate, self.burst, self.initial_concurrency)
+        return self.hosts[host]
+
+    async def acquire(self, state):
+        """
+        Waits until the host has a free slot, is not paused by a Retry-After and has a token left.
+        If the waiting task is cancelled after it took the slot, the slot is given back.
+        """
+        async with state.slot_free:
+            await state.slot_free.wait_for(lambda: state.in_flight < int(state.concurrency))
+            state.in_flight += 1
+        try:
+            while True:
+                delay = max(state.blocked_until - time.monotonic(), state.bucket.wait_time())
+                if delay <= 0:
+                    return
+                await asyncio.sleep(delay)
+        except BaseException:
+            await self.release(state)
+            raise
+
+    async def release(self, state):
+        """
+        Gives back the slot of a request and wakes the requests waiting for one.
+        The slot is given back before the first await and the waiters are woken in a shielded task,
+        so a cancellation of the releasing task can not lose the slot.
+        """
+        state.in_flight -= 1
+        await asyncio.shield(self.notify_slot_free(state))
+
+    @staticmethod
+    async def notify_slot_free(state):
+        async with state.slot_free:
+            state.slot_free.notify_all()
+
+    def record_success(self, state, latency):
+        """
+        Updates the latency estimate of a host and increases its concurrency limit additively
+        if the response was fast enough, otherwise decreases it multiplicatively.
+        """
+        state.requests += 1
+        state.latency = latency if state.latency is None else 0.8 * state.latency + 0.2 * latency
+        if state.latency <= self.latency_target:
+            state.concurrency = min(self.max_concurrency, state.concurrency + 1 / state.concurrency)
+        else:
+            state.concurrency = max(self.min_concurrency, state.concurrency / 2)
+
+    @staticmethod
+    def record_error(state):
+        """
+        Counts a failed request of a host whose failure is not caused by congestion, without changing its limits.
+        """
+        state.requests += 1
+        state.errors += 1
+
+    def record_failure(self, state, retry_after=None):
+        """
+        Decreases the concurrency limit of a host multiplicatively and pauses it for `retry_after` seconds.
+        """
+        self.record_error(state)
+        state.concurrency = max(self.min_concurrency, state.concurrency / 2)
+        if retry_after:
+            state.blocked_until = max(state.blocked_until, time.monotonic() + retry_after)
+
+    async def run(self, url_link, fetch, timeout=None):
+        """
+        Runs `fetch(url_link)` under the politeness rules of the host of the URL.
+        Rate limited requests are retried after the Retry-After time (or an exponential backoff).
+        Timeouts and connection errors decrease the concurrency limit of the host, other errors only give
+        back the slot.
+
+        Args:
+            url_link (str): The URL to fetch.
+            fetch (callable): A coroutine function fetching a URL, it raises RateLimited on 429/503 and
+                ConnectionError (or another OSError) if the connection fails.
+            timeout (float): An optional time limit of each fetch in seconds. It starts when the request has
+                its slot and token, so the time spent in the queue of the host does not count.
+
+        Returns:
+            The result of the fetch function.
+
+        Raises:
+            asyncio.TimeoutError: If a fetch takes longer than the timeout.
+        """
+        state = self.host_state(url_link)
+        for attempt in range(self.max_retries + 1):
+            await self.acquire(state)
+            started = time.monotonic()
+            try:
+                result = await asyncio.wait_for(fetch(url_link), timeout)
+                self.record_success(state, time.monotonic() - started)
+                return result
+            except RateLimited as e:
+                retry_after = e.retry_after if e.retry_after is not None else 2 ** attempt
+                self.record_failure(state, retry_after)
+                self.logger.error(f"{url_link} rate limited (attempt {attempt + 1}), "
+                                  f"host paused for {retry_after} seconds")
+                if attempt == self.max_retries:
+                    raise
+            except CONGESTION_ERRORS as e:
+                self.record_failure(state)
+                self.logger.error(f"{url_link} failed, host concurrency decreased: {e!r}")
+                raise
+            except Exception as e:
+                self.record_error(state)
+                self.logger.error(f"{url_link} failed: {e!r}")
+                raise
+            finally:
+                await self.release(state)
+
+    def statistics(self):
+        """
+        Returns the request count, error count, latency estimate and concurrency limit of every host.
+        """
+        return {host: {'requests': state.requests, 'errors': state.errors,
+                       'latency': state.latency, 'concurrency': state.concurrency}
+                for host, state in self.hosts.items()}
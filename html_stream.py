@@ -0,0 +1,120 @@
+"""
+This module provides helpers to read an HTML response body incrementally.
+
+Classes:
+    ContentRejected: The exception raised when a response is not HTML or exceeds the size limit.
+    TruncatedHtml: The HTML of a page whose reading stopped early, a str marked as truncated.
+    ContentDivTracker: Follows the nesting of <div> tags in streamed HTML and reports when the
+        article content div ('td-post-content') has been closed, so that reading can stop early.
+
+Functions:
+    sniff_charset: Detects the charset declared in a <meta> tag at the start of an HTML document.
+    looks_like_html: Checks if the first bytes of a body without Content-Type header are markup.
+
+Example:
+    tracker = ContentDivTracker()
+    for chunk in chunks:
+        if tracker.feed(chunk):
+            break
+"""
+
+import re
+
+HTML_CONTENT_TYPES = ('text/html', 'application/xhtml+xml')
+
+META_CHARSET = re.compile(rb'<meta[^>]+charset=["\']?([A-Za-z0-9_\-:.]+)', re.IGNORECASE)
+DIV_TAG = re.compile(r'<(/?)div\b([^>]*)>', re.IGNORECASE)
+
+
+class ContentRejected(Exception):
+    """
+    Raised when a response is not HTML or its body is larger than the configured limit.
+    """
+
+
+class TruncatedHtml(str):
+    """
+    The HTML of a page whose reading stopped after the content div. It is used like a str; stores that keep
+    the raw HTML check its truncated attribute, so that the stored page is known to miss its end.
+    """
+
+    truncated = True
+
+
+def looks_like_html(head):
+    """
+    Checks if the first bytes of a body start like markup (a tag, a doctype or a comment),
+    for responses without a Content-Type header.
+
+    Args:
+        head (bytes): The first bytes of the body.
+
+    Returns:
+        bool: True if the body starts with '<' after an optional byte order mark and white space.
+    """
+    return head.removeprefix(b'\xef\xbb\xbf').lstrip().startswith(b'<')
+
+
+def sniff_charset(head, default='utf-8'):
+    """
+    Detects the charset declared by a <meta> tag in the first bytes of an HTML document.
+
+    Args:
+        head (bytes): The first bytes of the document.
+        default (str): The charset used if none is declared.
+
+    Returns:
+        str: The name of the charset.
+    """
+    match = META_CHARSET.search(head)
+    if match:
+        return match.group(1).decode('ascii')
+    return default
+
+
+class ContentDivTracker:
+    """
+    A class that follows the <div> nesting of streamed HTML to find the end of the content div.
+    """
+
+    def __init__(self, content_class='td-post-content'):
+        """
+        Initializes the ContentDivTracker object.
+
+        Args:
+            content_class (str): The class of the div that holds the article content.
+        """
+        self.content_class = re.compile(r'class\s*=\s*["\'][^"\']*\b' + re.escape(content_class) + r'\b')
+        self.carry = ''
+        self.depth = 0
+        self.started = False
+        self.closed = False
+
+    def feed(self, text):
+        """
+        Processes the next decoded piece of the document.
+
+        Args:
+            text (str): The next piece of the decoded HTML.
+
+        Returns:
+            bool: True once the content div has been closed.
+        """
+        if self.closed:
+            return True
+        buffer = self.carry + text
+        # only complete tags are processed, a tag cut at the end of the piece is kept for the next one
+        end = buffer.rfind('>') + 1
+        self.carry = buffer[end:]
+        for match in DIV_TAG.finditer(buffer, 0, end):
+            closing, attributes = match.groups()
+            if not self.started:
+                if not closing and self.content_class.search(attributes):
+                    self.started = True
+                    self.depth = 1
+                continue
+            self.depth += -1 if closing else 1
+            if self.depth == 0:
+                self.closed = True
+                return True
+        return False
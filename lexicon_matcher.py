@@ -0,0 +1,179 @@
+"""
+This module provides a LexiconMatcher class, a token level Aho-Corasick automaton that finds the entries
+of several lexicons in a stream of tokens in a single linear scan.
+
+Each lexicon is a category (e.g. 'positive', 'negative', 'pronoun') with a collection of entries.
+An entry is a single word or a phrase of several words separated by whitespace. Scanning a token list
+reports, for every category, how many entries were found. Within a category the matches are leftmost-longest
+and do not overlap: a token is counted in at most one entry of a category, so with the entries 'good' and
+'very good' the tokens 'very good' count once. Categories are counted independently of each other.
+
+Matching is done on lower cased tokens. Entries of case sensitive categories are only counted if the
+matched tokens are exactly equal to the entry, entries of case insensitive categories ignore the case.
+
+Classes:
+    LexiconMatcher: Compiles lexicons into an automaton and counts their matches in a token list.
+
+Constants:
+    PERSONAL_PRONOUNS: The personal pronouns counted by the ReadabilityAnalyzer.
+    COUNTRY_US: The word US, which is not counted as personal pronoun.
+
+Example:
+    matcher = LexiconMatcher({'positive': ['good', 'very good'], 'negative': ['bad']})
+    counts = matcher.scan(['a', 'very', 'good', 'day'])
+    # counts == {'positive': 1, 'negative': 0}
+"""
+
+from collections import deque
+
+PERSONAL_PRONOUNS = ('i', 'we', 'my', 'our', 'ours', 'us')
+COUNTRY_US = ('US',)
+
+
+class LexiconMatcher:
+    """
+    A class that counts the matches of several lexicons in a list of tokens with one Aho-Corasick scan.
+    """
+
+    def __init__(self, lexicons, ignore_case=()):
+        """
+        Initializes the LexiconMatcher object and compiles the automaton.
+
+        Args:
+            lexicons (dict): A dictionary mapping a category name to an iterable of entries.
+            ignore_case (iterable): The categories whose entries are matched case insensitively.
+        """
+        self.categories = tuple(lexicons)
+        self.ignore_case = frozenset(ignore_case)
+        # goto[state] maps a lower cased token to the next state, outputs[state] holds the
+        # (category, entry tokens, case sensitive) tuples ending in that state
+        self.goto = [{}]
+        self.fail = [0]
+        self.outputs = [[]]
+
+        for category, entries in lexicons.items():
+            case_sensitive = category not in self.ignore_case
+            for entry in entries:
+                tokens = tuple(entry.split())
+                if tokens:
+                    self._add(category, tokens, case_sensitive)
+        self.has_phrases = any(len(entry) > 1 for outputs in self.outputs for _, entry, _ in outputs)
+        self._compile()
+
+    def __len__(self):
+        """
+        Returns the number of states of the automaton.
+        """
+        return len(self.goto)
+
+    def _add(self, category, tokens, case_sensitive):
+        """
+        Adds an entry to the trie of the automaton.
+        """
+        state = 0
+        for token in tokens:
+            token = token.lower()
+            next_state = self.goto[state].get(token)
+            if next_state is None:
+                next_state = len(self.goto)
+                self.goto[state][token] = next_state
+                self.goto.append({})
+                self.fail.append(0)
+                self.outputs.append([])
+            state = next_state
+        if not case_sensitive:
+            tokens = tuple(token.lower() for token in tokens)
+        output = (category, tokens, case_sensitive)
+        if output not in self.outputs[state]:
+            self.outputs[state].append(output)
+
+    def _compile(self):
+        """
+        Computes the failure links in breadth first order and merges the outputs of each state
+        with the outputs of its failure state.
+        """
+        queue = deque(self.goto[0].values())
+        while queue:
+            state = queue.popleft()
+            for token, next_state in self.goto[state].items():
+                queue.append(next_state)
+                fail_state = self.fail[state]
+                while fail_state and token not in self.goto[fail_state]:
+                    fail_state = self.fail[fail_state]
+                fail_state = self.goto[fail_state].get(token, 0)
+                self.fail[next_state] = fail_state if fail_state != next_state else 0
+                self.outputs[next_state] = self.outputs[next_state] + self.outputs[self.fail[next_state]]
+
+    def find(self, tokens):
+        """
+        Finds the counted matches in the given tokens with one scan of the automaton.
+
+        Args:
+            tokens (list): The tokens to scan.
+
+        Returns:
+            list: (category, start, end) tuples, the matched tokens are tokens[start:end]. Without phrase
+                entries every match is counted, otherwise the leftmost-longest non-overlapping matches
+                of each category are kept.
+        """
+        found = []
+        goto = self.goto
+        fail = self.fail
+        outputs = self.outputs
+        state = 0
+        for position, token in enumerate(tokens):
+            token_lower = token.lower()
+            while state and token_lower not in goto[state]:
+                state = fail[state]
+            state = goto[state].get(token_lower, 0)
+            for category, entry, case_sensitive in outputs[state]:
+                start = position + 1 - len(entry)
+                if case_sensitive and tuple(tokens[start:position + 1]) != entry:
+                    continue
+                found.append((category, start, position + 1))
+        if not self.has_phrases:
+            # single word matches can not overlap within a category
+            return found
+        selected = []
+        taken_end = dict.fromkeys(self.categories, 0)
+        for category, start, end in sorted(found, key=lambda match: (match[1], -match[2])):
+            if start >= taken_end[category]:
+                selected.append((category, start, end))
+                taken_end[category] = end
+        return selected
+
+    def scan(self, tokens):
+        """
+        Counts the matches of every category in the given tokens.
+
+        Args:
+            tokens (list): The tokens to scan.
+
+        Returns:
+            dict: A dictionary mapping every category to its number of matches.
+        """
+        counts = dict.fromkeys(self.categories, 0)
+        for category, _, _ in self.find(tokens):
+            counts[category] += 1
+        return counts
+
+    def token_matches(self, tokens):
+        """
+        Counts the matches of every category per token, a match is counted at the token it ends with.
+        The sum of the list of a category is its count returned by scan.
+
+        Args:
+            tokens (list): The tokens to scan.
+
+        Returns:
+            dict: A dictionary mapping every category to a list with the number of matches ending at each token.
+        """
+        matches = {category: [0] * len(tokens) for category in self.categories}
+        for category, _, end in self.find(tokens):
+            matches[category][end - 1] += 1
+        return matches
+
+
+if __name__ == '__main__':
+    lexicon_matcher = LexiconMatcher({'pronoun': PERSONAL_PRONOUNS, 'us': COUNTRY_US}, ignore_case=['pronoun'])
+    print(lexicon_matcher.scan(['We', 'went', 'to', 'the', 'US', 'with', 'us']))
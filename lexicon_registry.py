@@ -0,0 +1,160 @@
+"""
+This module provides a LexiconRegistry class that holds the lexicons used for the sentiment analysis and
+allows additional domain lexicons to be registered and all lexicons to be reloaded at runtime.
+
+A reload reads every source again and builds a new, immutable Lexicon snapshot, by default in a background
+thread. The finished snapshot is swapped in with a single assignment, so running analyses keep using the
+snapshot they started with and never see a half-built lexicon. Every snapshot has a version number that is
+incremented on each reload, it can be used as part of the key of result caches.
+
+Classes:
+    Lexicon: An immutable snapshot of all lexicons and their compiled matcher.
+    LexiconRegistry: A Singleton that registers lexicon sources and reloads them with a copy-on-write swap.
+
+Example:
+    registry = LexiconRegistry()
+    registry.register_lexicon('finance-positive', '/path/to/finance-positive.txt', category='positive')
+    registry.reload()
+    lexicon = registry.lexicon
+    counts = lexicon.matcher.scan(words)
+"""
+
+import threading
+from types import MappingProxyType
+from logger import Logger
+from path_helper import Singleton
+from dictionary import DictionaryCreator
+from lexicon_matcher import LexiconMatcher
+
+
+class Lexicon:
+    """
+    An immutable snapshot of the lexicons. It is never changed after it has been built.
+    """
+
+    def __init__(self, version, entries):
+        """
+        Initializes the Lexicon object and compiles its matcher.
+
+        Args:
+            version (int): The version number of the snapshot.
+            entries (dict): A dictionary mapping a category name to the entries of that category.
+        """
+        self.version = version
+        self.entries = MappingProxyType({category: frozenset(words) for category, words in entries.items()})
+        self.matcher = LexiconMatcher(self.entries)
+
+
+class LexiconRegistry(metaclass=Singleton):
+    """
+    A class that registers lexicon sources and swaps in freshly built Lexicon snapshots on reload.
+    """
+
+    def __init__(self):
+        """
+        Initializes the LexiconRegistry object and builds the first snapshot from the MasterDictionary.
+        """
+        self.logger = Logger(__name__, 'lexicon_registry.log', log_to_console=True).logger
+        # registered sources are (category, path) tuples keyed by the lexicon name
+        self.sources = {}
+        self.stop_word_sources = []
+        self.reload_lock = threading.Lock()
+        self.version = 0
+        self.lexicon = self.build_lexicon()
+
+    def register_lexicon(self, name, path, category=None):
+        """
+        Registers an additional lexicon file with one entry (word or phrase) per line.
+        The lexicon is used from the next reload on.
+
+        Args:
+            name (str): The name of the lexicon, registering the same name again replaces the source.
+            path (str): The path of the lexicon file.
+            category (str): The category the entries are counted in, e.g. 'positive' or 'negative'.
+                By default the name of the lexicon is used as its own category.
+        """
+        self.sources[name] = (category or name, path)
+        self.logger.info(f"Lexicon {name} registered from {path}")
+
+    def register_stop_words(self, path):
+        """
+        Registers an additional stop words file, its words are removed from every lexicon from the next reload on.
+        """
+        self.stop_word_sources.append(path)
+        self.logger.info(f"Stop words registered from {path}")
+
+    def read_entries(self, path):
+        """
+        Reads the entries of a lexicon file, ignoring empty lines and comments starting with ';'.
+        """
+        with open(path, encoding='utf-8') as f:
+            return {' '.join(line.split()) for line in f if line.strip() and not line.startswith(';')}
+
+    def build_lexicon(self):
+        """
+        Reads all the lexicon sources and builds a new Lexicon snapshot with the next version number.
+
+        Returns:
+            Lexicon: The new snapshot.
+        """
+        dictionary_creator = DictionaryCreator()
+        entries = {
+            'positive': set(dictionary_creator.positive_dict() or [])
+            | set(dictionary_creator.phrase_dict('positive-words.txt')),
+            'negative': set(dictionary_creator.negative_dict() or [])
+            | set(dictionary_creator.phrase_dict('negative-words.txt'))
+        }
+        for name, (category, path) in self.sources.items():
+            try:
+                entries.setdefault(category, set()).update(self.read_entries(path))
+            except Exception as e:
+                self.logger.error(f"Lexicon {name} could not be read from {path}: {e}")
+
+        stop_words = set()
+        for path in self.stop_word_sources:
+            try:
+                with open(path, encoding='utf-8') as f:
+                    stop_words.update(f.read().lower().split())
+            except Exception as e:
+                self.logger.error(f"Stop words could not be read from {path}: {e}")
+        if stop_words:
+            entries = {category: {entry for entry in words if entry not in stop_words}
+                       for category, words in entries.items()}
+
+        self.version += 1
+        lexicon = Lexicon(self.version, entries)
+        self.logger.info(f"Lexicon version {lexicon.version} built successfully")
+        return lexicon
+
+    def _reload(self):
+        """
+        Builds a new snapshot and swaps it in. Reloads are serialized, readers are never blocked.
+        """
+        with self.reload_lock:
+            try:
+                self.lexicon = self.build_lexicon()
+            except Exception as e:
+                self.logger.exception(f"Failed to reload the lexicons, keeping version {self.lexicon.version}: {e}")
+
+    def reload(self, background=True):
+        """
+        Reloads all the lexicon sources.
+
+        Args:
+            background (bool): If True the new snapshot is built in a background thread.
+
+        Returns:
+            threading.Thread: The thread building the snapshot, or None if the reload ran in the foreground.
+        """
+        if not background:
+            self._reload()
+            return None
+        thread = threading.Thread(target=self._reload, name='lexicon-reload', daemon=True)
+        thread.start()
+        return thread
+
+
+if __name__ == '__main__':
+    lexicon_registry = LexiconRegistry()
+    lexicon_registry.reload(background=False)
+    print(lexicon_registry.lexicon.version)
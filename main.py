@@ -3,15 +3,26 @@ import asyncio
 import time
 from web_content_extractor import WebContentExtractor
 from text_file_analyzer_loader import TextFileAnalyzerLoader
+from crawl_journal import CrawlJournal
+from host_scheduler import HostScheduler
+from text_file_writer import TextFileWriter
+from pipeline_budget import PipelineBudget
+from output_sink import OutputSink
 
 if __name__ == '__main__':
     # file_path = "Input.xlsx"
     filepath = os.path.abspath(os.path.join(os.getcwd(), os.pardir, 'Input.xlsx'))
-    web_extractor = WebContentExtractor()
-    asyncio.run(web_extractor.extract_all_pages(filepath))
+    text_file_writer = TextFileWriter()
+    web_extractor = WebContentExtractor(scheduler=HostScheduler(), writer=text_file_writer, budget=PipelineBudget())
+    asyncio.run(web_extractor.extract_all_pages(filepath, CrawlJournal()))
+    text_file_writer.close()
 
     # wait for 5 seconds before running the next module
     time.sleep(10)
 
+    # the results are streamed into the output sink and compacted into the workbook at the end
+    output_path = os.path.abspath(os.path.join(os.getcwd(), os.pardir, 'output.xlsx'))
+    output_sink = OutputSink()
     df = TextFileAnalyzerLoader()
-    df.merge_data()
+    df.merge_data(output_path, sink=output_sink)
+    output_sink.close()
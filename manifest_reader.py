@@ -0,0 +1,137 @@
+"""
+This module provides a ManifestReader class that reads the URL manifest (Input.xlsx or a CSV file) lazily,
+row by row, instead of loading it into a pandas DataFrame.
+
+Excel workbooks are opened with openpyxl in read only mode, which parses the sheet XML while it is iterated,
+CSV files are read with the csv module. The memory use and the time until the first row is available
+do not depend on the number of rows of the manifest.
+
+Classes:
+    ManifestReader: Iterates the (URL_ID, URL) rows of a manifest.
+
+Example:
+    for url_id, url_link in ManifestReader('Input.xlsx'):
+        ...
+"""
+
+import csv
+import os
+from itertools import islice
+from logger import Logger
+
+
+class ManifestReader:
+    """
+    A class that iterates the (URL_ID, URL) rows of an Excel or CSV manifest without loading it into memory.
+    """
+
+    CSV_EXTENSIONS = ('.csv', '.tsv', '.txt')
+
+    def __init__(self, filepath, url_id_column='URL_ID', url_column='URL', skip_empty=True):
+        """
+        Initializes the ManifestReader object.
+
+        Args:
+            filepath (str): The path of the manifest, an .xlsx workbook (first sheet) or a CSV file.
+            url_id_column (str): The header of the URL_ID column.
+            url_column (str): The header of the URL column, or of another column read with the URL_ID.
+            skip_empty (bool): If True rows without a value in url_column are skipped, otherwise
+                their value is None.
+        """
+        self.logger = Logger(__name__, 'manifest_reader.log', log_to_console=True).logger
+        self.filepath = filepath
+        self.url_id_column = url_id_column
+        self.url_column = url_column
+        self.skip_empty = skip_empty
+        self.rows_read = 0
+
+    def iter_rows(self):
+        """
+        Yields the values of every row of the manifest, the header first.
+        """
+        extension = os.path.splitext(self.filepath)[1].lower()
+        return self.iter_csv_rows() if extension in self.CSV_EXTENSIONS else self.iter_excel_rows()
+
+    def columns(self):
+        """
+        Returns the column headers of the manifest, reading only its first row.
+        """
+        rows = self.iter_rows()
+        header = next(rows, None)
+        rows.close()
+        return [str(name).strip() if name is not None else '' for name in header or ()]
+
+    def __iter__(self):
+        """
+        Yields a tuple (URL_ID, URL) for every row of the manifest, in file order.
+        Rows without a URL_ID, or without a URL if skip_empty is set, are skipped.
+        """
+        rows = self.iter_rows()
+        header = next(rows, None)
+        if header is None:
+            self.logger.error(f"{self.filepath} is empty")
+            return
+        header = [str(name).strip() if name is not None else '' for name in header]
+        try:
+            url_id_index = header.index(self.url_id_column)
+            url_index = header.index(self.url_column)
+        except ValueError:
+            self.logger.error(f"{self.filepath} has no {self.url_id_column} and {self.url_column} columns")
+            raise
+        self.logger.info(f"Streaming {self.filepath}")
+        for row in rows:
+            if len(row) <= max(url_id_index, url_index):
+                continue
+            url_id, url_link = row[url_id_index], row[url_index]
+            if url_id is None or url_id == '' or (not url_link and self.skip_empty):
+                continue
+            self.rows_read += 1
+            yield self.parse_url_id(url_id), str(url_link).strip() if url_link else None
+        self.logger.info(f"{self.rows_read} rows read from {self.filepath}")
+
+    def iter_batches(self, batch_size=500):
+        """
+        Yields the rows of the manifest in lists of at most batch_size rows.
+        """
+        rows = iter(self)
+        while True:
+            batch = list(islice(rows, batch_size))
+            if not batch:
+                return
+            yield batch
+
+    @staticmethod
+    def parse_url_id(url_id):
+        """
+        Returns the URL_ID as the int or float pandas would have read, so that file names and output rows
+        do not depend on the manifest format.
+        """
+        if isinstance(url_id, (int, float)):
+            return int(url_id) if float(url_id).is_integer() else url_id
+        url_id = str(url_id).strip()
+        try:
+            number = float(url_id)
+        except ValueError:
+            return url_id
+        return int(number) if number.is_integer() else number
+
+    def iter_excel_rows(self):
+        """
+        Yields the cell values of the first sheet of the workbook, one tuple per row.
+        """
+        from openpyxl import load_workbook
+        workbook = load_workbook(self.filepath, read_only=True, data_only=True)
+        try:
+            yield from workbook.worksheets[0].iter_rows(values_only=True)
+        finally:
+            workbook.close()
+
+    def iter_csv_rows(self):
+        """
+        Yields the values of the CSV file, one list per row. The delimiter is detected from the first line.
+        """
+        with open(self.filepath, newline='', encoding='utf-8-sig') as f:
+            first_line = f.readline()
+            f.seek(0)
+            delimiter = '\t' if first_line.count('\t') > first_line.count(',') else ','
+            yield from csv.reader(f, delimiter=delimiter)
@@ -0,0 +1,129 @@
+"""
+This module provides an OutputSink class that stores the analysis results in a SQLite database as soon as
+each document is analyzed, instead of holding them all in memory and rewriting the output workbook on every run.
+
+Rows are upserted by URL_ID, so analyzing a document again replaces its row. The database uses write ahead
+logging, so the results can be read (e.g. with sqlite3 or pandas) while the analysis is still running.
+The Excel deliverable is produced by a separate compaction step, only when it is asked for.
+
+Classes:
+    OutputSink: Upserts AnalysisResult rows into SQLite and compacts them into the output workbook.
+
+Example:
+    sink = OutputSink()
+    sink.write_many(text_file_analyzer.iter_results())
+    sink.compact(output_path, output_data_df)
+"""
+
+import os
+import sqlite3
+import pandas as pd
+from logger import Logger
+from analysis_result import AnalysisResult
+
+
+class OutputSink:
+    """
+    A class that upserts analysis results into a SQLite database and compacts them into an Excel file.
+    """
+
+    def __init__(self, db_path=None, batch_size=100):
+        """
+        Initializes the OutputSink object and creates the results table if it does not exist.
+
+        Args:
+            db_path (str): The path of the SQLite database, by default 'output.db' in the parent directory.
+            batch_size (int): The number of rows written per transaction by write_many.
+        """
+        self.logger = Logger(__name__, 'output_sink.log', log_to_console=True).logger
+        if db_path is None:
+            db_path = os.path.abspath(os.path.join(os.getcwd(), os.pardir, 'output.db'))
+        self.db_path = db_path
+        self.batch_size = batch_size
+        columns = ', '.join(f'"{column}"' for column in AnalysisResult.COLUMNS)
+        placeholders = ', '.join('?' for _ in AnalysisResult.COLUMNS)
+        self.upsert_sql = f'INSERT OR REPLACE INTO results ({columns}) VALUES ({placeholders})'
+        try:
+            self.connection = sqlite3.connect(self.db_path)
+            self.connection.execute('PRAGMA journal_mode=WAL')
+            column_definitions = ', '.join(['"URL_ID" TEXT PRIMARY KEY']
+                                           + [f'"{column}" NUMERIC' for column in AnalysisResult.COLUMNS[1:]])
+            self.connection.execute(f'CREATE TABLE IF NOT EXISTS results ({column_definitions})')
+            self.connection.commit()
+            self.logger.info(f"Output sink {self.db_path} opened successfully")
+        except Exception as e:
+            self.logger.exception(f"Failed to open output sink {self.db_path}: {e}")
+            raise
+
+    def write(self, result):
+        """
+        Upserts the row of a single result and commits it.
+
+        Args:
+            result (AnalysisResult): The analysis result of one document.
+        """
+        self.connection.execute(self.upsert_sql, self.to_row(result))
+        self.connection.commit()
+
+    def write_many(self, results):
+        """
+        Upserts the rows of many results, committing every batch_size rows so that finished rows become visible.
+
+        Args:
+            results (iterable): AnalysisResult objects, e.g. the generator TextFileAnalyzer.iter_results.
+
+        Returns:
+            int: The number of rows written.
+        """
+        count = 0
+        batch = []
+        for result in results:
+            batch.append(self.to_row(result))
+            if len(batch) >= self.batch_size:
+                count += self.flush(batch)
+                batch = []
+        count += self.flush(batch)
+        self.logger.info(f"{count} result rows written to {self.db_path}")
+        return count
+
+    def flush(self, batch):
+        """
+        Upserts a batch of rows in one transaction.
+        """
+        if batch:
+            self.connection.executemany(self.upsert_sql, batch)
+            self.connection.commit()
+        return len(batch)
+
+    @staticmethod
+    def to_row(result):
+        row = result.as_row()
+        return (str(row[0]),) + row[1:]
+
+    def to_dataframe(self):
+        """
+        Reads all result rows into a pandas DataFrame with the output columns.
+        """
+        text_file_df = pd.read_sql_query('SELECT * FROM results', self.connection)
+        return text_file_df.astype(AnalysisResult.DTYPES)
+
+    def compact(self, output_path, output_data_df):
+        """
+        Merges the result rows with the output data structure and writes the Excel deliverable.
+
+        Args:
+            output_path (str): The path of the output workbook.
+            output_data_df (pd.DataFrame): The URL_ID and URL columns of the output data structure.
+        """
+        try:
+            final_df = pd.merge(output_data_df, self.to_dataframe(), on="URL_ID")
+            final_df.to_excel(output_path, index=False)
+            self.logger.info(f"{len(final_df)} rows compacted into {output_path}")
+        except Exception as e:
+            self.logger.error(f"An error occurred while compacting the output sink into {output_path}: {e}")
+
+    def close(self):
+        """
+        Closes the database.
+        """
+        self.connection.close()
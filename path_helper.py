@@ -8,6 +8,7 @@ Methods:
     get_StopWords_path: Retrieves the file paths for all the StopWords files in the 'StopWords' directory.
     get_MasterDictionary_path: Retrieves the file path for a given file name in the 'MasterDictionary' directory.
     get_textfile_paths: Retrieves the file paths for all the files in the 'textfile' directory.
+    get_textfile_path: Retrieves the file path of the text file of a URL_ID in the 'textfile' directory.
 """
 
 from logger import Logger
@@ -86,7 +87,7 @@ class PathHelper(metaclass=Singleton):
             list: A list of file paths.
         """
         try:
-            directory = os.path.abspath(os.path.join(os.getcwd(), os.pardir, 'textfile'))
+            directory = self.get_textfile_path()
             textfile_filepath = []
             for filename in os.listdir(directory):
                 filepath = os.path.join(directory, filename)
@@ -98,6 +99,17 @@ class PathHelper(metaclass=Singleton):
             self.logger.error(f"Failed to retrieve text file paths: {str(e)}")
             return []
 
+    def get_textfile_path(self, url_id=None):
+        """
+        This method retrieves the path of the text file of a URL_ID in the 'textfile' directory,
+        or the path of the directory itself if no URL_ID is given.
+
+        Returns:
+            str: The file path, the file may not exist.
+        """
+        directory = os.path.abspath(os.path.join(os.getcwd(), os.pardir, 'textfile'))
+        return directory if url_id is None else os.path.join(directory, f"{url_id}")
+
 
 if __name__ == '__main__':
     path_helper = PathHelper()
@@ -0,0 +1,213 @@
+"""
+This module provides a PipelineBudget class that puts memory and latency ceilings on the crawl and the analysis,
+so that a burst of large pages can not push the memory use of a worker past its limit.
+
+The budgets are:
+- max_inflight_bytes: the bytes of pages that are fetched but not written yet. A page reserves its
+  Content-Length (or max_body_bytes when the length is unknown) before its body is read, resizes the
+  reservation to the actual size once the body is read and releases exactly that many bytes when its text
+  is written. In the analysis it limits the bytes of the texts waiting for or being analyzed by the pool.
+- max_queued_documents: the number of extracted pages waiting in the TextFileWriter queue, and the number of
+  documents in flight in the thread pool of the analysis.
+- document_timeout: the time limit in seconds for fetching a page once its host slot and token are acquired,
+  and for analyzing a document once a worker runs it. The time spent in the queue of the host or behind other
+  documents of the analysis does not count.
+
+A stage that would exceed a budget waits until earlier documents are done (backpressure). A single request
+larger than the whole budget is admitted on its own. Waits, timeouts and peaks are counted as metrics, a wait
+once per blocked request.
+
+Classes:
+    BudgetExceeded: Raised when a document runs over its time limit.
+    PipelineBudget: Enforces the budgets and records the budget metrics.
+
+Example:
+    budget = PipelineBudget(max_inflight_bytes=64 * 1024 * 1024, max_queued_documents=256, document_timeout=60)
+    web_extractor = WebContentExtractor(writer=TextFileWriter(), budget=budget)
+    text_file_analyzer = TextFileAnalyzer(backend='thread', budget=budget)
+    print(budget.statistics())
+"""
+
+import asyncio
+import threading
+import time
+from logger import Logger
+
+
+class BudgetExceeded(Exception):
+    """
+    Raised when a document runs over the time limit of a stage.
+    """
+
+
+class PipelineBudget:
+    """
+    A class that enforces in-flight byte, queued document and per document time budgets with backpressure.
+    """
+
+    def __init__(self, max_inflight_bytes=64 * 1024 * 1024, max_queued_documents=256, document_timeout=60.0):
+        """
+        Initializes the PipelineBudget object.
+
+        Args:
+            max_inflight_bytes (int): The largest number of page or text bytes held by the pipeline at a time.
+            max_queued_documents (int): The largest number of documents waiting for the next stage at a time.
+            document_timeout (float): The time limit of a document per stage in seconds, None for no limit.
+        """
+        self.logger = Logger(__name__, 'pipeline_budget.log', log_to_console=True).logger
+        self.max_inflight_bytes = max_inflight_bytes
+        self.max_queued_documents = max_queued_documents
+        self.document_timeout = document_timeout
+        self.inflight_bytes = 0
+        self.queued_documents = 0
+        self.loop = None
+        self.waiters = []
+        # the metrics are also updated by the writer thread through release_threadsafe
+        self.metrics_lock = threading.Lock()
+        self.metrics = {
+            'byte_waits': 0,
+            'document_waits': 0,
+            'wait_seconds': 0.0,
+            'oversized_documents': 0,
+            'fetch_timeouts': 0,
+            'analysis_timeouts': 0,
+            'peak_inflight_bytes': 0,
+            'peak_queued_documents': 0,
+        }
+
+    def count(self, metric, value=1):
+        with self.metrics_lock:
+            self.metrics[metric] += value
+
+    def peak(self, metric, value):
+        with self.metrics_lock:
+            self.metrics[metric] = max(self.metrics[metric], value)
+
+    async def wait_until(self, admitted, metric):
+        """
+        Waits until the admitted function returns True, counting the wait in the given metric.
+        """
+        if admitted():
+            return
+        self.loop = asyncio.get_running_loop()
+        self.count(metric)
+        started = time.monotonic()
+        while not admitted():
+            waiter = self.loop.create_future()
+            self.waiters.append(waiter)
+            await waiter
+        self.count('wait_seconds', time.monotonic() - started)
+
+    def wake_waiters(self):
+        waiters, self.waiters = self.waiters, []
+        for waiter in waiters:
+            if not waiter.done():
+                waiter.set_result(None)
+
+    async def reserve_bytes(self, nbytes):
+        """
+        Reserves in-flight bytes for a page, waiting while the reservation would exceed the budget.
+
+        Returns:
+            int: The number of bytes reserved, to be given back with release.
+        """
+        if nbytes > self.max_inflight_bytes:
+            self.count('oversized_documents')
+            nbytes = self.max_inflight_bytes
+        await self.wait_until(lambda: self.inflight_bytes == 0
+                              or self.inflight_bytes + nbytes <= self.max_inflight_bytes, 'byte_waits')
+        self.inflight_bytes += nbytes
+        self.peak('peak_inflight_bytes', self.inflight_bytes)
+        return nbytes
+
+    async def reserve_document(self):
+        """
+        Reserves a place for a document in the queue of the next stage, waiting while the queue is full.
+        """
+        await self.wait_until(lambda: self.queued_documents < self.max_queued_documents, 'document_waits')
+        self.queued_documents += 1
+        self.peak('peak_queued_documents', self.queued_documents)
+
+    def resize(self, reserved, nbytes):
+        """
+        Changes a reservation of `reserved` bytes to `nbytes` without waiting, e.g. to the size of a page
+        once its body is read. The bytes are already held, so a larger size is accounted at once.
+
+        Returns:
+            int: The number of bytes now reserved, to be given back with release.
+        """
+        nbytes = min(nbytes, self.max_inflight_bytes)
+        assert 0 <= reserved <= self.inflight_bytes, f"{reserved} bytes resized but {self.inflight_bytes} reserved"
+        self.inflight_bytes += nbytes - reserved
+        self.peak('peak_inflight_bytes', self.inflight_bytes)
+        if nbytes < reserved:
+            self.wake_waiters()
+        return nbytes
+
+    def release(self, nbytes=0, documents=0):
+        """
+        Gives back reserved bytes and document places and wakes the waiting stages.
+        Exactly the numbers that were reserved have to be given back.
+        It has to be called in the thread of the event loop, other threads use release_threadsafe.
+        """
+        assert 0 <= nbytes <= self.inflight_bytes, f"{nbytes} bytes released but {self.inflight_bytes} reserved"
+        assert 0 <= documents <= self.queued_documents, \
+            f"{documents} documents released but {self.queued_documents} reserved"
+        self.inflight_bytes -= nbytes
+        self.queued_documents -= documents
+        self.wake_waiters()
+
+    def release_threadsafe(self, nbytes=0, documents=0):
+        """
+        Gives back reserved bytes and document places from another thread, e.g. the TextFileWriter thread.
+        """
+        if self.loop is not None:
+            try:
+                self.loop.call_soon_threadsafe(self.release, nbytes, documents)
+                return
+            except RuntimeError:
+                # the loop closed, nothing waits on the budget anymore
+                pass
+        self.release(nbytes, documents)
+
+    async def run_with_timeout(self, coroutine, url_id):
+        """
+        Runs the fetch coroutine of a page under the document time limit. The extractor calls it once the page
+        has its host slot, so that the time spent in the queue of the host is not part of the limit.
+
+        Raises:
+            BudgetExceeded: If the page is not done within document_timeout seconds.
+        """
+        self.loop = asyncio.get_running_loop()
+        if not self.document_timeout:
+            return await coroutine
+        try:
+            return await asyncio.wait_for(coroutine, self.document_timeout)
+        except asyncio.TimeoutError:
+            self.count('fetch_timeouts')
+            raise BudgetExceeded(f"URL_ID {url_id} took longer than {self.document_timeout} seconds")
+
+    def analysis_admitted(self, pending_documents, pending_bytes, nbytes, waited=False):
+        """
+        Returns True if a document of nbytes can join the documents in flight in the analysis,
+        False if the analysis has to wait for the oldest one first. The wait is counted the first time a
+        document is not admitted; waited is True when the same document is checked again.
+        """
+        admitted = not pending_documents or (pending_documents < self.max_queued_documents
+                                             and pending_bytes + nbytes <= self.max_inflight_bytes)
+        if admitted:
+            self.peak('peak_queued_documents', pending_documents + 1)
+            self.peak('peak_inflight_bytes', pending_bytes + nbytes)
+        elif not waited:
+            self.count('document_waits' if pending_documents >= self.max_queued_documents else 'byte_waits')
+        return admitted
+
+    def statistics(self):
+        """
+        Returns the budget metrics and the current in-flight bytes and queued documents.
+        """
+        with self.metrics_lock:
+            statistics = dict(self.metrics)
+        statistics['inflight_bytes'] = self.inflight_bytes
+        statistics['queued_documents'] = self.queued_documents
+        return statistics
@@ -0,0 +1,138 @@
+"""
+This module provides a RateLimitServer class, a local stand-in web server that behaves like a throttling host,
+so that the HostScheduler and the WebContentExtractor can be tried without sending requests to real sites.
+
+The server answers GET requests for any path with a small article page in the layout the extractor parses
+(a title and a 'td-post-content' div). It enforces a request rate with a token bucket and a limit of parallel
+requests; a request over either limit is answered with 429 and a Retry-After header. Every response is
+delayed by a configurable latency, so the latency target of the scheduler can be exercised as well.
+It only uses the standard library (asyncio streams) and closes the connection after every response.
+
+Classes:
+    RateLimitServer: A local HTTP server that simulates rate limiting and records what it received.
+
+Example:
+    async with RateLimitServer(rate=5, max_concurrency=2) as server:
+        page_html = await HostScheduler(rate=5).run(server.url('/1'), web_extractor.fetch_url)
+        print(server.statistics())
+"""
+
+import asyncio
+import time
+from host_scheduler import TokenBucket
+
+PAGE = ('<html><head><title>Page {path} - Stand-in</title></head><body>'
+        '<div class="td-post-content"><p>Stand-in article for {path}, served at {served:.3f}.</p></div>'
+        '</body></html>')
+
+
+class RateLimitServer:
+    """
+    A class that runs a local HTTP server answering with 429 and Retry-After above its rate or concurrency limit.
+    """
+
+    def __init__(self, rate=5.0, burst=5, max_concurrency=4, latency=0.05, retry_after=1, host='127.0.0.1', port=0):
+        """
+        Initializes the RateLimitServer object, the server is started by start or by async with.
+
+        Args:
+            rate (float): The number of requests per second the server accepts.
+            burst (int): The number of requests the server accepts in a burst.
+            max_concurrency (int): The number of requests the server handles at the same time.
+            latency (float): The number of seconds every accepted request takes.
+            retry_after (int): The Retry-After value in seconds of the 429 responses, None to send no header.
+            host (str): The address the server listens on.
+            port (int): The port the server listens on, 0 for a free port.
+        """
+        self.bucket = TokenBucket(rate, burst)
+        self.max_concurrency = max_concurrency
+        self.latency = latency
+        self.retry_after = retry_after
+        self.host = host
+        self.port = port
+        self.server = None
+        self.concurrent = 0
+        self.metrics = {'requests': 0, 'served': 0, 'rate_limited': 0, 'peak_concurrency': 0}
+
+    async def start(self):
+        self.server = await asyncio.start_server(self.handle, self.host, self.port)
+        self.port = self.server.sockets[0].getsockname()[1]
+        return self
+
+    async def close(self):
+        self.server.close()
+        await self.server.wait_closed()
+
+    async def __aenter__(self):
+        return await self.start()
+
+    async def __aexit__(self, *exc_info):
+        await self.close()
+
+    def url(self, path='/'):
+        """
+        Returns the URL of a path on the server.
+        """
+        return f'http://{self.host}:{self.port}{path}'
+
+    async def handle(self, reader, writer):
+        """
+        Reads one request and answers it with the page, or with 429 if a limit is exceeded.
+        """
+        try:
+            request_line = await reader.readline()
+            while (await reader.readline()).strip():
+                pass
+            parts = request_line.decode('latin-1').split()
+            path = parts[1] if len(parts) > 1 else '/'
+            self.metrics['requests'] += 1
+            if self.concurrent >= self.max_concurrency or self.bucket.wait_time() > 0:
+                self.metrics['rate_limited'] += 1
+                headers = {'Retry-After': str(self.retry_after)} if self.retry_after is not None else {}
+                await self.respond(writer, 429, 'Too Many Requests', b'', headers)
+                return
+            self.concurrent += 1
+            self.metrics['peak_concurrency'] = max(self.metrics['peak_concurrency'], self.concurrent)
+            try:
+                await asyncio.sleep(self.latency)
+                body = PAGE.format(path=path, served=time.monotonic()).encode('utf-8')
+                await self.respond(writer, 200, 'OK', body, {'Content-Type': 'text/html; charset=utf-8'})
+                self.metrics['served'] += 1
+            finally:
+                self.concurrent -= 1
+        except (ConnectionError, asyncio.IncompleteReadError):
+            pass
+        finally:
+            writer.close()
+
+    @staticmethod
+    async def respond(writer, status, reason, body, headers):
+        lines = [f'HTTP/1.1 {status} {reason}', f'Content-Length: {len(body)}', 'Connection: close',
+                 *(f'{name}: {value}' for name, value in headers.items())]
+        writer.write(('\r\n'.join(lines) + '\r\n\r\n').encode('latin-1') + body)
+        await writer.drain()
+
+    def statistics(self):
+        """
+        Returns the number of requests received, served and rate limited, and the peak number of parallel requests.
+        """
+        return dict(self.metrics)
+
+
+if __name__ == '__main__':
+    from host_scheduler import HostScheduler
+    from web_content_extractor import WebContentExtractor
+
+    async def crawl(num_pages=20):
+        async with RateLimitServer(rate=5, burst=2, max_concurrency=2) as server:
+            scheduler = HostScheduler(rate=10, burst=4, initial_concurrency=4)
+            web_extractor = WebContentExtractor(scheduler=scheduler)
+            started = time.monotonic()
+            results = await asyncio.gather(*(scheduler.run(server.url(f'/{page}'), web_extractor.fetch_url)
+                                             for page in range(num_pages)), return_exceptions=True)
+            failed = sum(isinstance(result, Exception) for result in results)
+            print(f"{num_pages - failed} pages fetched, {failed} failed in {time.monotonic() - started:.1f} seconds")
+            print('server:', server.statistics())
+            print('scheduler:', scheduler.statistics())
+
+    asyncio.run(crawl())
@@ -0,0 +1,516 @@
+"""
+This module is a regression harness that checks that every analysis backend and mode produces exactly the
+output rows of a frozen golden corpus, and that none of them became slower than its recorded timing baseline.
+
+The golden folder ('golden' in the parent directory by default) is part of the repository and holds:
+- html/: the HTML pages of the golden documents, article pages in the layout of the site, an exact and a near
+  duplicate and a page that is not found. They are parsed again and compared with the frozen texts.
+- corpus/: the text the baseline version extracted from every page, one file per URL_ID like the 'textfile'
+  directory.
+- expected.json: the output rows (the columns of AnalysisResult.COLUMNS) the baseline version produced for the
+  pages. They never come from the code under test.
+- timings.json: the best time of every mode, recorded by the baseline command. Timings only compare on the
+  machine they were recorded on, so the file is not committed: run the baseline command on the machine that
+  runs check, with the code of the baseline version.
+
+The modes are the serial, thread and process backends, each plain and with deduplication, the serial and thread
+backends under a tight pipeline budget, the lexicon registry, the shared lexicon, a ContentStore as the source
+of the texts, the token cache (cold, warm and re-scoring the cached tokens), the word feature table (cold and
+loaded from a saved table), the analysis profiles (routed by the manifest and by language detection) and the
+segment scoring. Every cache, table and sink of a mode lives in a temporary folder. Sampled analysis is an
+estimate by design and is not part of the harness.
+
+Golden pages are added by running the baseline version on them (e.g. serving them locally and running main.py)
+and freezing what it extracted and wrote to its output workbook.
+
+Usage:
+    python regression_harness.py freeze [--output PATH] [--content-store DIR]
+    python regression_harness.py baseline [--rounds N]
+    python regression_harness.py check [--rounds N] [--tolerance T] [--slack S] [--no-timing]
+
+check exits with status 1 if any row differs from the expected rows or any mode is slower than its baseline
+by more than the tolerance (0.25 means 25% slower) plus the slack in seconds, which keeps very fast modes
+from failing on timer noise. A mode without a baseline fails as well, unless --no-timing checks the rows only.
+"""
+
+import argparse
+import csv
+import json
+import os
+import shutil
+import sys
+import tempfile
+import time
+from analysis_result import AnalysisResult
+from logger import Logger
+from text_file_analyzer import TextFileAnalyzer
+
+logger = Logger(__name__, 'regression_harness.log', log_to_console=True).logger
+
+
+def golden_folder():
+    return os.path.abspath(os.path.join(os.getcwd(), os.pardir, 'golden'))
+
+
+def read_corpus(folder):
+    """
+    Reads the golden corpus into memory.
+
+    Returns:
+        list: Tuples (URL_ID, text) sorted by URL_ID.
+    """
+    corpus_folder = os.path.join(folder, 'corpus')
+    documents = []
+    for name in os.listdir(corpus_folder):
+        with open(os.path.join(corpus_folder, name), encoding='utf-8') as f:
+            documents.append((name, f.read()))
+    return sorted(documents, key=lambda document: sort_key(document[0]))
+
+
+def sort_key(url_id):
+    url_id = str(url_id)
+    return (0, float(url_id), url_id) if url_id.replace('.', '', 1).isdigit() else (1, 0.0, url_id)
+
+
+def normalize(rows):
+    """
+    Returns the rows as lists with the URL_ID as a string, sorted by URL_ID, so that rows read from Excel,
+    JSON and AnalysisResult objects compare equal.
+    """
+    rows = [[url_id_str(row[0]), *row[1:]] for row in rows]
+    return sorted(rows, key=lambda row: sort_key(row[0]))
+
+
+def url_id_str(url_id):
+    if isinstance(url_id, float) and url_id.is_integer():
+        url_id = int(url_id)
+    return str(url_id)
+
+
+def output_rows(output_path):
+    """
+    Reads the rows of the bundled output.xlsx, keyed by URL_ID.
+    """
+    import pandas as pd
+    output_df = pd.read_excel(output_path)
+    rows = output_df[list(AnalysisResult.COLUMNS)].values.tolist()
+    return {row[0]: row for row in normalize(rows)}
+
+
+def freeze(folder, output_path, content_store_dir=None):
+    """
+    Freezes the documents of a run of the baseline version into the golden folder: the texts it extracted
+    become the corpus and the rows of its output workbook the expected rows. The rows are never calculated
+    by the code under test, documents without a row in the workbook are left out.
+
+    Args:
+        folder (str): The golden folder, its corpus and expected rows are replaced, its HTML pages are kept.
+        output_path (str): The output workbook of the baseline run.
+        content_store_dir (str): An optional ContentStore of the baseline run to take the texts and saved
+            HTML pages from, by default the texts are copied from the 'textfile' directory.
+    """
+    if not os.path.exists(output_path):
+        logger.error(f"{output_path} does not exist, the expected rows are only taken from an output workbook")
+        return
+    expected_rows = output_rows(output_path)
+    corpus_folder = os.path.join(folder, 'corpus')
+    if os.path.exists(corpus_folder):
+        shutil.rmtree(corpus_folder)
+    os.makedirs(corpus_folder)
+    content_store = None
+    if content_store_dir:
+        from content_store import ContentStore
+        content_store = ContentStore(content_store_dir)
+        os.makedirs(os.path.join(folder, 'html'), exist_ok=True)
+    rows = []
+    missing = []
+    for url_id, text in TextFileAnalyzer().iter_documents(content_store):
+        row = expected_rows.get(url_id_str(url_id))
+        if row is None:
+            missing.append(url_id)
+            continue
+        rows.append(row)
+        with open(os.path.join(corpus_folder, str(url_id)), 'w', encoding='utf-8') as f:
+            f.write(text)
+        html = content_store.get_html(url_id) if content_store else None
+        if html is not None:
+            with open(os.path.join(folder, 'html', f'{url_id}.html'), 'w', encoding='utf-8') as f:
+                f.write(html)
+    if missing:
+        logger.error(f"URL_IDs {missing} have no row in {output_path} and were not frozen")
+    with open(os.path.join(folder, 'expected.json'), 'w', encoding='utf-8') as f:
+        json.dump({'columns': AnalysisResult.COLUMNS, 'rows': normalize(rows)}, f, indent=1)
+    logger.info(f"{len(rows)} golden documents frozen in {folder} with the rows of {output_path}")
+
+
+def timed(function, *args):
+    """
+    Calls the function and returns a tuple (seconds, rows), the rows being the AnalysisResult rows it returned.
+    """
+    started = time.perf_counter()
+    results = function(*args)
+    return time.perf_counter() - started, [result.as_row() for result in results]
+
+
+def prepared_analyzer(**kwargs):
+    """
+    Returns a TextFileAnalyzer whose lexicons and stop words are already loaded, so that only the analysis is timed.
+    """
+    analyzer = TextFileAnalyzer(**kwargs)
+    analyzer.get_analyzers()
+    return analyzer
+
+
+def stored_documents(documents, folder):
+    """
+    Returns a ContentStore in the folder holding the texts of the documents.
+    """
+    from content_store import ContentStore
+    content_store = ContentStore(folder)
+    for url_id, text in documents:
+        content_store.put(url_id, None, text)
+    return content_store
+
+
+def serial_mode(documents, **kwargs):
+    analyzer = prepared_analyzer(**kwargs)
+    return timed(lambda: [analyzer.analyze_serial(url_id, text) for url_id, text in documents])
+
+
+def thread_mode(documents, **kwargs):
+    analyzer = prepared_analyzer(backend='thread', **kwargs)
+    return timed(lambda: list(analyzer.iter_results_threaded(documents)))
+
+
+def process_mode(documents, **kwargs):
+    analyzer = prepared_analyzer(backend='process', **kwargs)
+    return timed(lambda: list(analyzer.iter_results_process(documents)))
+
+
+def deduplicated_mode(mode):
+    def run(documents):
+        from deduplicator import ContentDeduplicator
+        return mode(documents, deduplicator=ContentDeduplicator())
+    return run
+
+
+def budget_mode(mode):
+    """
+    Returns a mode analyzing the documents under a tight PipelineBudget: at most two documents and 4 KiB of
+    text in flight, so the analysis keeps waiting for the budget, and a time limit no golden document reaches.
+    """
+    def run(documents):
+        from pipeline_budget import PipelineBudget
+        return mode(documents, budget=PipelineBudget(max_inflight_bytes=4096, max_queued_documents=2,
+                                                     document_timeout=60.0))
+    return run
+
+
+def word_features_mode(table_state):
+    """
+    Returns a mode analyzing the documents with a word feature table in a temporary folder. table_state is
+    'cold' (the table is empty) or 'warm' (the table was filled and saved by a first pass and is loaded again).
+    """
+    def run(documents):
+        from word_features import WordFeatureTable
+        folder = tempfile.mkdtemp()
+        try:
+            table_path = os.path.join(folder, 'word_features.tsv')
+            passes = 2 if table_state == 'warm' else 1
+            for _ in range(passes):
+                analyzer = prepared_analyzer()
+                analyzer.word_features = True
+                analyzer.word_feature_table = WordFeatureTable(analyzer.t_analyzer, analyzer.r_analyzer, table_path)
+                result = timed(lambda: [analyzer.analyze_document(url_id, text) for url_id, text in documents])
+                analyzer.save_word_features()
+            return result
+        finally:
+            shutil.rmtree(folder)
+    return run
+
+
+def registry_mode(documents):
+    from lexicon_registry import LexiconRegistry
+    return serial_mode(documents, lexicon_registry=LexiconRegistry())
+
+
+def shared_lexicon_mode(documents):
+    from lexicon_registry import LexiconRegistry
+    from shared_lexicon import SharedLexicon
+    lexicon = LexiconRegistry().lexicon
+    folder = tempfile.mkdtemp()
+    try:
+        path = os.path.join(folder, 'lexicon.bin')
+        SharedLexicon.write_file(path, lexicon.entries, lexicon.version)
+        shared = SharedLexicon.open_file(path)
+        analyzer = prepared_analyzer()
+        result = timed(lambda: [analyzer.analyze_document(url_id, text, shared) for url_id, text in documents])
+        shared.close()
+        return result
+    finally:
+        shutil.rmtree(folder)
+
+
+def content_store_mode(documents):
+    folder = tempfile.mkdtemp()
+    try:
+        content_store = stored_documents(documents, folder)
+        analyzer = prepared_analyzer()
+        result = timed(lambda: list(analyzer.iter_results(content_store)))
+        content_store.close()
+        return result
+    finally:
+        shutil.rmtree(folder)
+
+
+def token_cache_mode(cache_state):
+    """
+    Returns a mode analyzing the documents with a token cache. cache_state is 'cold' (the cache is empty),
+    'warm' (every document is cached) or 'rescore' (the cached tokens are re-scored without the texts).
+    Only the analysis in that state is timed.
+    """
+    def run(documents):
+        from token_cache import TokenCorpusCache
+        folder = tempfile.mkdtemp()
+        try:
+            token_cache = TokenCorpusCache(folder)
+            analyzer = prepared_analyzer(token_cache=token_cache)
+            if cache_state != 'cold':
+                for url_id, text in documents:
+                    analyzer.analyze_document(url_id, text)
+            if cache_state == 'rescore':
+                result = timed(lambda: list(analyzer.iter_cached_results()))
+            else:
+                result = timed(lambda: [analyzer.analyze_document(url_id, text) for url_id, text in documents])
+            token_cache.close()
+            return result
+        finally:
+            shutil.rmtree(folder)
+    return run
+
+
+def profiles_mode(backend):
+    """
+    Returns a mode analyzing the documents through a ProfileRouter with an English and a German profile.
+    The serial mode routes the documents by the language column of a manifest, the thread mode by language
+    detection and with deduplication. The texts, the manifest and the word feature table of the English
+    profile are kept in a temporary folder.
+    """
+    def run(documents):
+        from analysis_profile import AnalysisProfile, ProfileRouter
+        from deduplicator import ContentDeduplicator
+        folder = tempfile.mkdtemp()
+        try:
+            content_store = stored_documents(documents, os.path.join(folder, 'store'))
+            profiles = [AnalysisProfile('english', aliases=('en',), word_features=True,
+                                        cache_dir=os.path.join(folder, 'english')),
+                        AnalysisProfile('german', language='german', aliases=('de',),
+                                        cache_dir=os.path.join(folder, 'german'))]
+            if backend == 'serial':
+                router = ProfileRouter(profiles, detect=False)
+                manifest_path = os.path.join(folder, 'manifest.csv')
+                with open(manifest_path, 'w', encoding='utf-8', newline='') as f:
+                    csv.writer(f).writerows([('URL_ID', 'URL', 'LANGUAGE'),
+                                             *((url_id, f'https://golden/{url_id}', 'en') for url_id, _ in documents)])
+                router.load_languages(manifest_path)
+            else:
+                router = ProfileRouter(profiles, backend=backend, deduplicator=ContentDeduplicator())
+            for profile in profiles:
+                profile.analyzer(**router.options)
+            result = timed(lambda: list(router.iter_results(content_store)))
+            content_store.close()
+            return result
+        finally:
+            shutil.rmtree(folder)
+    return run
+
+
+def segments_mode(documents):
+    """
+    Scores every document as a single window of all its sentences with write_segments and rebuilds the document
+    rows from the totals of the windows read back from the ColumnarSink, so the segment scores and the sink have
+    to reproduce the measures of the documents. Only the scoring is timed.
+    """
+    from columnar_sink import ColumnarSink
+    from segment_scorer import SegmentScorer
+    folder = tempfile.mkdtemp()
+    try:
+        content_store = stored_documents(documents, os.path.join(folder, 'store'))
+        analyzer = prepared_analyzer()
+        sink_dir = os.path.join(folder, 'segments')
+        started = time.perf_counter()
+        analyzer.write_segments(ColumnarSink(sink_dir, SegmentScorer.COLUMNS), window=sys.maxsize,
+                                content_store=content_store)
+        seconds = time.perf_counter() - started
+        content_store.close()
+        columns = ColumnarSink.read_columns(sink_dir)
+        # the window rows of a document follow its sentence rows, its last row covers all its sentences
+        last_rows = {url_id: index for index, url_id in enumerate(columns['URL_ID'])}
+        return seconds, [window_result(analyzer, columns, index).as_row() for index in last_rows.values()]
+    finally:
+        shutil.rmtree(folder)
+
+
+def window_result(analyzer, columns, index):
+    """
+    Calculates the document measures, rounded like the exact analyzers, from the totals of a segment row.
+    """
+    t_analyzer, r_analyzer = analyzer.get_analyzers()
+    num_sentences = columns['SENTENCES'][index]
+    num_words = round(columns['AVG SENTENCE LENGTH'][index] * num_sentences)
+    counts = {
+        'positive': int(columns['POSITIVE SCORE'][index]),
+        'negative': int(columns['NEGATIVE SCORE'][index]),
+        'words': num_words,
+        'complex': int(columns['COMPLEX WORD COUNT'][index]),
+        'non_stop': int(columns['WORD COUNT'][index]),
+        'syllables': int(columns['SYLLABLE PER WORD'][index]),
+        'pronouns': int(columns['PERSONAL PRONOUNS'][index]),
+        'chars': round(columns['AVG WORD LENGTH'][index] * num_words)
+    }
+    variables = {**t_analyzer.sentiment_measures(counts, num_words),
+                 **r_analyzer.readability_measures(counts, num_sentences)}
+    return AnalysisResult.from_variables(columns['URL_ID'][index], variables)
+
+
+MODES = {
+    'serial': serial_mode,
+    'thread': thread_mode,
+    'process': process_mode,
+    'serial-dedup': deduplicated_mode(serial_mode),
+    'thread-dedup': deduplicated_mode(thread_mode),
+    'process-dedup': deduplicated_mode(process_mode),
+    'serial-budget': budget_mode(serial_mode),
+    'thread-budget': budget_mode(thread_mode),
+    'lexicon-registry': registry_mode,
+    'shared-lexicon': shared_lexicon_mode,
+    'content-store': content_store_mode,
+    'token-cache-cold': token_cache_mode('cold'),
+    'token-cache-warm': token_cache_mode('warm'),
+    'token-cache-rescore': token_cache_mode('rescore'),
+    'word-features-cold': word_features_mode('cold'),
+    'word-features-warm': word_features_mode('warm'),
+    'profiles-manifest': profiles_mode('serial'),
+    'profiles-thread': profiles_mode('thread'),
+    'segments': segments_mode,
+}
+
+
+def run_modes(documents, rounds):
+    """
+    Runs every mode on the documents.
+
+    Returns:
+        dict: A dictionary mapping the name of a mode to a tuple (best time in seconds, rows of the last round).
+    """
+    results = {}
+    for name, mode in MODES.items():
+        best = float('inf')
+        rows = []
+        for _ in range(rounds):
+            seconds, rows = mode(documents)
+            best = min(best, seconds)
+        results[name] = (best, normalize(rows))
+    return results
+
+
+def check_html(folder):
+    """
+    Parses the saved HTML pages again and returns the URL_IDs whose text differs from the frozen corpus.
+    """
+    html_folder = os.path.join(folder, 'html')
+    if not os.path.isdir(html_folder):
+        return []
+    from web_content_extractor import WebContentExtractor
+    extractor = WebContentExtractor()
+    different = []
+    for name in sorted(os.listdir(html_folder)):
+        url_id = os.path.splitext(name)[0]
+        with open(os.path.join(html_folder, name), encoding='utf-8') as f:
+            text = extractor.parse_page(url_id, f.read())
+        with open(os.path.join(folder, 'corpus', url_id), encoding='utf-8') as f:
+            if text != f.read():
+                different.append(url_id)
+    return different
+
+
+def record_baseline(folder, rounds):
+    """
+    Records the best time of every mode in timings.json.
+    """
+    results = run_modes(read_corpus(folder), rounds)
+    timings = {name: best for name, (best, _) in results.items()}
+    with open(os.path.join(folder, 'timings.json'), 'w', encoding='utf-8') as f:
+        json.dump(timings, f, indent=1)
+    for name, best in timings.items():
+        print(f"{name:<20} {best:8.3f}s")
+
+
+def check(folder, rounds, tolerance, slack=0.05, timing=True):
+    """
+    Checks the rows of every mode against the expected rows and, with timing, the times against the baselines.
+
+    Returns:
+        bool: True if all rows are identical and no mode regressed or misses its baseline.
+    """
+    with open(os.path.join(folder, 'expected.json'), encoding='utf-8') as f:
+        expected = json.load(f)
+    if tuple(expected['columns']) != AnalysisResult.COLUMNS:
+        print(f"The output columns changed: {expected['columns']} != {list(AnalysisResult.COLUMNS)}")
+        return False
+    timings_path = os.path.join(folder, 'timings.json')
+    baselines = {}
+    if timing and os.path.exists(timings_path):
+        with open(timings_path, encoding='utf-8') as f:
+            baselines = json.load(f)
+    elif timing:
+        print(f"No timing baselines in {timings_path}, run the baseline command on this machine "
+              f"or check with --no-timing")
+
+    passed = True
+    different_html = check_html(folder)
+    if different_html:
+        passed = False
+        print(f"html: the text of URL_IDs {different_html} differs from the frozen corpus")
+    for name, (best, rows) in run_modes(read_corpus(folder), rounds).items():
+        mismatches = [row[0] for row, expected_row in zip(rows, expected['rows']) if row != expected_row]
+        if len(rows) != len(expected['rows']):
+            mismatches.append(f"{len(rows)} rows instead of {len(expected['rows'])}")
+        baseline = baselines.get(name)
+        missing = timing and baseline is None
+        regressed = baseline is not None and best > baseline * (1 + tolerance) + slack
+        status = 'OK' if not mismatches and not regressed and not missing else 'FAIL'
+        passed = passed and status == 'OK'
+        times = f"{best:8.3f}s" + (f" (baseline {baseline:.3f}s)" if baseline is not None else
+                                   " (no baseline)" if timing else "")
+        print(f"{name:<20} {status:<4} {times}")
+        if mismatches:
+            print(f"    rows differ for URL_IDs {mismatches[:20]}")
+        if regressed:
+            print(f"    slower than the baseline by more than {tolerance:.0%}")
+    return passed
+
+
+if __name__ == '__main__':
+    parser = argparse.ArgumentParser(
+        description="Golden output and timing regression harness",
+        epilog="Timings only compare on one machine: run the baseline command on the machine that runs check, "
+               "or check the rows only with --no-timing.")
+    parser.add_argument('command', choices=('freeze', 'baseline', 'check'))
+    parser.add_argument('--golden', default=golden_folder(), help="the golden folder")
+    parser.add_argument('--output', default=os.path.abspath(os.path.join(os.getcwd(), os.pardir, 'output.xlsx')),
+                        help="freeze the rows of this output workbook of a baseline run")
+    parser.add_argument('--content-store', help="freeze the texts and HTML pages of this ContentStore")
+    parser.add_argument('--rounds', type=int, default=3, help="timed rounds per mode, the best one counts")
+    parser.add_argument('--tolerance', type=float, default=0.25, help="allowed slowdown against the baseline")
+    parser.add_argument('--slack', type=float, default=0.05, help="allowed slowdown in seconds on top of it")
+    parser.add_argument('--no-timing', action='store_true',
+                        help="check the rows only, without the timing baselines recorded on this machine")
+    args = parser.parse_args()
+
+    if args.command == 'freeze':
+        freeze(args.golden, args.output, args.content_store)
+    elif args.command == 'baseline':
+        record_baseline(args.golden, args.rounds)
+    else:
+        sys.exit(0 if check(args.golden, args.rounds, args.tolerance, args.slack, not args.no_timing) else 1)
@@ -0,0 +1,218 @@
+"""
+This module provides a SampledAnalyzer class that estimates the analysis measures of very large documents
+from a stratified sample of their sentences, so that scoring time stays bounded however long a document is.
+
+The sentences of a document are split into contiguous strata (beginning, middle, end, ...) and a fixed number
+of sentences is drawn from every stratum. The counts of the sampled sentences (words, positive and negative
+words, complex words, characters, ...) are expanded to estimates of the document totals, and the measures are
+calculated from the estimated totals with the same formulas as the exact analyzers.
+
+Every measure is reported with a confidence interval. The variance of a measure is estimated by linearization:
+the measure is a function of the totals, its gradient turns the per-sentence counts into one linear score per
+sentence, and the stratified variance of the estimated total of that score is the variance of the measure.
+
+The sentences are located by a regular expression scan for sentence ends instead of the nltk sentence
+tokenizer, and only the sampled sentences are tokenized. Lower casing and this scan are the only passes over
+the whole text; both are cheap next to tokenizing, so the time is bounded by the sample size rather than the
+document length. The scan does not know abbreviations, so the sentence count of a sampled document can differ
+slightly from the one of the nltk tokenizer.
+
+Documents with fewer sentences than the sample size, and calls with exact=True, are analyzed exactly. Like the
+measures of the exact analyzers, all estimates and bounds are rounded to 2 decimals.
+
+Classes:
+    SampledAnalyzer: Estimates the sentiment and readability measures of a document from a sample of sentences.
+
+Example:
+    sampled_analyzer = SampledAnalyzer(TextAnalyzer(tokenizer), ReadabilityAnalyzer(tokenizer), sample_size=200)
+    estimates = sampled_analyzer.analyze(text)
+    polarity, lower, upper = estimates['POLARITY SCORE']
+"""
+
+import math
+import random
+import re
+from statistics import NormalDist
+from logger import Logger
+from tokenizer import normalize_text
+
+# the totals the measures are calculated from, in the order of the per-sentence count vectors
+TOTALS = ('positive', 'negative', 'words', 'complex', 'non_stop', 'syllables', 'pronouns', 'chars')
+
+# the end of a sentence for the cheap scan of a sampled document: end punctuation followed by white space
+SENTENCE_END = re.compile(r'[.!?]+\s+')
+
+
+def calculate_measures(totals, num_sentences):
+    """
+    Calculates the analysis measures from (estimated) document totals, with the formulas of
+    TextAnalyzer and ReadabilityAnalyzer but without rounding.
+
+    Args:
+        totals (dict): The document totals keyed by the names in TOTALS.
+        num_sentences (int): The number of sentences of the document.
+
+    Returns:
+        dict: The measures keyed by their output column names.
+    """
+    positive, negative, words = totals['positive'], totals['negative'], max(totals['words'], 1e-9)
+    avg_sentence_length = words / num_sentences
+    per_complex_words = totals['complex'] / words
+    return {
+        'POSITIVE SCORE': positive,
+        'NEGATIVE SCORE': negative,
+        'POLARITY SCORE': (positive - negative) / (positive + negative + 0.000001),
+        'SUBJECTIVITY SCORE': (positive + negative) / words,
+        'AVG SENTENCE LENGTH': avg_sentence_length,
+        'PERCENTAGE OF COMPLEX WORDS': per_complex_words,
+        'FOG INDEX': 0.4 * (avg_sentence_length + per_complex_words),
+        'AVG NUMBER OF WORDS PER SENTENCE': avg_sentence_length,
+        'COMPLEX WORD COUNT': totals['complex'],
+        'WORD COUNT': totals['non_stop'],
+        'SYLLABLE PER WORD': totals['syllables'],
+        'PERSONAL PRONOUNS': totals['pronouns'],
+        'AVG WORD LENGTH': totals['chars'] / words
+    }
+
+
+class SampledAnalyzer:
+    """
+    A class that estimates the analysis measures of a document from a stratified sample of its sentences.
+    """
+
+    def __init__(self, text_analyzer, readability_analyzer, sample_size=200, strata=10, confidence=0.95, seed=0):
+        """
+        Initializes the SampledAnalyzer object.
+
+        Args:
+            text_analyzer (TextAnalyzer): The analyzer providing the tokenizer and the sentiment lexicons.
+            readability_analyzer (ReadabilityAnalyzer): The analyzer providing the readability counts.
+            sample_size (int): The number of sentences sampled per document.
+            strata (int): The number of contiguous strata the sentences are split into.
+            confidence (float): The confidence level of the reported intervals.
+            seed (int): The seed of the random sample, so that repeated runs give the same estimates.
+        """
+        self.logger = Logger(__name__, 'sampled_analyzer.log', log_to_console=True).logger
+        self.text_analyzer = text_analyzer
+        self.readability_analyzer = readability_analyzer
+        self.tokenizer = text_analyzer.tokenizer
+        self.sample_size = sample_size
+        self.strata = strata
+        self.z = NormalDist().inv_cdf((1 + confidence) / 2)
+        self.seed = seed
+
+    def sentence_counts(self, sentence, matcher):
+        """
+        Returns the vector of counts (in TOTALS order) of a single sentence.
+        """
+        words = self.tokenizer.tokenize_words(sentence)
+        lexicon_counts = matcher.scan(words)
+        counts = self.readability_analyzer.token_counts(words)
+        counts['positive'] = lexicon_counts['positive']
+        counts['negative'] = lexicon_counts['negative']
+        return [counts[total] for total in TOTALS]
+
+    @staticmethod
+    def sentence_starts(text):
+        """
+        Returns the offsets at which the sentences of a text start, found by the cheap SENTENCE_END scan.
+        """
+        starts = [0]
+        starts.extend(match.end() for match in SENTENCE_END.finditer(text))
+        if len(starts) > 1 and starts[-1] == len(text):
+            starts.pop()
+        return starts
+
+    def draw_sample(self, num_sentences):
+        """
+        Splits the sentence indices into contiguous strata and draws a simple random sample from each of them.
+
+        Returns:
+            list: A list of tuples (stratum size, sampled sentence indices), one per stratum.
+        """
+        rng = random.Random(self.seed)
+        num_strata = max(1, min(self.strata, self.sample_size // 2))
+        per_stratum = max(2, self.sample_size // num_strata)
+        bounds = [round(i * num_sentences / num_strata) for i in range(num_strata + 1)]
+        sample = []
+        for start, end in zip(bounds, bounds[1:]):
+            indices = range(start, end)
+            sample.append((len(indices), rng.sample(indices, min(per_stratum, len(indices)))))
+        return sample
+
+    def analyze(self, text, exact=False, lexicon=None):
+        """
+        Estimates the analysis measures of a document.
+
+        Args:
+            text (str): The text of the document.
+            exact (bool): If True the document is analyzed exactly.
+            lexicon (Lexicon): An optional Lexicon snapshot to score with instead of the analyzer's lexicon.
+
+        Returns:
+            dict: For every measure a tuple (estimate, lower bound, upper bound). Exact measures have a zero
+                width interval. The key 'SAMPLED SENTENCES' holds the number of sentences that were analyzed.
+        """
+        text = normalize_text(text)
+        starts = self.sentence_starts(text)
+        if exact or len(starts) <= self.sample_size:
+            words = self.tokenizer.tokenize_words(text)
+            num_sentences = len(self.tokenizer.tokenize_sentences(text))
+            measures = {**self.text_analyzer.analyze_tokens(words, lexicon),
+                        **self.readability_analyzer.analyze_tokens(words, num_sentences)}
+            estimates = {measure: (round(value, 2),) * 3 for measure, value in measures.items()}
+            estimates['SAMPLED SENTENCES'] = num_sentences
+            return estimates
+
+        num_sentences = len(starts)
+        ends = starts[1:] + [len(text)]
+        matcher = lexicon.matcher if lexicon else self.text_analyzer.matcher
+        strata = [(size, [self.sentence_counts(text[starts[i]:ends[i]], matcher) for i in indices])
+                  for size, indices in self.draw_sample(num_sentences)]
+
+        # expanded estimates of the document totals
+        estimated = [0.0] * len(TOTALS)
+        for size, rows in strata:
+            for row in rows:
+                for k, value in enumerate(row):
+                    estimated[k] += value * size / len(rows)
+        totals = dict(zip(TOTALS, estimated))
+        measures = calculate_measures(totals, num_sentences)
+
+        estimates = {}
+        for measure, value in measures.items():
+            gradient = self.gradient(measure, totals, num_sentences, value)
+            half_width = self.z * math.sqrt(self.linearized_variance(strata, gradient))
+            estimates[measure] = (round(value, 2), round(value - half_width, 2), round(value + half_width, 2))
+        estimates['SAMPLED SENTENCES'] = sum(len(rows) for _, rows in strata)
+        self.logger.info(f"Measures estimated from {estimates['SAMPLED SENTENCES']} of {num_sentences} sentences")
+        return estimates
+
+    @staticmethod
+    def gradient(measure, totals, num_sentences, value):
+        """
+        Returns the numerical gradient of a measure with respect to the document totals.
+        """
+        gradient = []
+        for total in TOTALS:
+            step = max(abs(totals[total]) * 1e-6, 1e-6)
+            shifted = dict(totals)
+            shifted[total] += step
+            gradient.append((calculate_measures(shifted, num_sentences)[measure] - value) / step)
+        return gradient
+
+    @staticmethod
+    def linearized_variance(strata, gradient):
+        """
+        Returns the stratified variance of the estimated total of the linearized per-sentence scores.
+        """
+        variance = 0.0
+        for size, rows in strata:
+            n = len(rows)
+            if n < 2 or n >= size:
+                continue
+            scores = [sum(g * value for g, value in zip(gradient, row)) for row in rows]
+            mean = sum(scores) / n
+            sample_variance = sum((score - mean) ** 2 for score in scores) / (n - 1)
+            variance += size ** 2 * (1 - n / size) * sample_variance / n
+        return variance
@@ -0,0 +1,102 @@
+"""
+This module provides a SegmentScorer class that calculates the analysis measures of every sentence of a document
+and of sliding windows of sentences, to find e.g. the negative sections of long reports.
+
+The document is tokenized once. For every total the measures are calculated from (positive and negative words,
+words, complex words, non stop words, syllables, personal pronouns, characters) the per word values are
+turned into prefix sums, so the totals of any range of words are a subtraction and every segment costs the same
+however long it is. The measures of a segment are calculated from its totals with calculate_measures, the
+formulas of the exact analyzers without rounding.
+
+Classes:
+    SegmentScorer: Calculates per sentence and per window measures from prefix sums.
+
+Example:
+    segment_scorer = SegmentScorer(text_analyzer, readability_analyzer)
+    words, sentence_starts = tokenizer.tokenize_with_offsets(text)
+    columns = segment_scorer.score(url_id, words, sentence_starts, window=5)
+"""
+
+from itertools import accumulate
+from sampled_analyzer import TOTALS, calculate_measures
+
+
+class SegmentScorer:
+    """
+    A class that calculates the analysis measures of sentences and windows of sentences of a document.
+    """
+
+    MEASURES = ('POSITIVE SCORE', 'NEGATIVE SCORE', 'POLARITY SCORE', 'SUBJECTIVITY SCORE', 'AVG SENTENCE LENGTH',
+                'PERCENTAGE OF COMPLEX WORDS', 'FOG INDEX', 'AVG NUMBER OF WORDS PER SENTENCE', 'COMPLEX WORD COUNT',
+                'WORD COUNT', 'SYLLABLE PER WORD', 'PERSONAL PRONOUNS', 'AVG WORD LENGTH')
+    # the columns of the segment rows and their array type codes, for a ColumnarSink
+    COLUMNS = {
+        'URL_ID': 'I',
+        'SENTENCES': 'I',
+        'FIRST SENTENCE': 'I',
+        'FIRST WORD': 'I',
+        'END WORD': 'I',
+        **dict.fromkeys(MEASURES, 'd')
+    }
+
+    def __init__(self, text_analyzer, readability_analyzer):
+        """
+        Initializes the SegmentScorer object.
+
+        Args:
+            text_analyzer (TextAnalyzer): The analyzer providing the sentiment lexicons.
+            readability_analyzer (ReadabilityAnalyzer): The analyzer providing the per word readability values.
+        """
+        self.text_analyzer = text_analyzer
+        self.readability_analyzer = readability_analyzer
+
+    def prefix_sums(self, words, lexicon=None):
+        """
+        Returns, for every total in TOTALS, the list of its prefix sums over the words: element i is the total
+        of the first i words.
+        """
+        matcher = lexicon.matcher if lexicon else self.text_analyzer.matcher
+        values = self.readability_analyzer.token_flags(words)
+        lexicon_matches = matcher.token_matches(words)
+        values['positive'] = lexicon_matches['positive']
+        values['negative'] = lexicon_matches['negative']
+        values['words'] = [1] * len(words)
+        return {total: list(accumulate(values[total], initial=0)) for total in TOTALS}
+
+    def score(self, url_id, words, sentence_starts, lexicon=None, window=None, step=1):
+        """
+        Calculates the measures of every sentence and, if a window is given, of every window of sentences.
+
+        Args:
+            url_id (str): The URL_ID of the document.
+            words (list): The words of the document.
+            sentence_starts (list): The index of the first word of each sentence.
+            lexicon (Lexicon): An optional Lexicon snapshot to score with instead of the analyzer's lexicon.
+            window (int): The number of sentences of a window, None or 1 for sentences only.
+            step (int): The number of sentences a window moves by.
+
+        Returns:
+            dict: The segment rows as columns (see COLUMNS): sentence rows first, then window rows.
+                The SENTENCES column holds 1 for sentence rows and the window size for window rows.
+        """
+        prefix = self.prefix_sums(words, lexicon)
+        num_sentences = len(sentence_starts)
+        bounds = list(sentence_starts) + [len(words)]
+        segments = [(first, first + 1) for first in range(num_sentences)]
+        if window and window > 1 and num_sentences:
+            segments += [(first, min(first + window, num_sentences))
+                         for first in range(0, max(num_sentences - window, 0) + 1, step)]
+
+        columns = {column: [] for column in self.COLUMNS}
+        columns['URL_ID'] = url_id
+        for first, end in segments:
+            start_word, end_word = bounds[first], bounds[end]
+            totals = {total: sums[end_word] - sums[start_word] for total, sums in prefix.items()}
+            measures = calculate_measures(totals, end - first)
+            columns['SENTENCES'].append(end - first)
+            columns['FIRST SENTENCE'].append(first)
+            columns['FIRST WORD'].append(start_word)
+            columns['END WORD'].append(end_word)
+            for measure in self.MEASURES:
+                columns[measure].append(measures[measure])
+        return columns
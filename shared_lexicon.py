@@ -0,0 +1,249 @@
+"""
+This module provides a SharedLexicon class that publishes the compiled lexicons once, in a
+multiprocessing.shared_memory block or a memory mapped file, so that worker processes can attach to them
+without building their own copies of the positive, negative and stop word sets.
+
+Layout of the block (all integers little endian):
+- header: magic b'LEX1', lexicon version, number of hash slots, offset of the string table,
+  length of the category names (JSON list)
+- the category names
+- the hash slots: an open addressing table (linear probing, load factor at most 0.5) of
+  (CRC-32 of the word, offset in the string table, length in bytes, category flags)
+- the string table: the UTF-8 encoded words, sorted and concatenated
+
+A word belongs to a category if the bit of the category is set in its flags. Words are compared exactly,
+so the lookups have the same semantics as the membership tests on the DictionaryCreator word lists.
+Only single word entries can be shared, phrases are skipped.
+
+Classes:
+    CategoryView: A read only set-like view of one category of a SharedLexicon.
+    SharedLexicon: Builds, publishes and attaches to a shared lexicon block.
+
+Example:
+    # in the parent process
+    shared = SharedLexicon.create({'positive': positive_words, 'negative': negative_words}, name='lexicon')
+    # in a worker process
+    shared = SharedLexicon.attach('lexicon')
+    text_analyzer = TextAnalyzer(tokenizer, lexicon=shared)
+"""
+
+import json
+import mmap
+import struct
+import zlib
+from multiprocessing import resource_tracker, shared_memory
+from logger import Logger
+
+MAGIC = b'LEX1'
+HEADER = struct.Struct('<4sIIII')
+SLOT = struct.Struct('<IIHH')
+EMPTY = 0xFFFFFFFF
+
+
+class CategoryView:
+    """
+    A read only set-like view of the words of one category of a SharedLexicon.
+    """
+
+    def __init__(self, shared_lexicon, bit):
+        self.shared_lexicon = shared_lexicon
+        self.bit = bit
+
+    def __contains__(self, word):
+        return bool(self.shared_lexicon.lookup(word) & self.bit)
+
+
+class SharedLexicon:
+    """
+    A class that stores lexicon categories in a shared, read only hash table of strings.
+    """
+
+    def __init__(self, buffer, shm=None, mapped=None, file=None):
+        """
+        Initializes the SharedLexicon object on a buffer with the layout described in the module docstring.
+        Use create, attach, write_file or open_file instead of calling it directly.
+        """
+        self.logger = Logger(__name__, 'shared_lexicon.log', log_to_console=True).logger
+        self.shm = shm
+        self.mapped = mapped
+        self.file = file
+        self.buf = memoryview(buffer)
+        magic, self.version, self.num_slots, self.strings_offset, categories_length = HEADER.unpack_from(self.buf)
+        if magic != MAGIC:
+            raise ValueError("The buffer does not hold a shared lexicon")
+        self.categories = json.loads(bytes(self.buf[HEADER.size:HEADER.size + categories_length]))
+        self.slots_offset = HEADER.size + categories_length
+        self.mask = self.num_slots - 1
+        self.entries = {category: CategoryView(self, 1 << bit) for bit, category in enumerate(self.categories)}
+        # the shared lexicon scans tokens itself, so it can be used where a Lexicon snapshot is expected
+        self.matcher = self
+        self.logger.info(f"Shared lexicon version {self.version} with {len(self.categories)} categories attached")
+
+    @staticmethod
+    def build(entries, version=1):
+        """
+        Builds the bytes of a shared lexicon.
+
+        Args:
+            entries (dict): A dictionary mapping a category name to an iterable of words.
+            version (int): The version number of the lexicon.
+
+        Returns:
+            bytes: The shared lexicon block.
+        """
+        categories = list(entries)
+        if len(categories) > 16:
+            raise ValueError("A shared lexicon holds at most 16 categories")
+        flags = {}
+        for bit, category in enumerate(categories):
+            for word in entries[category]:
+                if len(word.split()) == 1:
+                    flags[word] = flags.get(word, 0) | 1 << bit
+
+        num_slots = 1
+        while num_slots < 2 * len(flags) + 1:
+            num_slots *= 2
+        mask = num_slots - 1
+        slots = bytearray(SLOT.pack(0, EMPTY, 0, 0) * num_slots)
+        strings = bytearray()
+        for word in sorted(flags):
+            encoded = word.encode('utf-8')
+            word_hash = zlib.crc32(encoded)
+            index = word_hash & mask
+            while SLOT.unpack_from(slots, index * SLOT.size)[1] != EMPTY:
+                index = (index + 1) & mask
+            SLOT.pack_into(slots, index * SLOT.size, word_hash, len(strings), len(encoded), flags[word])
+            strings += encoded
+
+        category_names = json.dumps(categories).encode('utf-8')
+        strings_offset = HEADER.size + len(category_names) + len(slots)
+        header = HEADER.pack(MAGIC, version, num_slots, strings_offset, len(category_names))
+        return header + category_names + bytes(slots) + bytes(strings)
+
+    @classmethod
+    def create(cls, entries, name=None, version=1):
+        """
+        Builds a shared lexicon and publishes it in a new shared memory block.
+        The creating process owns the block and has to call unlink when the workers are done.
+
+        Returns:
+            SharedLexicon: The shared lexicon, its block name is shared_lexicon.name.
+        """
+        data = cls.build(entries, version)
+        shm = shared_memory.SharedMemory(name=name, create=True, size=len(data))
+        shm.buf[:len(data)] = data
+        return cls(shm.buf, shm=shm)
+
+    @classmethod
+    def attach(cls, name):
+        """
+        Attaches to a shared lexicon published by another process, without copying it.
+        """
+        try:
+            shm = shared_memory.SharedMemory(name=name, track=False)
+        except TypeError:
+            # before Python 3.13 attaching registers the block with the resource tracker, which unlinks it
+            # when the attaching process exits if that process has a tracker of its own. Only the creating
+            # process owns the block, so the registration is skipped like with track=False. Unregistering
+            # afterwards would also drop the registration of the creator in workers sharing its tracker.
+            register = resource_tracker.register
+            resource_tracker.register = lambda name, rtype: None
+            try:
+                shm = shared_memory.SharedMemory(name=name)
+            finally:
+                resource_tracker.register = register
+        return cls(shm.buf, shm=shm)
+
+    @classmethod
+    def write_file(cls, path, entries, version=1):
+        """
+        Builds a shared lexicon and writes it to a file that workers can memory map with open_file.
+        """
+        with open(path, 'wb') as f:
+            f.write(cls.build(entries, version))
+
+    @classmethod
+    def open_file(cls, path):
+        """
+        Memory maps a shared lexicon file written by write_file.
+        """
+        file = open(path, 'rb')
+        mapped = mmap.mmap(file.fileno(), 0, access=mmap.ACCESS_READ)
+        return cls(mapped, mapped=mapped, file=file)
+
+    @property
+    def name(self):
+        return self.shm.name if self.shm else None
+
+    def lookup(self, word):
+        """
+        Returns the category flags of a word, 0 if it is in no category.
+        """
+        encoded = word.encode('utf-8')
+        word_hash = zlib.crc32(encoded)
+        index = word_hash & self.mask
+        buf = self.buf
+        while True:
+            slot_hash, offset, length, flags = SLOT.unpack_from(buf, self.slots_offset + index * SLOT.size)
+            if offset == EMPTY:
+                return 0
+            if slot_hash == word_hash and length == len(encoded):
+                start = self.strings_offset + offset
+                if buf[start:start + length] == encoded:
+                    return flags
+            index = (index + 1) & self.mask
+
+    def __contains__(self, word):
+        return self.lookup(word) != 0
+
+    def scan(self, tokens):
+        """
+        Counts the words of every category in the given tokens, like LexiconMatcher.scan for single word entries.
+
+        Returns:
+            dict: A dictionary mapping every category to its number of matches.
+        """
+        counts = dict.fromkeys(self.categories, 0)
+        bits = [(1 << bit, category) for bit, category in enumerate(self.categories)]
+        for token in tokens:
+            flags = self.lookup(token)
+            if flags:
+                for bit, category in bits:
+                    if flags & bit:
+                        counts[category] += 1
+        return counts
+
+    def token_matches(self, tokens):
+        """
+        Returns for every category a list with 1 for each token of the category and 0 otherwise,
+        like LexiconMatcher.token_matches for single word entries.
+        """
+        matches = {category: [0] * len(tokens) for category in self.categories}
+        bits = [(1 << bit, matches[category]) for bit, category in enumerate(self.categories)]
+        for position, token in enumerate(tokens):
+            flags = self.lookup(token)
+            if flags:
+                for bit, category_matches in bits:
+                    if flags & bit:
+                        category_matches[position] = 1
+        return matches
+
+    def close(self):
+        """
+        Detaches from the shared memory block or the mapped file.
+        """
+        self.entries = {}
+        self.matcher = None
+        self.buf.release()
+        if self.shm:
+            self.shm.close()
+        if self.mapped:
+            self.mapped.close()
+            self.file.close()
+
+    def unlink(self):
+        """
+        Frees the shared memory block, only called by the process that created it.
+        """
+        if self.shm:
+            self.shm.unlink()
@@ -12,6 +12,10 @@ ReadabilityAnalyzer class contains three methods to analyze the readability of t
 average_sentence_length: Calculates the average number of words per sentence in the text.
 per_complex_words: Calculates the percentage of complex words in the text.
 fog_index: Calculates the fog index of the text using the Gunning Fog Index formula.
+
+Both classes also provide analyze_tokens and analyze_batch methods that calculate all their measures
+at once for one or many documents. These methods do not change the state of the analyzer, so one
+analyzer can be used by several threads at the same time.
 This module depends on several external libraries: re, nltk.corpus, logger, dictionary, and tokenizer.
 Before using this module, these dependencies must be installed."""
 
@@ -19,6 +23,11 @@ import re
 from nltk.corpus import stopwords
 from logger import Logger
 from dictionary import DictionaryCreator
+from lexicon_matcher import LexiconMatcher, PERSONAL_PRONOUNS, COUNTRY_US
+from tokenizer import normalize_text
+
+VOWEL_GROUPS = re.compile('[aeiou]+')
+SYLLABLE_PATTERN = re.compile(r'\b\w+(?:es|ed|e|[^aeiouy]le|[^aeiouy][aeiouy](?!$))+(?!\S)')
 
 
 class TextAnalyzer:
@@ -27,18 +36,112 @@ class TextAnalyzer:
     A class for analyzing the text data.
     """
 
-    def __init__(self, tokenizer):
+    def __init__(self, tokenizer, lexicon=None):
         """
         Initializes the TextAnalyzer object with the given text.
 
         Args:
         - text (str): The text to be analyzed.
+        - lexicon (Lexicon): An optional Lexicon snapshot from the LexiconRegistry,
+          by default the lexicons are built from the MasterDictionary.
         """
         self.tokenizer = tokenizer
-        self.dictionary_creator = DictionaryCreator()
         self.logger = Logger(__name__, 'textanalyzer.log', log_to_console=True).logger
-        self.positive_dict = self.dictionary_creator.positive_dict()
-        self.negative_dict = self.dictionary_creator.negative_dict()
+        # (tokenizer, text, matcher, counts) of the last lexicon_counts call
+        self.counted = None
+        if lexicon:
+            self.use_lexicon(lexicon)
+        else:
+            self.dictionary_creator = DictionaryCreator()
+            self.positive_dict = self.dictionary_creator.positive_dict()
+            self.negative_dict = self.dictionary_creator.negative_dict()
+            self.matcher = LexiconMatcher({
+                'positive': (self.positive_dict or []) + self.dictionary_creator.phrase_dict('positive-words.txt'),
+                'negative': (self.negative_dict or []) + self.dictionary_creator.phrase_dict('negative-words.txt')
+            })
+
+    def use_lexicon(self, lexicon):
+        """
+        Switches the analyzer to the given Lexicon snapshot.
+
+        Args:
+        - lexicon (Lexicon): The Lexicon snapshot to score with.
+        """
+        self.positive_dict = lexicon.entries.get('positive', frozenset())
+        self.negative_dict = lexicon.entries.get('negative', frozenset())
+        self.matcher = lexicon.matcher
+
+    def lexicon_counts(self):
+        """
+        Counts the words and phrases of every lexicon in the text with a single scan of the tokens.
+        The counts are kept until the text, the tokenizer or the lexicon changes, so the four scores of a
+        document share one tokenization and one scan.
+
+        Returns:
+            dict: A dictionary mapping the lexicon names 'positive' and 'negative' to their counts,
+            and 'words' to the number of words of the text.
+        """
+        tokenizer, text, matcher = self.tokenizer, self.tokenizer.text, self.matcher
+        counted = self.counted
+        if counted is None or counted[0] is not tokenizer or counted[1] is not text or counted[2] is not matcher:
+            words = tokenizer.tokenize_words()
+            counts = dict(matcher.scan(words), words=len(words))
+            self.counted = counted = (tokenizer, text, matcher, counts)
+        return counted[3]
+
+    def sentiment_measures(self, counts, num_words):
+        """
+        Calculates the four sentiment measures from the lexicon counts of a document.
+
+        Args:
+            counts (dict): The lexicon counts returned by the matcher.
+            num_words (int): The number of words of the document.
+
+        Returns:
+            dict: The sentiment measures keyed by their output column names.
+        """
+        positive_score = counts['positive']
+        negative_score = counts['negative']
+        return {
+            'POSITIVE SCORE': positive_score,
+            'NEGATIVE SCORE': negative_score,
+            'POLARITY SCORE': round((positive_score - negative_score) / (positive_score + negative_score + 0.000001), 2),
+            'SUBJECTIVITY SCORE': round((positive_score + negative_score) / num_words, 2)
+        }
+
+    def analyze_tokens(self, words, lexicon=None):
+        """
+        Calculates all sentiment measures of a document from its words with a single lexicon scan.
+
+        Args:
+            words (list): The words of the document.
+            lexicon (Lexicon): An optional Lexicon snapshot to score with instead of the analyzer's lexicon.
+
+        Returns:
+            dict: The sentiment measures keyed by their output column names.
+        """
+        matcher = lexicon.matcher if lexicon else self.matcher
+        return self.sentiment_measures(matcher.scan(words), len(words))
+
+    def analyze_batch(self, texts, lexicon=None):
+        """
+        Calculates all sentiment measures for many documents.
+        The whole batch is scored with the lexicon that is current when the call starts.
+
+        Args:
+            texts (iterable): The texts of the documents, normalized like in the pipeline.
+            lexicon (Lexicon): An optional Lexicon snapshot to score with instead of the analyzer's lexicon.
+
+        Returns:
+            list: One dictionary of sentiment measures per document, in input order.
+        """
+        matcher = lexicon.matcher if lexicon else self.matcher
+        results = []
+        for text in texts:
+            words = self.tokenizer.tokenize_words(normalize_text(text))
+            results.append(self.sentiment_measures(matcher.scan(words), len(words)))
+        self.logger.info(f"Sentiment measures of {len(results)} documents calculated")
+        return results
 
     """ 1) POSITIVE SCORE """
     def positive_score(self):
@@ -50,8 +153,7 @@ class TextAnalyzer:
         Returns:
             positive_score (int): The number of positive words in the text.
         """
-        words = self.tokenizer.tokenize_words()
-        positive_score = sum([1 for word in words if word in self.positive_dict])
+        positive_score = self.lexicon_counts()['positive']
         self.logger.info("Positive score calculated")
         return positive_score
 
@@ -67,8 +169,7 @@ class TextAnalyzer:
         Returns:
             negative_score (int): The number of negative words in the text.
         """
-        words = self.tokenizer.tokenize_words()
-        negative_score = sum([1 for word in words if word in self.negative_dict])
+        negative_score = self.lexicon_counts()['negative']
         self.logger.info("Negative score calculated")
         return negative_score
 
@@ -86,8 +187,9 @@ class TextAnalyzer:
         Returns:
             polarity_score (float): The polarity score of the text.
         """
-        positive_score = self.positive_score()
-        negative_score = self.negative_score()
+        counts = self.lexicon_counts()
+        positive_score = counts['positive']
+        negative_score = counts['negative']
 
         polarity_score = round((positive_score - negative_score) / (positive_score + negative_score + 0.000001), 2)
         return polarity_score
@@ -107,10 +209,10 @@ class TextAnalyzer:
         Returns:
         - subjectivity_score (float): The subjectivity score of the text.
         """
-        words = self.tokenizer.tokenize_words()
-        positive_score = self.positive_score()
-        negative_score = self.negative_score()
-        subjectivity_score = round((positive_score + negative_score) / len(words), 2)
+        counts = self.lexicon_counts()
+        positive_score = counts['positive']
+        negative_score = counts['negative']
+        subjectivity_score = round((positive_score + negative_score) / counts['words'], 2)
         return subjectivity_score
 
 
@@ -120,15 +222,152 @@ class ReadabilityAnalyzer:
     A class to analyze the readability of a given text.
     """
 
-    def __init__(self, tokenizer):
+    def __init__(self, tokenizer, stop_words=None):
         """
         INITIALIZER:
         Initializes an instance of ReadabilityAnalyzer with the given text.
         Args:
         text (str): The text to analyze.
+        stop_words: An optional set of stop words used by the word count (e.g. a view of a SharedLexicon),
+        by default the english stop words of the nltk package.
         """
         self.tokenizer = tokenizer
         self.logger = Logger(__name__, 'textanalyzer.log', log_to_console=True).logger
+        self.pronoun_matcher = LexiconMatcher({'pronoun': PERSONAL_PRONOUNS, 'us': COUNTRY_US},
+                                              ignore_case=['pronoun'])
+        self.stop_words = stop_words
+
+    def english_stop_words(self):
+        """
+        Returns the english stop words of the nltk package, they are loaded once per analyzer.
+        """
+        if self.stop_words is None:
+            self.stop_words = frozenset(stopwords.words('english'))
+        return self.stop_words
+
+    def token_counts(self, words):
+        """
+        Counts everything the readability measures are calculated from, going over the words only once.
+
+        Args:
+            words (list): The words of a document or of a part of it.
+
+        Returns:
+            dict: The number of words, complex words, non stop words, syllables, personal pronouns and characters.
+        """
+        stop_words = self.english_stop_words()
+        complex_word_count = 0
+        word_count = 0
+        syllables_word = 0
+        count_char = 0
+        for word in words:
+            word_lower = word.lower()
+            if len(word) >= 3 and len(VOWEL_GROUPS.findall(word_lower)) > 2:
+                complex_word_count += 1
+            if word_lower not in stop_words:
+                word_count += 1
+            syllables_word += len(SYLLABLE_PATTERN.findall(word_lower))
+            count_char += len(word)
+        pronoun_counts = self.pronoun_matcher.scan(words)
+        return {
+            'words': len(words),
+            'complex': complex_word_count,
+            'non_stop': word_count,
+            'syllables': syllables_word,
+            'pronouns': pronoun_counts['pronoun'] - pronoun_counts['us'],
+            'chars': count_char
+        }
+
+    def token_flags(self, words):
+        """
+        Returns the per word values that token_counts adds up, so that the counts of any range of words
+        (a sentence, a window of sentences) can be taken from prefix sums without going over the words again.
+
+        Args:
+            words (list): The words of a document.
+
+        Returns:
+            dict: For 'complex', 'non_stop', 'syllables', 'pronouns' and 'chars' a list with the value of each word.
+        """
+        stop_words = self.english_stop_words()
+        complex_words = []
+        non_stop_words = []
+        syllables = []
+        chars = []
+        for word in words:
+            word_lower = word.lower()
+            complex_words.append(1 if len(word) >= 3 and len(VOWEL_GROUPS.findall(word_lower)) > 2 else 0)
+            non_stop_words.append(0 if word_lower in stop_words else 1)
+            syllables.append(len(SYLLABLE_PATTERN.findall(word_lower)))
+            chars.append(len(word))
+        pronoun_matches = self.pronoun_matcher.token_matches(words)
+        return {
+            'complex': complex_words,
+            'non_stop': non_stop_words,
+            'syllables': syllables,
+            'pronouns': [pronoun - us for pronoun, us in zip(pronoun_matches['pronoun'], pronoun_matches['us'])],
+            'chars': chars
+        }
+
+    def analyze_tokens(self, words, num_sentences):
+        """
+        Calculates all readability measures of a document from its words and number of sentences,
+        going over the words only once.
+
+        Args:
+            words (list): The words of the document.
+            num_sentences (int): The number of sentences of the document.
+
+        Returns:
+            dict: The readability measures keyed by their output column names.
+        """
+        return self.readability_measures(self.token_counts(words), num_sentences)
+
+    def readability_measures(self, counts, num_sentences):
+        """
+        Calculates the readability measures from the counts of a document.
+
+        Args:
+            counts (dict): The counts returned by token_counts.
+            num_sentences (int): The number of sentences of the document.
+
+        Returns:
+            dict: The readability measures keyed by their output column names.
+        """
+        num_words = counts['words']
+
+        avg_sentence_length = round(num_words / num_sentences, 2)
+        per_complex_words = round(counts['complex'] / num_words, 2)
+        return {
+            'AVG SENTENCE LENGTH': avg_sentence_length,
+            'PERCENTAGE OF COMPLEX WORDS': per_complex_words,
+            'FOG INDEX': 0.4 * (avg_sentence_length + per_complex_words),
+            'AVG NUMBER OF WORDS PER SENTENCE': round(num_words / num_sentences, 2),
+            'COMPLEX WORD COUNT': counts['complex'],
+            'WORD COUNT': counts['non_stop'],
+            'SYLLABLE PER WORD': counts['syllables'],
+            'PERSONAL PRONOUNS': counts['pronouns'],
+            'AVG WORD LENGTH': round(counts['chars'] / num_words, 2)
+        }
+
+    def analyze_batch(self, texts):
+        """
+        Calculates all readability measures for many documents.
+
+        Args:
+            texts (iterable): The texts of the documents, normalized like in the pipeline.
+
+        Returns:
+            list: One dictionary of readability measures per document, in input order.
+        """
+        results = []
+        for text in texts:
+            text = normalize_text(text)
+            words = self.tokenizer.tokenize_words(text)
+            sentences = self.tokenizer.tokenize_sentences(text)
+            results.append(self.analyze_tokens(words, len(sentences)))
+        self.logger.info(f"Readability measures of {len(results)} documents calculated")
+        return results
 
     """ 5) AVERAGE SENTENCE LENGTH """
 
@@ -217,7 +456,7 @@ class ReadabilityAnalyzer:
         words = self.tokenizer.tokenize_words()
         complex_word_count = 0
         for word in words:
-            syllables = len(re.findall('[aeiou]+', word.lower()))
+            syllables = len(VOWEL_GROUPS.findall(word.lower()))
             if len(word) >= 3 and syllables > 2:
                 complex_word_count += 1
         return complex_word_count
@@ -238,7 +477,7 @@ class ReadabilityAnalyzer:
 
         # Extracting stop words of english from nltk package
 
-        stop_words = set(stopwords.words('english'))
+        stop_words = self.english_stop_words()
         words_filtered = [word for word in words if word.lower() not in stop_words]
 
         word_count = len(words_filtered)
@@ -260,8 +499,7 @@ class ReadabilityAnalyzer:
         words = self.tokenizer.tokenize_words()
         syllables_word = 0
         for word in words:
-            pattern = re.compile(r'\b\w+(?:es|ed|e|[^aeiouy]le|[^aeiouy][aeiouy](?!$))+(?!\S)')
-            syllables_word += len(pattern.findall(word.lower()))
+            syllables_word += len(SYLLABLE_PATTERN.findall(word.lower()))
         return syllables_word
 
     """ 12) PERSONAL PRONOUNS """
@@ -269,32 +507,22 @@ class ReadabilityAnalyzer:
     def personal_pronoun(self):
         """
         PERSONAL PRONOUNS:
-        To calculate Personal Pronouns mentioned in the text, we use regex to find
-        the counts of the words - “I,” “we,” “my,” “ours,” and “us”. Special care is
-        taken so that the country name US is not included in the list.
+        To calculate Personal Pronouns mentioned in the text, we scan the words once with a
+        lexicon matcher to find the counts of the words - “I,” “we,” “my,” “ours,” and “us”.
+        Special care is taken so that the country name US is not included in the list.
         Counts the number of Personal Pronouns I, we, my, our, ours and us, exculding the words US.
 
         Returns:
         Personal_pronouns (int): The total number of personal pronouns in the text.
         """
-        """ Writing Pattern for pronouns using re module"""
+        """ Matching pronouns (case insensitive) and US words (case sensitive) in one scan """
 
         words = self.tokenizer.tokenize_words()
-        text = ' '.join(words)
-        pattern_pronouns = re.compile(r'\b(?:I|we|my|our|ours|us)\b', re.IGNORECASE)
-
-        """Writing Patterns for US word """
-        pattern_us = re.compile(r'\b(?:US)\b')
-
-        """ Matching pronouns for the text data """
-        matches_pronouns = pattern_pronouns.findall(text)
-
-        """ Matching US words for the text data """
-        matches_us = pattern_us.findall(text)
+        counts = self.pronoun_matcher.scan(words)
 
         """ Calculating personal pronouns """
 
-        personal_pronoun = len(matches_pronouns) - len(matches_us)
+        personal_pronoun = counts['pronoun'] - counts['us']
         return personal_pronoun
 
     """ 13) AVERAGE WORD LENGTH """
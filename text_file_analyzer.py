@@ -13,13 +13,71 @@ Functions:
 Usage:
     - To analyze a collection of text files, create an instance of TextFileAnalyzer and call the analyze_files method.
       The method returns a dictionary of analysis results containing various text and readability measures.
+    - The documents are analyzed one after the other by default (backend 'serial'). With the backend 'thread'
+      they are analyzed by a thread pool sharing one set of immutable lexicons. The files are still read in the
+      calling thread. On CPython with the GIL the threads take turns in the tokenizer and regex work, so the
+      gain is small; on free-threaded builds the analysis scales with the number of cores.
+    - With the backend 'process' the documents are analyzed by a process pool. The lexicons and stop words are
+      published once in a SharedLexicon block that every worker attaches to, instead of each worker reading the
+      MasterDictionary and the nltk stop words. The nltk tokenizer models are loaded before the pool starts, so
+      forked workers inherit them; with the 'spawn' start method every worker still loads its own copy.
+    - With a TokenCorpusCache the tokens of every document are cached as token ID arrays, and
+      iter_cached_results re-scores the cached corpus without reading or tokenizing the texts.
+    - write_segments calculates the measures of every sentence and of sliding windows of sentences from the same
+      single tokenization and streams them to a ColumnarSink.
+    - With a PipelineBudget the pool backends keep the documents and text bytes in flight within the budget
+      and give up documents that run longer than the time limit, counted from when a worker starts them. A given
+      up document gets an output row without measures. Slow documents of the serial backend are only counted.
+    - With word_features=True the counts of a document are sums of the rows of a persistent WordFeatureTable,
+      one lookup per word, as long as the document is scored with the lexicon the table was built for.
+    - With an AnalysisProfile the tokenizer, stop words and lexicons of the profile's language are used. Documents
+      in several languages are analyzed in one pass by a ProfileRouter, with one TextFileAnalyzer per profile.
+    - With a sample_size the measures of documents with more sentences than that are estimated by a SampledAnalyzer
+      from a sample of their sentences, in bounded time; the output rows hold the point estimates.
 """
 
 import os
+import sys
+import time
+from collections import deque
+from concurrent.futures import Future, ProcessPoolExecutor, ThreadPoolExecutor, wait
 from text_analyzer import TextAnalyzer, ReadabilityAnalyzer
 from path_helper import PathHelper
 from logger import Logger
-from tokenizer import Tokenizer
+from tokenizer import Tokenizer, normalize_text
+from analysis_result import AnalysisResult
+from segment_scorer import SegmentScorer
+from word_features import WordFeatureTable
+from shared_lexicon import SharedLexicon
+from sampled_analyzer import SampledAnalyzer
+
+# the TextFileAnalyzer of a worker process of the 'process' backend, created by attach_worker
+worker_analyzer = None
+
+
+def attach_worker(lexicon_name, tokenizer, sample_size=None):
+    """
+    Initializes a worker process of the 'process' backend. The analyzers are built on the shared lexicon
+    published by the parent process, so the worker reads neither the MasterDictionary nor the stop words.
+
+    Args:
+        lexicon_name (str): The name of the shared memory block of the SharedLexicon.
+        tokenizer (Tokenizer): The tokenizer of the parent's analyzer.
+        sample_size (int): The sample size of the parent's analyzer.
+    """
+    global worker_analyzer
+    shared = SharedLexicon.attach(lexicon_name)
+    worker_analyzer = TextFileAnalyzer(sample_size=sample_size)
+    worker_analyzer.tokenizer = tokenizer
+    worker_analyzer.t_analyzer = TextAnalyzer(tokenizer, shared)
+    worker_analyzer.r_analyzer = ReadabilityAnalyzer(tokenizer, stop_words=shared.entries['stop'])
+
+
+def analyze_in_worker(url_id, text):
+    """
+    Analyzes a document in a worker process of the 'process' backend.
+    """
+    return worker_analyzer.analyze_document(url_id, text)
 
 
 class TextFileAnalyzer:
@@ -29,15 +87,52 @@ class TextFileAnalyzer:
     class to get the paths of the text files.
     """
 
-    def __init__(self):
+    BACKENDS = ('serial', 'thread', 'process')
+    # how often the documents in flight are checked for having started while waiting for a result
+    POLL_SECONDS = 0.05
+
+    def __init__(self, lexicon_registry=None, deduplicator=None, backend='serial', max_workers=None,
+                 token_cache=None, budget=None, word_features=False, profile=None, sample_size=None):
         """
         Initializes a TextFileAnalyzer object and sets up logger and helper objects.
+
+        Args:
+            lexicon_registry (LexiconRegistry): An optional registry of reloadable lexicons. Each document is
+                scored with the lexicon snapshot that is current when its analysis starts.
+            deduplicator (ContentDeduplicator): An optional deduplicator. Exact duplicates reuse the measures
+                of the first document with the same text, near duplicates are flagged.
+            backend (str): 'serial' to analyze the documents one by one, 'thread' to analyze them with a thread pool,
+                'process' to analyze them with a process pool. It can be changed at runtime through the backend attribute.
+            max_workers (int): The number of threads or processes of the pool backends, by default the number of
+                cores for processes and on free-threaded builds, and at most 4 threads with the GIL.
+            token_cache (TokenCorpusCache): An optional cache of the tokenized documents.
+            budget (PipelineBudget): Optional in-flight and time budgets of the analysis.
+            word_features (bool): If True the word counts are taken from a WordFeatureTable stored next to
+                the MasterDictionary.
+            profile (AnalysisProfile): An optional analysis profile providing the tokenizer, stop words and
+                lexicons of a language, by default English with the MasterDictionary lexicons.
+            sample_size (int): If given, the measures of documents with more sentences than this are estimated
+                from a stratified sample of that many sentences. Documents read from a token cache are tokenized
+                anyway and are always analyzed exactly.
         """
+        if backend not in self.BACKENDS:
+            raise ValueError(f"Unknown backend {backend}, expected one of {self.BACKENDS}")
         self.path_helper = PathHelper()
         self.logger = Logger(__name__, 'text_file_analyzer.log', log_to_console=True).logger
         self.t_analyzer = None
         self.r_analyzer = None
-        self.tokenizer = Tokenizer('')
+        self.profile = profile
+        self.tokenizer = profile.tokenizer if profile else Tokenizer('')
+        self.lexicon_registry = lexicon_registry
+        self.deduplicator = deduplicator
+        self.backend = backend
+        self.max_workers = max_workers
+        self.token_cache = token_cache
+        self.budget = budget
+        self.word_features = word_features
+        self.word_feature_table = None
+        self.sample_size = sample_size
+        self.sampled_analyzer = None
 
     def analyze_text_variables(self):
         """
@@ -50,9 +145,11 @@ class TextFileAnalyzer:
             A dictionary containing various text analysis measures.
         """
         if not self.t_analyzer:
-            self.t_analyzer = TextAnalyzer(self.tokenizer)
+            self.t_analyzer, _ = self.get_analyzers()
         else:
             self.t_analyzer.tokenizer = self.tokenizer
+            if self.lexicon_registry:
+                self.t_analyzer.use_lexicon(self.lexicon_registry.lexicon)
         variables = {
             'POSITIVE SCORE': self.t_analyzer.positive_score(),
             'NEGATIVE SCORE': self.t_analyzer.negative_score(),
@@ -102,27 +199,480 @@ class TextFileAnalyzer:
             results (dict): A dictionary containing various text and readability analysis measures for each text file.
         """
 
+        filename, text = self.read_text_file(file_path)
+        results = self.analyze_text(filename, text)
+        self.logger.info(f"Text file {filename} was analyzed successfully.")
+        return results
+
+    def read_text_file(self, file_path):
+        """
+        Reads a text file of the 'textfile' directory.
+
+        Returns:
+            tuple: The URL_ID (the base name of the file) and the text of the file.
+        """
         with open(file_path, 'r', encoding="utf-8") as f:
-            text = f.read().lower()
-            self.tokenizer.text = text
+            text = f.read()
+        filename = os.path.splitext(os.path.basename(file_path))[0]
+        return filename, text
 
-            text_variables = self.analyze_text_variables()
-            readability_variables = self.analyze_readability_variables()
+    def read_document(self, url_id, content_store=None):
+        """
+        Reads the extracted text of a single document, from the given ContentStore or the 'textfile' directory.
 
-            variables = {**text_variables, **readability_variables}
-            filename = os.path.splitext(os.path.basename(file_path))[0]
-            results = {filename: variables}
-            self.logger.info(f"Text file {filename} was analyzed successfully.")
-        return results
+        Returns:
+            str: The text of the document, or None if it was not extracted.
+        """
+        if content_store:
+            return content_store.get_text(url_id)
+        file_path = self.path_helper.get_textfile_path(url_id)
+        if not os.path.exists(file_path):
+            return None
+        return self.read_text_file(file_path)[1]
+
+    def analyze_text(self, url_id, text):
+        """
+        Analyzes the text of a single document.
+
+        Args:
+            url_id (str): The URL_ID of the document.
+            text (str): The extracted text of the document.
+
+        Returns:
+            results (dict): A dictionary mapping the URL_ID to its text and readability analysis measures.
+        """
+        return {url_id: self.analyze_document(url_id, text).as_dict()}
+
+    def analyze_document(self, url_id, text, lexicon=None):
+        """
+        Analyzes the text of a single document.
+
+        Args:
+            url_id (str): The URL_ID of the document.
+            text (str): The extracted text of the document.
+            lexicon (Lexicon): The Lexicon snapshot to score with, by default the current one of the registry.
+
+        Returns:
+            AnalysisResult: The compact record of the text and readability analysis measures.
+        """
+        # pin the current snapshot so that a reload can not change the lexicon within a document
+        if lexicon is None and self.lexicon_registry:
+            lexicon = self.lexicon_registry.lexicon
+        if self.sample_size and not self.token_cache:
+            return self.analyze_sampled(url_id, text, lexicon)
 
-    def analyze_all_files(self):
-        file_paths = self.path_helper.get_textfile_paths()
-        results = {}
-        for path in file_paths:
-            result = self.analyze_single_file(path)
-            results.update(result)
+        text = normalize_text(text)
+        # the text is tokenized once and all measures are calculated from the same tokens
+        if self.token_cache:
+            words, sentence_starts = self.token_cache.tokenize(url_id, text, self.tokenizer)
+            num_sentences = len(sentence_starts)
+        else:
+            words = self.tokenizer.tokenize_words(text)
+            num_sentences = len(self.tokenizer.tokenize_sentences(text))
+        return self.analyze_tokens(url_id, words, num_sentences, lexicon)
+
+    def analyze_sampled(self, url_id, text, lexicon=None):
+        """
+        Estimates the measures of a document from a sample of its sentences with the SampledAnalyzer.
+
+        Returns:
+            AnalysisResult: The point estimates of the text and readability analysis measures.
+        """
+        self.get_analyzers()
+        estimates = self.sampled_analyzer.analyze(text, lexicon=lexicon)
+        estimates.pop('SAMPLED SENTENCES')
+        return AnalysisResult.from_variables(url_id, {measure: value for measure, (value, _, _) in estimates.items()})
+
+    def analyze_tokens(self, url_id, words, num_sentences, lexicon=None):
+        """
+        Calculates the measures of a document from its words and number of sentences.
+
+        Returns:
+            AnalysisResult: The compact record of the text and readability analysis measures.
+        """
+        t_analyzer, r_analyzer = self.get_analyzers()
+        table = self.word_feature_table
+        if table and (lexicon is None or lexicon.matcher is table.matcher):
+            counts = table.counts(words)
+            text_variables = t_analyzer.sentiment_measures(counts, len(words))
+            readability_variables = r_analyzer.readability_measures(counts, num_sentences)
+        else:
+            text_variables = t_analyzer.analyze_tokens(words, lexicon)
+            readability_variables = r_analyzer.analyze_tokens(words, num_sentences)
+
+        variables = {**text_variables, **readability_variables}
+        return AnalysisResult.from_variables(url_id, variables)
+
+    def iter_cached_results(self):
+        """
+        Re-scores every document of the token cache, e.g. after a lexicon update, without reading
+        or tokenizing any text.
+
+        Yields:
+            AnalysisResult: The analysis measures of one cached document.
+        """
+        if not self.token_cache:
+            raise ValueError("iter_cached_results needs a token cache")
+        lexicon = self.lexicon_registry.lexicon if self.lexicon_registry else None
+        for url_id, words, sentence_starts in self.token_cache.iter_documents():
+            yield self.analyze_tokens(url_id, words, len(sentence_starts), lexicon)
+        self.save_word_features()
+        self.logger.info("All cached documents were re-scored successfully.")
+
+    def write_segments(self, sink, window=None, step=1, content_store=None):
+        """
+        Calculates the measures of every sentence and of every window of sentences of the extracted documents
+        and streams them to a columnar sink, one document at a time.
+
+        Args:
+            sink (ColumnarSink): A sink created with the columns SegmentScorer.COLUMNS.
+            window (int): The number of sentences of a window, None for sentences only.
+            step (int): The number of sentences a window moves by.
+            content_store (ContentStore): An optional content store to read the extracted texts from.
+
+        Returns:
+            int: The number of segment rows written.
+        """
+        segment_scorer = SegmentScorer(*self.get_analyzers())
+        count = 0
+        for url_id, text in self.iter_documents(content_store):
+            text = normalize_text(text)
+            lexicon = self.lexicon_registry.lexicon if self.lexicon_registry else None
+            if self.token_cache:
+                words, sentence_starts = self.token_cache.tokenize(url_id, text, self.tokenizer)
+            else:
+                words, sentence_starts = self.tokenizer.tokenize_with_offsets(text)
+            columns = segment_scorer.score(url_id, words, sentence_starts, lexicon, window, step)
+            sink.write(columns)
+            count += len(columns['SENTENCES'])
+            self.logger.info(f"Segments of text file {url_id} were scored successfully.")
+        sink.close()
+        return count
+
+    def get_analyzers(self):
+        """
+        Returns the TextAnalyzer and the ReadabilityAnalyzer, creating them on first use.
+        """
+        if self.profile and not (self.t_analyzer and self.r_analyzer):
+            self.t_analyzer, self.r_analyzer = self.profile.create_analyzers()
+        if not self.t_analyzer:
+            lexicon = self.lexicon_registry.lexicon if self.lexicon_registry else None
+            self.t_analyzer = TextAnalyzer(self.tokenizer, lexicon)
+        if not self.r_analyzer:
+            self.r_analyzer = ReadabilityAnalyzer(self.tokenizer)
+        if self.word_features and not self.word_feature_table:
+            table_path = self.profile.word_features_path if self.profile else None
+            self.word_feature_table = WordFeatureTable(self.t_analyzer, self.r_analyzer, table_path)
+        if self.sample_size and not self.sampled_analyzer:
+            self.sampled_analyzer = SampledAnalyzer(self.t_analyzer, self.r_analyzer, self.sample_size)
+        return self.t_analyzer, self.r_analyzer
+
+    def save_word_features(self):
+        """
+        Stores the words added to the word feature table, so that the next run starts with them.
+        """
+        if self.word_feature_table:
+            self.word_feature_table.save()
+
+    def iter_documents(self, content_store=None):
+        """
+        Yields a tuple (URL_ID, text) for every extracted document, read either from the 'textfile'
+        directory or from the given ContentStore.
+        """
+        if content_store:
+            yield from content_store.iter_texts()
+        else:
+            for path in self.path_helper.get_textfile_paths():
+                yield self.read_text_file(path)
+
+    def iter_results(self, content_store=None):
+        """
+        Analyzes the extracted documents one by one and yields an AnalysisResult for each of them,
+        so that the results can be streamed to a writer without holding all of them in memory.
+
+        Args:
+            content_store (ContentStore): An optional content store to read the extracted texts from.
+
+        Yields:
+            AnalysisResult: The analysis measures of one document.
+        """
+        if self.backend == 'thread':
+            yield from self.iter_results_threaded(self.iter_documents(content_store))
+        elif self.backend == 'process':
+            yield from self.iter_results_process(self.iter_documents(content_store))
+        else:
+            for url_id, text in self.iter_documents(content_store):
+                yield self.analyze_serial(url_id, text)
+        self.save_word_features()
         self.logger.info("All text files were analyzed successfully.")
-        return results
+
+    def analyze_serial(self, url_id, text):
+        """
+        Analyzes a document in the calling thread, through the deduplicator if there is one.
+        A serial analysis can not be interrupted, running over the time limit of the budget is only reported.
+
+        Returns:
+            AnalysisResult: The analysis measures of the document.
+        """
+        started = time.monotonic()
+        if self.deduplicator:
+            result = self.analyze_deduplicated(url_id, text)
+        else:
+            result = self.analyze_document(url_id, text)
+        if self.budget and self.budget.document_timeout \
+                and time.monotonic() - started > self.budget.document_timeout:
+            self.budget.count('analysis_timeouts')
+            self.logger.error(f"Text file {url_id} took longer than {self.budget.document_timeout} seconds")
+        self.logger.info(f"Text file {url_id} was analyzed successfully.")
+        return result
+
+    def thread_count(self):
+        """
+        Returns the number of threads of the 'thread' backend, or of processes of the 'process' backend.
+        """
+        if self.max_workers:
+            return self.max_workers
+        if self.backend == 'process':
+            return os.cpu_count() or 1
+        gil_enabled = getattr(sys, '_is_gil_enabled', lambda: True)()
+        cores = os.cpu_count() or 1
+        return cores if not gil_enabled else min(4, cores)
+
+    def iter_results_threaded(self, documents):
+        """
+        Analyzes the documents with a thread pool and yields their results in input order.
+        At most twice the number of threads documents are in flight, so the results are still streamed.
+
+        The analyzers are created before the threads start and only their stateless analyze_tokens methods
+        are called from the threads. The documents are read, deduplicated and pinned to a lexicon in the calling
+        thread. Deduplication goes through the deduplicator like in the serial backend: a duplicate reuses the
+        cached result of its original, or the future of the original while that one is still in flight.
+        With a budget, fewer documents are kept in flight if their number or their text bytes would exceed it,
+        and documents that run longer than the time limit get an output row without measures.
+
+        Args:
+            documents (iterable): Tuples (URL_ID, text) of the documents to analyze.
+
+        Yields:
+            AnalysisResult: The analysis measures of one document.
+        """
+        self.get_analyzers()
+        workers = self.thread_count()
+        self.logger.info(f"Analyzing with {workers} threads")
+        with ThreadPoolExecutor(max_workers=workers, thread_name_prefix='analyzer') as executor:
+            yield from self.iter_pooled_results(
+                documents, workers, lambda analyzer, url_id, text, lexicon: executor.submit(
+                    analyzer.analyze_document, url_id, text, lexicon))
+
+    def iter_results_process(self, documents):
+        """
+        Analyzes the documents with a process pool and yields their results in input order, like
+        iter_results_threaded. The lexicons and stop words are published in a SharedLexicon block that the
+        workers attach to. The whole run is scored with the lexicon that is current when it starts.
+
+        The shared lexicon holds single words only, so with phrase entries, a token cache or word features,
+        which live in the calling process, the documents are analyzed by the thread backend instead.
+
+        Args:
+            documents (iterable): Tuples (URL_ID, text) of the documents to analyze.
+
+        Yields:
+            AnalysisResult: The analysis measures of one document.
+        """
+        t_analyzer, r_analyzer = self.get_analyzers()
+        lexicon = self.lexicon_registry.lexicon if self.lexicon_registry else None
+        matcher = lexicon.matcher if lexicon else t_analyzer.matcher
+        if getattr(matcher, 'has_phrases', False) or self.token_cache or self.word_feature_table:
+            self.logger.error("The process backend can not share phrases, token caches or word features, "
+                              "the documents are analyzed by the thread backend")
+            yield from self.iter_results_threaded(documents)
+            return
+        entries = {'positive': t_analyzer.positive_dict or (), 'negative': t_analyzer.negative_dict or (),
+                   'stop': r_analyzer.english_stop_words()}
+        shared = SharedLexicon.create(entries, version=self.lexicon_version(lexicon) or 0)
+        # the nltk models are loaded before the pool starts, so that forked workers inherit them
+        self.tokenizer.tokenize_words('Load the models.')
+        self.tokenizer.tokenize_sentences('Load the models.')
+        workers = self.thread_count()
+        self.logger.info(f"Analyzing with {workers} processes")
+        try:
+            with ProcessPoolExecutor(max_workers=workers, initializer=attach_worker,
+                                     initargs=(shared.name, self.tokenizer, self.sample_size)) as executor:
+                yield from self.iter_pooled_results(
+                    documents, workers, lambda _, url_id, text, __: executor.submit(analyze_in_worker, url_id, text),
+                    lexicon)
+        finally:
+            shared.close()
+            shared.unlink()
+
+    def iter_pooled_results(self, documents, workers, submit, pinned_lexicon=None):
+        """
+        Submits the documents to a pool and yields their results in input order. At most twice the number of
+        workers documents are in flight, so the results are still streamed.
+
+        Args:
+            documents (iterable): Tuples (URL_ID, text) of the documents to analyze, or (URL_ID, text, analyzer)
+                to analyze a document with another TextFileAnalyzer, e.g. the one of its AnalysisProfile.
+            workers (int): The number of workers of the pool.
+            submit (callable): Submits (analyzer, URL_ID, text, lexicon) to the pool and returns the future of
+                the result.
+            pinned_lexicon (Lexicon): The lexicon of the whole run, by default the current one of the registry
+                of the analyzer is pinned per document.
+
+        Yields:
+            AnalysisResult: The analysis measures of one document.
+        """
+        # futures of the originals in flight by (exact fingerprint, lexicon version), their results are
+        # handed to the deduplicator cache when they are collected, so this holds at most the pending documents
+        in_flight = {}
+        pending = deque()
+        pending_bytes = 0
+        for url_id, text, *routed in documents:
+            analyzer = routed[0] if routed else self
+            waited = False
+            while self.budget and not self.budget.analysis_admitted(len(pending), pending_bytes, len(text), waited):
+                waited = True
+                result, pending_bytes = self.next_threaded_result(pending, pending_bytes, in_flight)
+                yield result
+            lexicon = pinned_lexicon
+            if lexicon is None and analyzer.lexicon_registry:
+                lexicon = analyzer.lexicon_registry.lexicon
+            future, key = None, None
+            if self.deduplicator:
+                future, key = analyzer.deduplicated_future(url_id, text, lexicon, in_flight)
+            if future is None:
+                future = submit(analyzer, url_id, text, lexicon)
+                if key:
+                    in_flight[key] = future
+            # [URL_ID, future, text bytes, deduplication key, time the document was seen running]
+            pending.append([url_id, future, len(text), key, None])
+            pending_bytes += len(text)
+            if len(pending) >= 2 * workers:
+                result, pending_bytes = self.next_threaded_result(pending, pending_bytes, in_flight)
+                yield result
+        while pending:
+            result, pending_bytes = self.next_threaded_result(pending, pending_bytes, in_flight)
+            yield result
+
+    def deduplicated_future(self, url_id, text, lexicon, in_flight):
+        """
+        Checks a document against the deduplicator before it is submitted to the pool.
+
+        Returns:
+            tuple: The future to take the result from, None if the document has to be analyzed, and the
+                (exact fingerprint, lexicon version) key under which an analyzed document is cached, None
+                for a duplicate.
+        """
+        lexicon_version = self.lexicon_version(lexicon)
+        digest, original_id = self.deduplicator.check_exact(url_id, text)
+        key = (digest, lexicon_version)
+        if original_id is None:
+            self.deduplicator.check_near(url_id, text)
+            return None, key
+        cached = self.deduplicator.cached_result(digest, lexicon_version)
+        if cached:
+            future = Future()
+            future.set_result(cached)
+            return future, None
+        # the original is still in flight, or its result was evicted from the cache and it is analyzed again
+        future = in_flight.get(key)
+        return future, None if future else key
+
+    def lexicon_version(self, lexicon=None):
+        """
+        Returns the version of the lexicon a document is scored with, part of the keys of the cached results:
+        the version of the pinned snapshot, or of the lexicon of the profile, or None for the MasterDictionary.
+        """
+        if lexicon:
+            return lexicon.version
+        if self.profile:
+            self.get_analyzers()
+            return self.profile.version
+        return None
+
+    def next_threaded_result(self, pending, pending_bytes, in_flight=None):
+        """
+        Takes the oldest document in flight and waits for its result. The result of an analyzed original
+        is handed to the deduplicator cache.
+
+        Returns:
+            tuple: The AnalysisResult, without measures if the document ran over the time limit, and the text
+                bytes still in flight.
+        """
+        result = self.threaded_result(pending)
+        url_id, future, nbytes, key, _ = pending.popleft()
+        if key:
+            if in_flight.get(key) is future:
+                del in_flight[key]
+            if result:
+                self.deduplicator.cache_result(key[0], result, key[1])
+        return result or AnalysisResult(url_id), pending_bytes - nbytes
+
+    def threaded_result(self, pending):
+        """
+        Waits for the result of the oldest document in flight.
+        Exact duplicates share the future of the original document and get a copy with their own URL_ID.
+
+        The time limit of the budget counts from when a worker starts the document, not from when this thread
+        starts waiting, so the time a document spends queued behind others does not count. While waiting, the
+        documents in flight are checked every POLL_SECONDS for having started. A running document can not be
+        interrupted: one over the limit is given up and finishes in the background, its result is dropped.
+
+        Returns:
+            AnalysisResult: The analysis measures, None if the document ran over the time limit.
+        """
+        url_id, future = pending[0][:2]
+        timeout = self.budget.document_timeout if self.budget else None
+        while timeout and not future.done():
+            wait([future], timeout=self.POLL_SECONDS)
+            now = time.monotonic()
+            for entry in pending:
+                if entry[4] is None and entry[1].running():
+                    entry[4] = now
+            started = pending[0][4]
+            if started is not None and now - started > timeout and not future.done():
+                self.budget.count('analysis_timeouts')
+                self.logger.error(f"Text file {url_id} was given up, it ran longer than {timeout} seconds")
+                return None
+        result = future.result()
+        self.logger.info(f"Text file {url_id} was analyzed successfully.")
+        return result if result.url_id == url_id else result.with_url_id(url_id)
+
+    def analyze_deduplicated(self, url_id, text):
+        """
+        Analyzes a document unless it is an exact duplicate of an already analyzed one,
+        in which case the cached measures are reused. Near duplicates are flagged by the deduplicator.
+
+        Returns:
+            AnalysisResult: The analysis measures of the document.
+        """
+        lexicon = self.lexicon_registry.lexicon if self.lexicon_registry else None
+        lexicon_version = self.lexicon_version(lexicon)
+
+        digest, original_id = self.deduplicator.check_exact(url_id, text)
+        if original_id is not None:
+            cached = self.deduplicator.cached_result(digest, lexicon_version)
+            if cached:
+                return cached.with_url_id(url_id)
+        else:
+            self.deduplicator.check_near(url_id, text)
+
+        result = self.analyze_document(url_id, text, lexicon)
+        self.deduplicator.cache_result(digest, result, lexicon_version)
+        return result
+
+    def analyze_all_files(self, content_store=None):
+        """
+        Analyzes all the extracted documents, either the files in the 'textfile' directory or,
+        if a ContentStore is given, the texts kept in the content store.
+
+        Args:
+            content_store (ContentStore): An optional content store to read the extracted texts from.
+
+        Returns:
+            results (dict): A dictionary containing various text and readability analysis measures for each document.
+        """
+        return {result.url_id: result.as_dict() for result in self.iter_results(content_store)}
 
 
 if __name__ == "__main__":
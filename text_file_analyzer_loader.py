@@ -21,6 +21,9 @@ merge_data(output_path: str) -> None:
 Merges the output data structure DataFrame with the analyzed text files DataFrame and saves the final
 data value file.
 
+stream_data(sink: OutputSink) -> int:
+Analyzes text files and upserts each result into an output sink as soon as it is ready.
+
 Parameters:
 output_path : str
 The path to save the final output file.
@@ -31,6 +34,7 @@ None
 
 from logger import Logger
 from text_file_analyzer import TextFileAnalyzer
+from analysis_result import AnalysisResult
 import pandas as pd
 import os
 
@@ -40,28 +44,39 @@ class TextFileAnalyzerLoader:
     A class to load and analyze text files and output the final data structure.
     """
 
-    def __init__(self):
+    def __init__(self, content_store=None, text_file_analyzer=None, sample_size=None):
         """
         Initializes the TextFileAnalyzerLoader object.
+
+        Parameters
+        ----------
+        content_store : ContentStore
+            An optional content store to read the extracted texts from instead of the 'textfile' directory.
+        text_file_analyzer : TextFileAnalyzer or ProfileRouter
+            An optional analyzer of the documents, e.g. a ProfileRouter for documents in several languages.
+        sample_size : int
+            If given, the default analyzer estimates the measures of long documents from a sample of this many
+            sentences, see TextFileAnalyzer.
         """
         try:
             self.logger = Logger(__name__, 'text_file_analyzer_loader.log', log_to_console=True).logger
-            self.text_file_analyzer = TextFileAnalyzer()
+            self.text_file_analyzer = text_file_analyzer or TextFileAnalyzer(sample_size=sample_size)
+            self.content_store = content_store
         except Exception as e:
             self.logger.error(f"An error occurred during initialization: {str(e)}")
 
     def load_files(self) -> pd.DataFrame:
         """
         Loads and analyzes text files, returning a pandas DataFrame.
+        All result rows are held in memory, merge_data with an OutputSink streams them instead.
         """
         try:
-            text_file_data = self.text_file_analyzer.analyze_all_files()
+            results = self.text_file_analyzer.iter_results(self.content_store)
 
-            # importing text_file_data as DataFrame
-            text_file_df = pd.DataFrame(text_file_data).T
-            text_file_df = text_file_df.reset_index().rename(columns={"index": "URL_ID"})
-            text_file_df["URL_ID"] = text_file_df["URL_ID"].astype("int64")
-            return text_file_df
+            # building the DataFrame straight from the compact result rows
+            text_file_df = pd.DataFrame.from_records((result.as_row() for result in results),
+                                                     columns=list(AnalysisResult.COLUMNS))
+            return text_file_df.astype(AnalysisResult.DTYPES)
 
         except Exception as e:
             self.logger.error(f"An error occurred while loading and analyzing text files: {str(e)}")
@@ -84,7 +99,28 @@ class TextFileAnalyzerLoader:
         except Exception as e:
             self.logger.error(f"An error occurred while loading output data structure file: {str(e)}")
 
-    def merge_data(self, output_path: str) -> None:
+    def stream_data(self, sink) -> int:
+        """
+        Analyzes text files and upserts each result into the output sink as soon as it is ready,
+        so that the results are visible while the analysis is running.
+
+        Parameters
+        ----------
+        sink : OutputSink
+            The sink receiving the result rows.
+
+        Returns
+        -------
+        int
+            The number of result rows written.
+        """
+        try:
+            return sink.write_many(self.text_file_analyzer.iter_results(self.content_store))
+        except Exception as e:
+            self.logger.error(f"An error occurred while streaming the results to the output sink: {str(e)}")
+            return 0
+
+    def merge_data(self, output_path: str, sink=None) -> None:
         """
         Merges the output data structure DataFrame with the analyzed text files DataFrame
         and saves the final data value file.
@@ -93,11 +129,19 @@ class TextFileAnalyzerLoader:
         ----------
         output_path : str
             The path to save the final output file.
+        sink : OutputSink
+            An optional output sink. The results are streamed into it and the final output file
+            is compacted from the sink instead of being built in memory.
 
         Returns
         -------
         None
         """
+        if sink:
+            self.stream_data(sink)
+            sink.compact(output_path, self.load_data_structure())
+            return
+
         try:
             output_data_df = self.load_data_structure()
             text_file_df = self.load_files()
@@ -0,0 +1,180 @@
+"""
+This module provides a TextFileWriter class that writes the extracted text files in a dedicated thread,
+so that slow disks or network filesystems do not stall the event loop fetching the web pages.
+
+The extractor only puts (URL_ID, content) items into a queue. The writer thread takes the items in batches,
+coalesces repeated writes of the same URL_ID within a batch (the last one wins), writes the files and
+fsyncs them on a configurable schedule. At every checkpoint of the schedule all files written since the previous
+checkpoint and the folder are fsynced, and the remaining ones when the writer is closed. The output folder is
+created once, when the writer starts. If a ContentStore is given, the items are stored in it instead of being
+written as text files.
+
+Every item can carry a callback that is called in the writer thread with the outcome of its write: None once
+it is written, or the exception if the write failed, so that the caller only records a page as saved when it is.
+
+Classes:
+    TextFileWriter: Writes extracted text files from a queue in a background thread.
+
+Example:
+    writer = TextFileWriter()
+    writer.submit(url_id, content)
+    writer.close()
+"""
+
+import os
+import queue
+import threading
+import time
+from logger import Logger
+
+
+class TextFileWriter:
+    """
+    A class that writes extracted text files in batches from a background thread.
+    """
+
+    def __init__(self, textfile_folder=None, content_store=None, batch_size=64, fsync_every=0, fsync_interval=0.0):
+        """
+        Initializes the TextFileWriter object, creates the output folder and starts the writer thread.
+
+        Args:
+            textfile_folder (str): The folder of the text files, by default 'textfile' in the parent directory.
+            content_store (ContentStore): An optional content store the items are stored in instead.
+            batch_size (int): The largest number of queued items written in one batch.
+            fsync_every (int): fsync after a batch in which this many files were written since the last
+                checkpoint, 0 to not count files.
+            fsync_interval (float): fsync after a batch if this many seconds passed since the last checkpoint,
+                0 to not use time. With both at 0 the files are never fsynced and the operating system flushes them.
+        """
+        self.logger = Logger(__name__, 'text_file_writer.log', log_to_console=True).logger
+        if textfile_folder is None:
+            textfile_folder = os.path.abspath(os.path.join(os.getcwd(), os.pardir, 'textfile'))
+        self.textfile_folder = textfile_folder
+        self.content_store = content_store
+        self.batch_size = batch_size
+        self.fsync_every = fsync_every
+        self.fsync_interval = fsync_interval
+        # the paths written since the last checkpoint, only kept with an fsync schedule
+        self.unsynced = []
+        self.last_fsync = time.monotonic()
+        self.written = 0
+        self.queue = queue.Queue()
+        if not content_store:
+            os.makedirs(self.textfile_folder, exist_ok=True)
+        self.thread = threading.Thread(target=self.run, name='text-file-writer', daemon=True)
+        self.thread.start()
+
+    def submit(self, url_id, content, page_html=None, on_written=None):
+        """
+        Queues the extracted content of a URL_ID for writing, it does not block.
+        on_written is called in the writer thread once the item is written (or replaced by a later write of the
+        same URL_ID), with None on success or the exception of a failed write, e.g. to give back the budget the
+        item holds and to record the page as saved.
+        """
+        self.queue.put((url_id, content, page_html, on_written))
+
+    def run(self):
+        """
+        The loop of the writer thread: takes batches from the queue until it receives None.
+        """
+        running = True
+        while running:
+            batch = [self.queue.get()]
+            while len(batch) < self.batch_size:
+                try:
+                    batch.append(self.queue.get_nowait())
+                except queue.Empty:
+                    break
+            if None in batch:
+                running = False
+            # repeated writes of a URL_ID within a batch are coalesced, the last one wins
+            items = {item[0]: item for item in batch if item is not None}
+            errors = {url_id: self.write(url_id, content, page_html)
+                      for url_id, content, page_html, _ in items.values()}
+            if self.unsynced and (self.fsync_due() or not running):
+                sync_error = self.sync()
+                if sync_error:
+                    errors = {url_id: error or sync_error for url_id, error in errors.items()}
+            for item in batch:
+                try:
+                    if item is not None and item[3]:
+                        item[3](errors[item[0]])
+                except Exception as e:
+                    # a failing callback must not stop the writer thread, flush would wait forever
+                    self.logger.error(f"URL_ID {item[0]} Error in the callback of the written file: {e!r}")
+                finally:
+                    self.queue.task_done()
+
+    def fsync_due(self):
+        """
+        Returns True if the fsync schedule asks for a checkpoint.
+        """
+        if self.fsync_every and len(self.unsynced) >= self.fsync_every:
+            return True
+        return bool(self.fsync_interval) and time.monotonic() - self.last_fsync >= self.fsync_interval
+
+    def sync(self):
+        """
+        A checkpoint: fsyncs every file written since the last checkpoint and the folder, so that their
+        directory entries are durable as well.
+
+        Returns:
+            Exception: The error of a failed fsync, None if the checkpoint succeeded.
+        """
+        paths, self.unsynced = self.unsynced, []
+        try:
+            for path in dict.fromkeys(paths):
+                fd = os.open(path, os.O_RDWR)
+                try:
+                    os.fsync(fd)
+                finally:
+                    os.close(fd)
+            # directories can only be opened and fsynced on POSIX systems
+            if hasattr(os, 'O_DIRECTORY'):
+                fd = os.open(self.textfile_folder, os.O_RDONLY | os.O_DIRECTORY)
+                try:
+                    os.fsync(fd)
+                finally:
+                    os.close(fd)
+            self.last_fsync = time.monotonic()
+            return None
+        except OSError as e:
+            self.logger.error(f"Error in syncing {len(paths)} text files: {e}")
+            return e
+
+    def write(self, url_id, content, page_html):
+        """
+        Writes a single item to its text file or to the content store.
+
+        Returns:
+            Exception: The error of a failed write, None if the item was written.
+        """
+        try:
+            if self.content_store:
+                self.content_store.put(url_id, page_html, content)
+            else:
+                path = os.path.join(self.textfile_folder, f"{url_id}")
+                with open(path, "w", encoding="utf-8") as file:
+                    file.write(content)
+                if self.fsync_every or self.fsync_interval:
+                    self.unsynced.append(path)
+            self.written += 1
+            self.logger.info(f"URL_ID {url_id} Page content stored in {url_id}.txt file successfully")
+            return None
+        except Exception as e:
+            self.logger.error(f"URL_ID {url_id} Error in writing the file: {e}")
+            return e
+
+    def flush(self):
+        """
+        Blocks until every queued item has been written.
+        """
+        self.queue.join()
+
+    def close(self):
+        """
+        Writes the remaining items and stops the writer thread.
+        """
+        self.queue.put(None)
+        self.thread.join()
+        self.logger.info(f"Text file writer closed after writing {self.written} files")
@@ -0,0 +1,274 @@
+"""
+This module provides a TokenCorpusCache class that keeps the tokenized corpus on disk as compact token ID arrays,
+so that re-analyzing the corpus after a lexicon or formula change does not tokenize the texts again.
+
+Layout of the cache folder:
+- vocabulary.txt: the shared vocabulary, one token per line, the line number is the token ID.
+- tokens.bin: an append only array of uint32 values holding, for every tokenized text, the token IDs of its
+  words followed by the index of the first word of each sentence. It is memory mapped for reading.
+- index.db: a SQLite index with one row per URL_ID and tokenizer version, holding the content hash of the text
+  and the position of its words and sentence offsets in tokens.bin.
+
+A document whose text changed gets its row replaced, and documents with the same text share the token array
+of the first one. Only the index commit makes an array part of the cache: when the cache is opened, the
+vocabulary and tokens.bin are cut back to their last complete entry, so that a write interrupted by a crash
+can not shift the positions of the following entries.
+
+Classes:
+    TokenCorpusCache: Stores and loads tokenized documents.
+
+Example:
+    token_cache = TokenCorpusCache()
+    words, sentence_starts = token_cache.tokenize(url_id, text, tokenizer)
+"""
+
+import os
+import mmap
+import hashlib
+import sqlite3
+import threading
+from array import array
+from logger import Logger
+
+
+class TokenCorpusCache:
+    """
+    A class that stores tokenized documents as uint32 token ID arrays with a shared vocabulary.
+    """
+
+    def __init__(self, cache_dir=None, tokenizer_version=None):
+        """
+        Initializes the TokenCorpusCache object, creates the cache folder and loads the vocabulary.
+
+        Args:
+            cache_dir (str): The cache folder, by default 'tokencache' in the parent directory.
+            tokenizer_version (str): The version of the tokenization, part of every key. By default
+                Tokenizer.VERSION, it has to change whenever the tokenization changes.
+        """
+        self.logger = Logger(__name__, 'token_cache.log', log_to_console=True).logger
+        if cache_dir is None:
+            cache_dir = os.path.abspath(os.path.join(os.getcwd(), os.pardir, 'tokencache'))
+        if tokenizer_version is None:
+            from tokenizer import Tokenizer
+            tokenizer_version = Tokenizer.VERSION
+        self.cache_dir = cache_dir
+        self.tokenizer_version = tokenizer_version
+        self.lock = threading.Lock()
+        self.mapped = None
+        self.mapped_size = 0
+        try:
+            os.makedirs(self.cache_dir, exist_ok=True)
+            self.vocabulary_path = os.path.join(self.cache_dir, 'vocabulary.txt')
+            self.tokens_path = os.path.join(self.cache_dir, 'tokens.bin')
+            self.vocabulary = self.load_vocabulary()
+            self.token_ids = {token: token_id for token_id, token in enumerate(self.vocabulary)}
+            self.connection = sqlite3.connect(os.path.join(self.cache_dir, 'index.db'), check_same_thread=False)
+            columns = [row[1] for row in self.connection.execute('PRAGMA table_info(documents)')]
+            if 'key' in columns:
+                # the index of older versions was keyed by the content hash, it is rebuilt on the next run
+                self.connection.execute('DROP TABLE documents')
+                self.logger.info("Token cache index of an older version dropped")
+            self.connection.execute(
+                'CREATE TABLE IF NOT EXISTS documents ('
+                'url_id TEXT NOT NULL, tokenizer_version TEXT NOT NULL, content_hash TEXT NOT NULL, '
+                'offset INTEGER NOT NULL, num_words INTEGER NOT NULL, num_sentences INTEGER NOT NULL, '
+                'PRIMARY KEY (url_id, tokenizer_version))')
+            self.connection.execute(
+                'CREATE INDEX IF NOT EXISTS documents_content_hash ON documents (content_hash, tokenizer_version)')
+            self.connection.commit()
+            self.truncate_tokens()
+            self.logger.info(f"Token cache {self.cache_dir} opened with {len(self.vocabulary)} vocabulary entries")
+        except Exception as e:
+            self.logger.exception(f"Failed to open token cache {self.cache_dir}: {e}")
+            raise
+
+    def load_vocabulary(self):
+        """
+        Reads the vocabulary file. A last line without line break was cut by an interrupted write, it is
+        removed from the file so that the next words get the IDs the cached token arrays expect.
+
+        Returns:
+            list: The tokens of the vocabulary, the index is the token ID.
+        """
+        if not os.path.exists(self.vocabulary_path):
+            return []
+        with open(self.vocabulary_path, 'rb+') as f:
+            data = f.read()
+            complete = data.rfind(b'\n') + 1
+            if complete < len(data):
+                f.truncate(complete)
+                self.logger.info(f"Incomplete vocabulary entry of {len(data) - complete} bytes removed")
+        return data[:complete].decode('utf-8').split('\n')[:-1]
+
+    def truncate_tokens(self):
+        """
+        Cuts tokens.bin back to the end of the last token array referenced by the index, removing arrays
+        whose index row was never committed and a partially written last value.
+        """
+        row = self.connection.execute('SELECT MAX(offset + num_words + num_sentences) FROM documents').fetchone()
+        committed = (row[0] or 0) * 4
+        if os.path.exists(self.tokens_path) and os.path.getsize(self.tokens_path) > committed:
+            with open(self.tokens_path, 'rb+') as f:
+                f.truncate(committed)
+            self.logger.info(f"tokens.bin truncated to the last committed offset {committed // 4}")
+
+    @staticmethod
+    def content_hash(text):
+        """
+        Returns the SHA-256 hash of a text.
+        """
+        return hashlib.sha256(text.encode('utf-8')).hexdigest()
+
+    def encode(self, words):
+        """
+        Converts words to token IDs, adding new words to the vocabulary file.
+        """
+        new_words = []
+        ids = array('I')
+        for word in words:
+            token_id = self.token_ids.get(word)
+            if token_id is None:
+                token_id = len(self.vocabulary)
+                self.vocabulary.append(word)
+                self.token_ids[word] = token_id
+                new_words.append(word)
+            ids.append(token_id)
+        if new_words:
+            with open(self.vocabulary_path, 'a', encoding='utf-8') as f:
+                f.write(''.join(f'{word}\n' for word in new_words))
+        return ids
+
+    def read_array(self, offset, length):
+        """
+        Reads `length` uint32 values at `offset` of the memory mapped tokens file.
+        """
+        # an empty file can not be memory mapped, e.g. when every cached document so far has no words
+        if length == 0:
+            return array('I')
+        end = (offset + length) * 4
+        if self.mapped is None or end > self.mapped_size:
+            if self.mapped is not None:
+                self.mapped.close()
+            with open(self.tokens_path, 'rb') as f:
+                self.mapped = mmap.mmap(f.fileno(), 0, access=mmap.ACCESS_READ)
+            self.mapped_size = len(self.mapped)
+        values = array('I')
+        values.frombytes(self.mapped[offset * 4:end])
+        return values
+
+    def load(self, row):
+        """
+        Loads the words and sentence starts of an index row (offset, number of words, number of sentences).
+        """
+        offset, num_words, num_sentences = row
+        values = self.read_array(offset, num_words + num_sentences)
+        vocabulary = self.vocabulary
+        words = [vocabulary[token_id] for token_id in values[:num_words]]
+        return words, values[num_words:].tolist()
+
+    def find(self, url_id, content_hash):
+        """
+        Returns the index row (URL_ID, offset, number of words, number of sentences) of the token array of a text:
+        the row of the URL_ID if its text did not change, otherwise the row of any document with the same text.
+        None if the text is not cached.
+        """
+        row = self.connection.execute(
+            'SELECT url_id, offset, num_words, num_sentences FROM documents '
+            'WHERE url_id = ? AND tokenizer_version = ? AND content_hash = ?',
+            (str(url_id), self.tokenizer_version, content_hash)).fetchone()
+        if row:
+            return row
+        return self.connection.execute(
+            'SELECT url_id, offset, num_words, num_sentences FROM documents '
+            'WHERE content_hash = ? AND tokenizer_version = ? LIMIT 1',
+            (content_hash, self.tokenizer_version)).fetchone()
+
+    def index(self, url_id, content_hash, offset, num_words, num_sentences):
+        """
+        Points the row of a URL_ID at a token array, replacing the row of its previous text.
+        """
+        self.connection.execute(
+            'INSERT OR REPLACE INTO documents (url_id, tokenizer_version, content_hash, offset, num_words, '
+            'num_sentences) VALUES (?, ?, ?, ?, ?, ?)',
+            (str(url_id), self.tokenizer_version, content_hash, offset, num_words, num_sentences))
+        self.connection.commit()
+
+    def get(self, url_id, text):
+        """
+        Returns the cached words and sentence starts of the text of a URL_ID, or None if the text is not cached.
+        A text cached for another URL_ID is indexed for this one as well, sharing its token array.
+        """
+        content_hash = self.content_hash(text)
+        with self.lock:
+            row = self.find(url_id, content_hash)
+            if not row:
+                return None
+            owner, *row = row
+            if owner != str(url_id):
+                self.index(url_id, content_hash, *row)
+            return self.load(row)
+
+    def put(self, url_id, text, words, sentence_starts):
+        """
+        Stores the words and sentence starts of the text of a URL_ID, replacing the entry of its previous text.
+        The token array of a document with the same text is reused instead of appending a copy.
+
+        Args:
+            url_id (str): The URL_ID of the document.
+            text (str): The text the words were tokenized from.
+            words (list): The words of the text.
+            sentence_starts (list): The index of the first word of each sentence.
+        """
+        content_hash = self.content_hash(text)
+        with self.lock:
+            row = self.find(url_id, content_hash)
+            if row:
+                offset = row[1]
+            else:
+                values = self.encode(words)
+                values.extend(sentence_starts)
+                with open(self.tokens_path, 'ab') as f:
+                    offset = f.tell() // 4
+                    values.tofile(f)
+            self.index(url_id, content_hash, offset, len(words), len(sentence_starts))
+
+    def tokenize(self, url_id, text, tokenizer):
+        """
+        Returns the words and sentence starts of a text, from the cache or by tokenizing it and caching the result.
+
+        Args:
+            url_id (str): The URL_ID of the document.
+            text (str): The text to tokenize.
+            tokenizer (Tokenizer): The tokenizer used on a cache miss.
+
+        Returns:
+            tuple: The list of words and the list of sentence starts (index of the first word of each sentence).
+        """
+        cached = self.get(url_id, text)
+        if cached:
+            return cached
+        words, sentence_starts = tokenizer.tokenize_with_offsets(text)
+        self.put(url_id, text, words, sentence_starts)
+        return words, sentence_starts
+
+    def iter_documents(self):
+        """
+        Yields a tuple (URL_ID, words, sentence starts) for every document cached with the current tokenizer
+        version, without reading or tokenizing any text.
+        """
+        with self.lock:
+            rows = self.connection.execute(
+                'SELECT url_id, offset, num_words, num_sentences FROM documents WHERE tokenizer_version = ? '
+                'ORDER BY url_id', (self.tokenizer_version,)).fetchall()
+        for url_id, *row in rows:
+            with self.lock:
+                words, sentence_starts = self.load(row)
+            yield url_id, words, sentence_starts
+
+    def close(self):
+        """
+        Closes the index and the memory map.
+        """
+        if self.mapped is not None:
+            self.mapped.close()
+        self.connection.close()
@@ -1,36 +1,65 @@
-from typing import List
+from typing import List, Optional, Tuple
 from nltk.tokenize import word_tokenize, sent_tokenize
 from logger import Logger
 
 
+def normalize_text(text: str) -> str:
+    """
+    Normalizes the text of a document before it is tokenized and scored. Every analysis path (the pipeline,
+    the batch APIs and the segment scores) calls it, so the same input gets the same scores everywhere.
+
+    Args:
+    - text (str): the text of the document
+
+    Returns:
+    - str: the lower cased text
+    """
+    return text.lower()
+
+
 class Tokenizer:
     """
     A class that can be used to tokenize text into words and sentences.
     Methods:
     - tokenize_words(text: str) -> List[str]
     - tokenize_sentences(text: str) -> List[str]
+    - tokenize_with_offsets(text: str) -> Tuple[List[str], List[int]]
+
+    If the text is passed to a method, it is tokenized instead of self.text. This does not change
+    the state of the tokenizer, so one Tokenizer can be shared by several threads.
+
+    VERSION identifies the tokenization in the token cache, it has to change whenever the tokenization changes.
+    The version of a tokenizer instance (the version attribute) also names the language of the nltk models.
     """
 
-    def __init__(self, text):
+    VERSION = 'nltk-alpha-1'
+
+    def __init__(self, text, language='english'):
         """
         Initializes the Tokenizer object.
+
+        Args:
+        - text (str): the default text to be tokenized
+        - language (str): the language of the nltk sentence tokenizer model, e.g. 'english' or 'german'
         """
         self.text = text
+        self.language = language
+        self.version = self.VERSION if language == 'english' else f'{self.VERSION}-{language}'
         self.logger = Logger(__name__, 'tokenizer.log', log_to_console=True).logger
 
-    def tokenize_words(self) -> List[str]:
+    def tokenize_words(self, text: Optional[str] = None) -> List[str]:
         """
         Tokenizes the input text into a list of words.
 
         Args:
-        - text (str): the text to be tokenized
+        - text (str): the text to be tokenized, by default self.text
 
         Returns:
         - List[str]: a list of tokenized words
         """
         try:
             # Use word_tokenize() to split the text into individual words
-            words = word_tokenize(self.text)
+            words = word_tokenize(self.text if text is None else text, language=self.language)
             # Remove any words that are not alphabetical
             words = [word for word in words if word.isalpha()]
             self.logger.info("Successfully tokenized words from the text")
@@ -39,19 +68,19 @@ class Tokenizer:
             self.logger.error("Error occurred while tokenizing words: {}".format(e))
             raise Exception("Error occurred while tokenizing words: {}".format(e))
 
-    def tokenize_sentences(self) -> List[str]:
+    def tokenize_sentences(self, text: Optional[str] = None) -> List[str]:
         """
         Tokenizes the input text into a list of sentences.
 
         Args:
-        - text (str): the text to be tokenized
+        - text (str): the text to be tokenized, by default self.text
 
         Returns:
         - List[str]: a list of tokenized sentences
         """
         try:
             # Use sent_tokenize() to split the text into individual sentences
-            sentences = sent_tokenize(self.text)
+            sentences = sent_tokenize(self.text if text is None else text, language=self.language)
             # Remove any leading/trailing whitespace from each sentence
             sentences = [sentence.strip() for sentence in sentences]
             self.logger.info("Successfully tokenized sentences from the text")
@@ -59,3 +88,23 @@ class Tokenizer:
         except Exception as e:
             self.logger.error("Error occurred while tokenizing sentences: {}".format(e))
             raise Exception("Error occurred while tokenizing sentences: {}".format(e))
+
+    def tokenize_with_offsets(self, text: Optional[str] = None) -> Tuple[List[str], List[int]]:
+        """
+        Tokenizes the input text into words and records where every sentence starts.
+
+        word_tokenize splits the text into sentences itself, so tokenizing sentence by sentence gives the
+        same words as tokenize_words on the whole text.
+
+        Args:
+        - text (str): the text to be tokenized, by default self.text
+
+        Returns:
+        - Tuple[List[str], List[int]]: the words and the index of the first word of each sentence
+        """
+        words = []
+        sentence_starts = []
+        for sentence in self.tokenize_sentences(text):
+            sentence_starts.append(len(words))
+            words.extend(self.tokenize_words(sentence))
+        return words, sentence_starts
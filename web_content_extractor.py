@@ -4,7 +4,6 @@ The module uses asyncio to concurrently fetch and extract the content of the web
 and stores the extracted content in individual text files in a specified folder.
 
 Dependencies:
-- pandas
 - os
 - re
 - bs4 (BeautifulSoup)
@@ -12,10 +11,10 @@ Dependencies:
 - logger
 
 Usage:
-1. Place the URLs to extract in an Excel file with the following columns:
+1. Place the URLs to extract in an Excel or CSV file with the following columns:
    - URL_ID: unique identifier for each URL
    - URL: the URL to extract content from
-2. Specify the path to the Excel file in the import_excel_file function.
+2. Pass the path of the file to extract_all_pages, it is streamed by a ManifestReader.
 3. Run the script.
 
 Output:
@@ -28,20 +27,24 @@ Example:
     # Create an instance of the WebContentExtractor class
     wce = WebContentExtractor()
 
-    # Import the URLs from an Excel file
-    url = wce.import_excel_file("input.xlsx")
-
-    # Extract the content of the web pages
-    wce.extract_page_content(url["URL_ID"], url["URL"])
+    # Extract the content of the web pages listed in an Excel file
+    asyncio.run(wce.extract_all_pages("input.xlsx"))
 
 """
-import pandas as pd
 import re
 from bs4 import BeautifulSoup as bs
 import asyncio
+import codecs
 import os
 import aiohttp
 from logger import Logger
+from crawl_journal import CrawlJournal
+from host_scheduler import HostScheduler, RateLimited
+from html_stream import ContentDivTracker, ContentRejected, TruncatedHtml, looks_like_html, sniff_charset, \
+    HTML_CONTENT_TYPES
+from text_file_writer import TextFileWriter
+from manifest_reader import ManifestReader
+from pipeline_budget import PipelineBudget
 
 
 class WebContentExtractor:
@@ -50,36 +53,161 @@ class WebContentExtractor:
 
     """
 
-    def __init__(self):
+    def __init__(self, content_store=None, scheduler=None, max_body_bytes=5 * 1024 * 1024, chunk_size=64 * 1024,
+                 stop_after_content=True, writer=None, max_in_flight=500, batch_size=500, budget=None):
         """
         Initialize the WebContentExtractor class by setting up a logger, importing the input file,
         and creating a folder to store the extracted text files.
+
+        :param content_store: an optional ContentStore keeping the raw HTML and the extracted text
+            in compressed segment files instead of one text file per URL_ID
+        :param scheduler: an optional HostScheduler applying per host rate and concurrency limits
+        :param max_body_bytes: responses with a larger body are rejected
+        :param chunk_size: the number of bytes read from the response body at a time
+        :param stop_after_content: stop reading the body once the 'td-post-content' div is closed
+        :param writer: an optional TextFileWriter writing the extracted content in a background thread,
+            so that file writes do not block the event loop
+        :param max_in_flight: the largest number of page tasks that exist at the same time, new tasks are
+            only created from the manifest when running ones finish. Earlier versions created a task for every
+            row at once; None restores that, with a HostScheduler the hosts' limits bound the requests anyway
+        :param batch_size: the number of manifest rows checked against the crawl journal at a time
+        :param budget: an optional PipelineBudget limiting the bytes of fetched pages held in memory,
+            the number of pages queued for the writer and the time spent fetching a page
         """
         self.logger = Logger(__name__, 'web_content_extractor.log', log_to_console=True).logger
+        self.journal = None
+        self.content_store = content_store
+        self.scheduler = scheduler
+        self.max_body_bytes = max_body_bytes
+        self.chunk_size = chunk_size
+        self.stop_after_content = stop_after_content
+        self.writer = writer
+        self.max_in_flight = max_in_flight
+        self.batch_size = batch_size
+        self.budget = budget
+        self.textfile_folder = None
         # self.create_folder()
 
-    def import_excel_file(self, filepath):
+    async def fetch_url(self, url_link):
         """
-        Import an Excel file containing the URLs to extract.
+        Fetch the HTML of a web page.
+        The body is read and decoded incrementally: non HTML responses are rejected before the body is read,
+        the body is limited to max_body_bytes and reading stops once the article content div is closed.
+        A response without Content-Type header is accepted if its body starts like markup.
 
-        :param filepath: the path to the Excel file containing the URLs,
-            i.e. the location of Input.xlsx
+        :param url_link: the URL to fetch
 
-        :return: a pandas DataFrame object containing the URL_ID and URL columns
+        :return: the text of the response, a TruncatedHtml if reading stopped after the content div
+        :raises RateLimited: if the server answers with 429 or 503
+        :raises ContentRejected: if the response is not HTML or its body is larger than max_body_bytes
+        """
+        page_html, reserved = await self.fetch_reserved(url_link)
+        if reserved:
+            self.budget.release(reserved)
+        return page_html
+
+    async def fetch_reserved(self, url_link):
+        """
+        Fetch the HTML of a web page like fetch_url, keeping the in-flight bytes of the page reserved in the budget.
+        The Content-Length (or max_body_bytes if it is unknown) is reserved before the body is read and the
+        reservation is resized to the length of the returned text. The caller owns the reservation and gives back
+        exactly the returned number of bytes.
+
+        :param url_link: the URL to fetch
+
+        :return: a tuple of the text of the response and the number of bytes reserved, 0 without a budget
+        :raises ConnectionError: if the connection to the server fails
         """
         try:
-            input_file = pd.read_excel(filepath)
-            self.logger.info(f"{filepath} imported successfully")
-            return input_file
-        except Exception as e:
-            self.logger.error(f"Error reading {filepath}: {e}")
-            return None
+            async with aiohttp.ClientSession() as session:
+                async with session.get(url_link) as response:
+                    if response.status in (429, 503):
+                        retry_after = RateLimited.parse_retry_after(response.headers.get('Retry-After'))
+                        raise RateLimited(response.status, retry_after)
+                    # aiohttp reports application/octet-stream when the header is missing, the body is sniffed instead
+                    has_content_type = 'Content-Type' in response.headers
+                    if has_content_type and response.content_type not in HTML_CONTENT_TYPES:
+                        raise ContentRejected(f"{url_link} has the content type {response.content_type}")
+                    if response.content_length and response.content_length > self.max_body_bytes:
+                        raise ContentRejected(f"{url_link} body of {response.content_length} bytes is too large")
+
+                    reserved = 0
+                    if self.budget:
+                        reserved = await self.budget.reserve_bytes(response.content_length or self.max_body_bytes)
+                    try:
+                        page_html = await self.read_body(response, url_link, sniff=not has_content_type)
+                    except BaseException:
+                        if self.budget:
+                            self.budget.release(reserved)
+                        raise
+                    if self.budget:
+                        reserved = self.budget.resize(reserved, len(page_html))
+                    return page_html, reserved
+        except aiohttp.ClientConnectionError as e:
+            if isinstance(e, OSError):
+                raise
+            # e.g. a server that closed the connection, it reaches the host scheduler as a congestion signal
+            raise ConnectionError(f"{url_link} connection failed: {e!r}") from e
+
+    async def read_body(self, response, url_link, sniff=False):
+        """
+        Read and decode the body of a response incrementally.
 
-    async def fetch_url(self, url_link):
-        async with aiohttp.ClientSession() as session:
-            async with session.get(url_link) as response:
-                response_text = await response.text()
-                return response_text
+        :param response: the aiohttp response
+        :param url_link: the URL of the response
+        :param sniff: reject the body unless its first chunk starts like markup, for responses without Content-Type
+
+        :return: the decoded body. If stop_after_content is set and reading stopped at the end of the article
+            content div, a TruncatedHtml, so that stores keeping the raw HTML know it misses its end
+        """
+        decoder = None
+        tracker = ContentDivTracker() if self.stop_after_content else None
+        pieces = []
+        size = 0
+        async for chunk in response.content.iter_chunked(self.chunk_size):
+            size += len(chunk)
+            if size > self.max_body_bytes:
+                raise ContentRejected(f"{url_link} body is larger than {self.max_body_bytes} bytes")
+            if decoder is None:
+                if sniff and not looks_like_html(chunk):
+                    raise ContentRejected(f"{url_link} has no content type and its body is not HTML")
+                # the charset is detected once, from the header or the first chunk of the body
+                charset = response.charset or sniff_charset(chunk)
+                try:
+                    decoder = codecs.getincrementaldecoder(charset)(errors='replace')
+                except LookupError:
+                    decoder = codecs.getincrementaldecoder('utf-8')(errors='replace')
+            text = decoder.decode(chunk)
+            pieces.append(text)
+            if tracker and tracker.feed(text):
+                self.logger.info(f"{url_link} content div closed after {size} bytes, reading stopped")
+                pieces.append(decoder.decode(b'', final=True))
+                page_html = ''.join(pieces)
+                return page_html if response.content.at_eof() else TruncatedHtml(page_html)
+        if decoder:
+            pieces.append(decoder.decode(b'', final=True))
+        return ''.join(pieces)
+
+    async def fetch_page(self, url_id, url_link):
+        """
+        Fetch a web page through the host scheduler, if there is one, under the time limit of the budget.
+        The time limit starts when the request has its host slot and token, so the time spent in the queue of
+        the host does not count.
+
+        :param url_id: the unique identifier for the URL
+        :param url_link: the URL to fetch
+
+        :return: a tuple of the HTML of the page and the number of in-flight bytes it holds in the budget
+        :raises BudgetExceeded: if the fetch takes longer than the time limit
+        """
+        def fetch(url):
+            if self.budget:
+                return self.budget.run_with_timeout(self.fetch_reserved(url), url_id)
+            return self.fetch_reserved(url)
+
+        if self.scheduler:
+            return await self.scheduler.run(url_link, fetch)
+        return await fetch(url_link)
 
     async def extract_page_content(self, url_id, url_link):
         """
@@ -89,8 +217,90 @@ class WebContentExtractor:
         :param url_link: the URL to extract content from
 
         :return: None
+        :raises BudgetExceeded: if fetching the page takes longer than the time limit of the budget
+        :raises Exception: if the text can not be stored, the page is then not recorded as parsed
+        """
+        page_html, reserved = await self.fetch_page(url_id, url_link)
+        try:
+            if self.journal:
+                self.journal.mark_fetched(url_id)
+            content = self.parse_page(url_id, page_html)
+            if self.writer:
+                documents = 0
+                if self.budget:
+                    await self.budget.reserve_document()
+                    documents = 1
+                # the page bytes and the queue place are held until the writer thread has written the text,
+                # the page is recorded as parsed in the journal only then
+                held, reserved = reserved, 0
+                self.writer.submit(url_id, content, page_html, self.written_callback(url_id, held, documents))
+                self.logger.info(f"URL_ID {url_id} content queued for writing ")
+            else:
+                if self.content_store:
+                    # the store does file and SQLite I/O, it runs in a worker thread instead of the event loop
+                    await self.content_store.put_async(url_id, page_html, content)
+                else:
+                    self.create_text_file(url_id, content, page_html)
+                self.logger.info(f"URL_ID {url_id} content saved successfully ")
+                if self.journal:
+                    self.journal.mark_parsed(url_id)
+        finally:
+            if reserved:
+                self.budget.release(reserved)
+
+    def written_callback(self, url_id, nbytes, documents):
+        """
+        Return the callback the writer thread calls with the outcome of writing the text of a page.
+        It gives back the budget the page holds and records the page in the crawl journal.
+
+        :param url_id: the unique identifier for the URL
+        :param nbytes: the in-flight bytes the page holds in the budget
+        :param documents: the writer queue places the page holds in the budget
+
+        :return: a function taking the exception of the write, or None if the text was written
+        """
+        loop = asyncio.get_running_loop()
+
+        def on_written(error):
+            if self.budget:
+                self.budget.release_threadsafe(nbytes, documents)
+            if not self.journal:
+                return
+            try:
+                # the journal is only used from the thread of the event loop
+                loop.call_soon_threadsafe(self.record_written, url_id, error)
+            except RuntimeError:
+                # the loop closed, the page stays fetched in the journal and is extracted again by the next run
+                self.logger.error(f"URL_ID {url_id} written after the crawl ended, it is not recorded as parsed")
+
+        return on_written
+
+    def record_written(self, url_id, error):
+        """
+        Record the outcome of writing the text of a page in the crawl journal: parsed if it was written,
+        failed with the error otherwise, so that the page is retried.
+
+        :param url_id: the unique identifier for the URL
+        :param error: the exception of the write, or None if the text was written
+
+        :return: None
+        """
+        if error is None:
+            self.journal.mark_parsed(url_id)
+        else:
+            self.journal.mark_failed(url_id, error)
+            self.logger.error(f"URL_ID {url_id} content could not be written: {error}")
+
+    def parse_page(self, url_id, page_html):
+        """
+        Extract the text of a web page from its HTML: the title and the article content,
+        or the title and the error text of a page that is not found.
+
+        :param url_id: the unique identifier for the URL
+        :param page_html: the HTML of the page
+
+        :return: the extracted text
         """
-        page_html = await self.fetch_url(url_link)
         page_soup = bs(page_html, 'html.parser')
         self.logger.info(f'page content of URL_ID {url_id} is souped successfully ')
 
@@ -99,37 +309,113 @@ class WebContentExtractor:
             page_content = page_soup.find("div", {"class": "td-post-content"}).get_text()
             page_content = re.sub(r'^\s+|\s+$', '', page_content)
             page_content = re.sub(r'(?s)^(.*\n)(Blackcoffer.*)$', r'\1', page_content)
-            self.create_text_file(url_id, f"{page_title}\n\n{page_content}")
-            self.logger.info(f"URL_ID {url_id} content saved successfully ")
+            return f"{page_title}\n\n{page_content}"
 
         except Exception as e:
             page_title = page_soup.title.string.split('-')[0].strip()
             page_sub_title = page_soup.find('div', {'class': 'td-404-sub-title'}).text.strip()
             page_sub_sub_title = page_soup.find('div', {'class': 'td-404-sub-sub-title'}).get_text().strip()
-            self.create_text_file(url_id, f"{page_title}\n{page_sub_title}\n{page_sub_sub_title}")
             self.logger.error(
                 f"URL_ID {url_id} url page is not found but Error text is saved in the text file {url_id}.txt {e}")
+            return f"{page_title}\n{page_sub_title}\n{page_sub_sub_title}"
+
+    async def crawl_page(self, url_id, url_link):
+        """
+        Extract the content of a web page and record the outcome in the crawl journal.
+        Failed pages are retried as long as the retry policy of the journal allows it.
 
-    async def extract_all_pages(self, filepath):
+        :param url_id: the unique identifier for the URL
+        :param url_link: the URL to extract content from
+
+        :return: None
         """
-        Extract the content of all web pages listed in the input Excel file concurrently.
+        retry_policy = self.journal.retry_policy
+        attempts = self.journal.failed_attempts(url_id)
+        while True:
+            await asyncio.sleep(retry_policy.delay(attempts))
+            try:
+                await self.extract_page_content(url_id, url_link)
+                return
+            except ContentRejected as e:
+                # a rejected response will be rejected again, so it is recorded as finished and not retried
+                self.journal.mark_rejected(url_id, e)
+                self.logger.error(f"URL_ID {url_id} rejected: {e}")
+                return
+            except Exception as e:
+                attempts += 1
+                self.journal.mark_failed(url_id, e)
+                self.logger.error(f"URL_ID {url_id} failed on attempt {attempts}: {e}")
+                if not retry_policy.should_retry(attempts):
+                    return
+
+    async def extract_all_pages(self, filepath, journal=None):
+        """
+        Extract the content of all web pages listed in the input Excel or CSV file concurrently.
+
+        The manifest is streamed with a ManifestReader and at most max_in_flight page tasks exist at a time,
+        so the memory use and the time to the first request do not grow with the size of the manifest.
+        When a crawl journal is given, only the URL_IDs that are not finished in the journal are
+        extracted, so that an interrupted crawl continues where it stopped. Rows repeating a URL_ID are
+        crawled like without a journal and logged.
 
-        :param filepath: the path to the Excel file containing the URLs
+        :param filepath: the path to the Excel or CSV file containing the URLs
+        :param journal: an optional CrawlJournal recording the state of every URL_ID
 
         :return: None
         """
         try:
-            input_file = self.import_excel_file(filepath)
-            url_id_list = input_file["URL_ID"]
-            url_link_list = input_file["URL"]
-            tasks = [asyncio.create_task(self.extract_page_content(url_id, url_link))
-                     for url_id, url_link in zip(url_id_list, url_link_list)]
+            if journal:
+                self.journal = journal
+            pending = set()
+            task_url_ids = {}
+            for batch in ManifestReader(filepath).iter_batches(self.batch_size):
+                if journal:
+                    url_ids = list(dict.fromkeys(url_id for url_id, _ in batch))
+                    if len(url_ids) < len(batch):
+                        # every row is crawled like without a journal, the last written one wins
+                        self.logger.error(f"{len(batch) - len(url_ids)} duplicate URL_IDs in the manifest batch")
+                    self.journal.register(url_ids)
+                    unfinished = {str(url_id) for url_id in self.journal.unfinished(url_ids)}
+                    batch = [(url_id, url_link) for url_id, url_link in batch if str(url_id) in unfinished]
+                for url_id, url_link in batch:
+                    if self.max_in_flight and len(pending) >= self.max_in_flight:
+                        done, pending = await asyncio.wait(pending, return_when=asyncio.FIRST_COMPLETED)
+                        self.log_failures(done, task_url_ids)
+                    if journal:
+                        task = asyncio.create_task(self.crawl_page(url_id, url_link))
+                    else:
+                        task = asyncio.create_task(self.extract_page_content(url_id, url_link))
+                    task_url_ids[task] = url_id
+                    pending.add(task)
             self.logger.info('All task extracted successfully')
-            await asyncio.gather(*tasks)
+            if pending:
+                done, _ = await asyncio.wait(pending)
+                self.log_failures(done, task_url_ids)
+            if self.scheduler:
+                self.logger.info(f"Host statistics: {self.scheduler.statistics()}")
+            if self.budget:
+                self.logger.info(f"Budget statistics: {self.budget.statistics()}")
+            if self.writer:
+                # wait without blocking the event loop until every extracted page is written
+                await asyncio.to_thread(self.writer.flush)
 
         except Exception as e:
             self.logger.error(f"Error in extracting all pages: {e}")
 
+    def log_failures(self, done, task_url_ids):
+        """
+        Log the page tasks that finished with an exception and forget the finished tasks.
+
+        :param done: the finished tasks
+        :param task_url_ids: a dictionary mapping every running task to its URL_ID
+
+        :return: None
+        """
+        for task in done:
+            url_id = task_url_ids.pop(task)
+            if not task.cancelled() and task.exception() is not None:
+                self.logger.error(f"URL_ID {url_id} could not be extracted: {task.exception()!r}")
+
     def create_folder(self):
 
         """
@@ -147,28 +433,43 @@ class WebContentExtractor:
         except:
             self.logger.exception(f"{textfile_folder} did not created")
 
-    def create_text_file(self, url_id, content):
+    def create_text_file(self, url_id, content, page_html=None):
         """
         Create a text file containing the extracted content.
+        If a content store is set, the extracted content and the raw HTML are stored in it instead.
 
         :param url_id: the unique identifier for the URL
         :param content: the extracted content to store in the text file
+        :param page_html: the raw HTML of the page, only kept by the content store
 
         :return: None
+        :raises OSError: if the text file can not be written, so that the page is not recorded as parsed
         """
+        if self.writer:
+            self.writer.submit(url_id, content, page_html)
+            return
+
+        if self.content_store:
+            self.content_store.put(url_id, page_html, content)
+            return
 
-        textfile_folder = self.create_folder()
+        # the folder is created once per run instead of being checked on every write
+        if self.textfile_folder is None:
+            self.textfile_folder = self.create_folder()
 
         try:
-            with open(os.path.join(textfile_folder, f"{url_id}"), "w", encoding="utf-8") as file:
+            with open(os.path.join(self.textfile_folder, f"{url_id}"), "w", encoding="utf-8") as file:
                 file.write(content)
             self.logger.info(f"URL_ID {url_id} Page content stored in {url_id}.txt file successfully")
         except Exception as e:
-            self.logger.error(f"URL_ID {url_id} Error in encoding the file", e)
+            self.logger.error(f"URL_ID {url_id} Error in encoding the file: {e}")
+            raise
 
 
 if __name__ == '__main__':
     # file_path = "Input.xlsx"
     filepath = os.path.abspath(os.path.join(os.getcwd(), os.pardir, 'Input.xlsx'))
-    web_extractor = WebContentExtractor()
-    asyncio.run(web_extractor.extract_all_pages(filepath))
+    text_file_writer = TextFileWriter()
+    web_extractor = WebContentExtractor(scheduler=HostScheduler(), writer=text_file_writer, budget=PipelineBudget())
+    asyncio.run(web_extractor.extract_all_pages(filepath, CrawlJournal()))
+    text_file_writer.close()
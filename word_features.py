@@ -0,0 +1,187 @@
+"""
+This module provides a WordFeatureTable class that precomputes, once per distinct word, everything the
+analysis measures need from a word: its length, syllable count, complex flag, stop word flag, positive and
+negative flags and personal pronoun flag. The counts of a document are then sums of table rows, one lookup
+per word, instead of running the regular expressions and lexicon lookups on every occurrence.
+
+Every word gets a token ID, the index of its row in the table. New words are added when they are first seen,
+with the per word definitions of ReadabilityAnalyzer.token_flags and of the lexicon matcher, so the counts
+are identical to the ones of token_counts and scan. The table is stored as 'word_features.tsv' next to the
+MasterDictionary sources and grows across runs. Its first line holds a fingerprint of the lexicons (with their
+phrases), the personal pronouns and the stop words; if they changed, the stored rows are discarded and the table
+is built again.
+
+Lexicons with phrases (entries of several words) can not be counted word by word, for them the positive and
+negative counts still come from the lexicon matcher.
+
+Classes:
+    WordFeatureTable: A persistent table of per word features indexed by token ID.
+
+Example:
+    word_feature_table = WordFeatureTable(text_analyzer, readability_analyzer)
+    counts = word_feature_table.counts(words)
+    word_feature_table.save()
+"""
+
+import hashlib
+import os
+import threading
+from logger import Logger
+from path_helper import PathHelper
+
+# the features of a word, in the order of the table columns
+FEATURES = ('chars', 'syllables', 'complex', 'non_stop', 'positive', 'negative', 'pronouns')
+TABLE_VERSION = 1
+
+
+class WordFeatureTable:
+    """
+    A class that keeps the per word features of every word seen so far and sums them into document counts.
+    """
+
+    def __init__(self, text_analyzer, readability_analyzer, table_path=None):
+        """
+        Initializes the WordFeatureTable object and loads the stored rows if the fingerprint matches.
+
+        Args:
+            text_analyzer (TextAnalyzer): The analyzer providing the sentiment lexicons.
+            readability_analyzer (ReadabilityAnalyzer): The analyzer providing the per word readability values.
+            table_path (str): The table file, by default 'word_features.tsv' in the MasterDictionary folder.
+        """
+        self.logger = Logger(__name__, 'word_features.log', log_to_console=True).logger
+        self.readability_analyzer = readability_analyzer
+        self.matcher = text_analyzer.matcher
+        self.table_path = table_path or PathHelper().get_MasterDictionary_path('word_features.tsv')
+        # phrases span several words, they are still counted by the matcher
+        self.has_phrases = any(len(entry) > 1 for outputs in getattr(self.matcher, 'outputs', [])
+                               for _, entry, _ in outputs)
+        self.fingerprint = self.lexicon_fingerprint(text_analyzer, readability_analyzer)
+        self.lock = threading.Lock()
+        self.token_ids = {}
+        self.rows = []
+        self.unsaved = []
+        self.load()
+
+    @staticmethod
+    def matcher_entries(matcher):
+        """
+        Returns the entries compiled into a LexiconMatcher as sorted lines 'category, case sensitive, entry',
+        including the phrases. A matcher without an automaton (e.g. a SharedLexicon) has none.
+        """
+        return sorted({f'{category}\t{int(case_sensitive)}\t{" ".join(entry)}'
+                       for outputs in getattr(matcher, 'outputs', []) for category, entry, case_sensitive in outputs})
+
+    @classmethod
+    def lexicon_fingerprint(cls, text_analyzer, readability_analyzer):
+        """
+        Returns a hash of everything the features depend on: the lexicons with their phrases, the personal
+        pronouns, the stop words and the table version.
+        """
+        digest = hashlib.sha256(f'{TABLE_VERSION}'.encode('utf-8'))
+        for words in (text_analyzer.positive_dict, text_analyzer.negative_dict,
+                      readability_analyzer.english_stop_words(), cls.matcher_entries(text_analyzer.matcher),
+                      cls.matcher_entries(readability_analyzer.pronoun_matcher)):
+            digest.update('\n'.join(sorted(words or [])).encode('utf-8'))
+            digest.update(b'\0')
+        return digest.hexdigest()
+
+    def load(self):
+        """
+        Loads the stored rows, unless the table file is missing or was built for other lexicons.
+        A row that can not be parsed, e.g. a last line cut by an interrupted save, is cut off the file
+        together with everything after it, so that the next save appends to complete rows.
+        """
+        if not os.path.exists(self.table_path):
+            return
+        try:
+            with open(self.table_path, 'rb+') as f:
+                current = f.readline().decode('utf-8', errors='replace').strip() == f'# {self.fingerprint}'
+                complete = f.tell()
+                for line in f if current else ():
+                    try:
+                        if not line.endswith(b'\n'):
+                            raise ValueError("the line is incomplete")
+                        word, *values = line.decode('utf-8').rstrip('\r\n').split('\t')
+                        row = tuple(map(int, values))
+                        if len(row) != len(FEATURES):
+                            raise ValueError(f"{len(row)} features instead of {len(FEATURES)}")
+                    except ValueError as e:
+                        f.truncate(complete)
+                        self.logger.error(f"Row {len(self.rows) + 1} of {self.table_path} can not be parsed ({e}), "
+                                          f"the table is cut after the last complete row")
+                        break
+                    self.token_ids[word] = len(self.rows)
+                    self.rows.append(row)
+                    complete += len(line)
+            if not current:
+                self.logger.info(f"{self.table_path} was built for other lexicons, it is rebuilt")
+                os.remove(self.table_path)
+                return
+            self.logger.info(f"{len(self.rows)} word features loaded from {self.table_path}")
+        except Exception as e:
+            self.logger.error(f"Word features could not be loaded from {self.table_path}: {e}")
+            self.token_ids = {}
+            self.rows = []
+
+    def add(self, word):
+        """
+        Computes the features of a new word and returns its token ID.
+        """
+        flags = self.readability_analyzer.token_flags([word])
+        flags.update(self.matcher.token_matches([word]))
+        row = tuple(flags[feature][0] for feature in FEATURES)
+        with self.lock:
+            token_id = self.token_ids.get(word)
+            if token_id is None:
+                # the row is appended before the token ID is published, for readers without the lock
+                token_id = len(self.rows)
+                self.rows.append(row)
+                self.token_ids[word] = token_id
+                self.unsaved.append(word)
+            return token_id
+
+    def token_id(self, word):
+        token_id = self.token_ids.get(word)
+        return token_id if token_id is not None else self.add(word)
+
+    def features(self, word):
+        """
+        Returns the features of a word as a dictionary keyed by the names in FEATURES.
+        """
+        return dict(zip(FEATURES, self.rows[self.token_id(word)]))
+
+    def counts(self, words):
+        """
+        Counts everything the measures are calculated from, with one table lookup per word.
+
+        Returns:
+            dict: The counts of token_counts ('words', 'complex', 'non_stop', 'syllables', 'pronouns', 'chars')
+                and the lexicon counts 'positive' and 'negative'.
+        """
+        token_ids = self.token_ids
+        rows = self.rows
+        word_rows = [rows[token_ids[word]] if word in token_ids else rows[self.add(word)] for word in words]
+        counts = dict(zip(FEATURES, map(sum, zip(*word_rows)))) if word_rows else dict.fromkeys(FEATURES, 0)
+        counts['words'] = len(words)
+        if self.has_phrases:
+            counts.update(self.matcher.scan(words))
+        return counts
+
+    def save(self):
+        """
+        Appends the rows of the words added since the last save to the table file.
+        """
+        with self.lock:
+            words, self.unsaved = self.unsaved, []
+            rows = [(word, self.rows[self.token_ids[word]]) for word in words]
+        if not rows:
+            return
+        try:
+            new_file = not os.path.exists(self.table_path)
+            with open(self.table_path, 'a', encoding='utf-8') as f:
+                if new_file:
+                    f.write(f'# {self.fingerprint}\n')
+                f.write(''.join('\t'.join([word, *map(str, row)]) + '\n' for word, row in rows))
+            self.logger.info(f"{len(rows)} word features saved to {self.table_path}")
+        except Exception as e:
+            self.logger.error(f"Word features could not be saved to {self.table_path}: {e}")